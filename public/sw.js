@@ -0,0 +1,62 @@
+// Lydistories service worker
+//
+// Catalog and content API responses carry strong ETags with
+// `Cache-Control: no-cache`. We keep the last copy of each one and revalidate
+// it with If-None-Match on every request: an unchanged book costs a 304 with
+// no body instead of re-downloading its full text, and the stored copy is
+// still there when the network is not.
+//
+// Signed-in responses are private to the user, so the page posts
+// 'logout' when they sign out and the whole API cache is deleted.
+
+const API_CACHE = 'lydistories-api-v1';
+// Bumped on logout so a request already in flight doesn't store its response afterwards
+let generation = 0;
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    const names = await caches.keys();
+    await Promise.all(names.filter(n => n.startsWith('lydistories-api-') && n !== API_CACHE).map(n => caches.delete(n)));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'logout') {
+    generation += 1;
+    event.waitUntil(caches.delete(API_CACHE));
+  }
+});
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || !url.pathname.startsWith('/api/content')) return;
+  event.respondWith(revalidate(request));
+});
+
+async function revalidate(request) {
+  const started = generation;
+  const cache = await caches.open(API_CACHE);
+  // Responses vary on Authorization, which cache.match() honours
+  const cached = await cache.match(request);
+  const headers = new Headers(request.headers);
+  const etag = cached && cached.headers.get('ETag');
+  if (etag) headers.set('If-None-Match', etag);
+
+  let response;
+  try {
+    response = await fetch(request.url, { headers, cache: 'no-store', credentials: request.credentials });
+  } catch (err) {
+    if (cached) return cached;
+    throw err;
+  }
+
+  if (response.status === 304 && cached) return cached;
+  if (response.ok && response.headers.get('ETag') && generation === started) {
+    await cache.put(request, response.clone());
+  }
+  return response;
+}
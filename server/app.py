@@ -1,38 +1,90 @@
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from dotenv import load_dotenv
 
 # Load .env using the absolute path of this file's directory
 _here = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(_here, '.env'))
-from database import init_db
-from routes.auth import auth_bp
-from routes.content import content_bp
+from database import pool_stats, release_request_connections
+from migrate import check_schema
+from routes.auth import auth_bp, admin_required
+from routes.content import content_bp, suggest_cache
+from catalog_cache import catalog_cache
+from principals import principal_cache
 from routes.payments import payments_bp
 from routes.users import users_bp
+from routes.jobs import jobs_bp
+from routes.profile import profile_bp
+from routes.downloads import downloads_bp
+from routes.covers import covers_bp
+from routes.profiles import profiles_bp
+from file_serving import send_upload
+from query_stats import report_request
+import revocation
+import metrics
+import profiling
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+# Behind N load balancers/proxies, take the client IP from X-Forwarded-For
+# (rate limits are per IP). Only set this when a proxy always adds the header.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(content_bp)
 app.register_blueprint(payments_bp)
 app.register_blueprint(users_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(profile_bp)
+app.register_blueprint(downloads_bp)
+app.register_blueprint(covers_bp)
+app.register_blueprint(profiles_bp)
 
-# Serve uploaded files
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Return pooled DB connections that a handler left checked out
+app.teardown_appcontext(release_request_connections)
+# Per-request query count/DB time as Server-Timing, N+1 warnings in the log
+app.after_request(report_request)
+# Prometheus request counters/latency histograms (see metrics.py)
+metrics.init_app(app)
+# Admin-only X-Profile requests and optional continuous sampling (see profiling.py)
+profiling.init_app(app)
 
+# Serve uploaded covers and avatars (resized covers come from covers_bp). PDFs are only available through the
+# signed URLs from /api/content/<id>/download.
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory(UPLOAD_DIR, filename)
+    if filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'Not found'}), 404
+    return send_upload(filename)
 
 @app.route('/api/health')
 def health():
     return {'status': 'ok', 'app': 'Lydistories API'}
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated over every worker process."""
+    return metrics.metrics_view()
+
+@app.route('/api/health/db')
+@admin_required
+def health_db():
+    """Connection pool usage for this worker, for sizing workers against max_connections."""
+    return jsonify({'pool': pool_stats()})
+
+@app.route('/api/health/cache')
+@admin_required
+def health_cache():
+    """Hit/miss counters for this worker's in-process caches."""
+    return jsonify({'catalog': catalog_cache.stats(), 'suggest': suggest_cache.stats(),
+                    'principals': principal_cache.stats()})
+
 # ── Serve React frontend ──
 # The built React app lives in ../dist (one level up from server/)
 DIST_DIR = os.path.join(os.path.dirname(__file__), '..', 'dist')
@@ -48,8 +100,10 @@ def serve_frontend(path):
     # Otherwise serve index.html (for React Router client-side routing)
     return send_from_directory(DIST_DIR, 'index.html')
 
-# Initialize database tables on startup
-init_db()
+# Refuse to serve against a database that is behind the code (see migrate.py)
+check_schema()
+# Load the token denylist in the background instead of on the first request
+revocation.start()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,128 @@
+"""Benchmark: per-row access checks vs. the set-wise entitlement lookup.
+
+Builds a synthetic catalog and purchase history in TEMP tables (which shadow
+the real ones for this session only, so nothing is written to the database)
+and replays the list_content access check both ways, reporting queries and
+latency per simulated request.
+
+    cd server && python -m benchmarks.entitlements [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import time
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import entitlements
+
+CATALOG_SIZES = (100, 500, 2000)
+HISTORY_SIZES = (0, 50, 500)
+USER_ID = 1
+
+
+class CountingCursor(psycopg2.extras.RealDictCursor):
+    queries = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.queries += 1
+        return super().execute(query, vars)
+
+
+def setup(cur, catalog_size, history_size):
+    cur.execute('DROP TABLE IF EXISTS pg_temp.content, pg_temp.user_content_access')
+    cur.execute('''
+        CREATE TEMP TABLE content (
+            id INTEGER PRIMARY KEY, title TEXT, author TEXT, category TEXT, description TEXT,
+            preview_text TEXT, cover_image TEXT, page_count INTEGER, price REAL,
+            is_featured BOOLEAN, created_at TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE TEMP TABLE user_content_access (
+            id SERIAL PRIMARY KEY, user_id INTEGER NOT NULL, content_id INTEGER NOT NULL,
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(user_id, content_id)
+        )
+    ''')
+    cur.execute('''
+        INSERT INTO content
+        SELECT i, 'Title ' || i, 'Author ' || (i %% 97), 'book', repeat('description ', 10),
+               repeat('preview ', 60), NULL, 100, 5000, i %% 10 = 0,
+               now() - (i || ' minutes')::interval
+        FROM generate_series(1, %s) AS i
+    ''', (catalog_size,))
+    # Purchases are spread across other users too so the index has to discriminate
+    cur.execute('''
+        INSERT INTO user_content_access (user_id, content_id)
+        SELECT u, c FROM generate_series(1, 20) AS u, generate_series(1, %s) AS c
+        WHERE c <= %s
+    ''', (catalog_size, history_size))
+    cur.execute('ANALYZE content')
+    cur.execute('ANALYZE user_content_access')
+
+
+def fetch_catalog(cur):
+    cur.execute('''
+        SELECT id, title, author, category, description, preview_text, cover_image,
+               page_count, price, is_featured, created_at
+        FROM content ORDER BY created_at DESC
+    ''')
+    return [dict(r) for r in cur.fetchall()]
+
+
+def per_row_request(cur):
+    """The pre-entitlements list_content: one lookup per catalog row."""
+    items = fetch_catalog(cur)
+    for item in items:
+        cur.execute(
+            'SELECT id FROM user_content_access WHERE user_id = %s AND content_id = %s',
+            (USER_ID, item['id'])
+        )
+        item['has_access'] = cur.fetchone() is not None
+    return items
+
+
+def set_wise_request(cur):
+    items = fetch_catalog(cur)
+    return entitlements.annotate_access(cur, USER_ID, 'user', items)
+
+
+def measure(cur, fn, repeat):
+    timings = []
+    CountingCursor.queries = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(cur)
+        timings.append((time.perf_counter() - start) * 1000)
+    return CountingCursor.queries / repeat, statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    cur = conn.cursor(cursor_factory=CountingCursor)
+
+    print(f"{'catalog':>8} {'owned':>6} | {'per-row q':>9} {'p50 ms':>8} {'max ms':>8} | {'set q':>5} {'p50 ms':>8} {'max ms':>8}")
+    for catalog_size in CATALOG_SIZES:
+        for history_size in HISTORY_SIZES:
+            if history_size > catalog_size:
+                continue
+            setup(cur, catalog_size, history_size)
+            old = measure(cur, per_row_request, args.repeat)
+            new = measure(cur, set_wise_request, args.repeat)
+            assert per_row_request(cur) == set_wise_request(cur)
+            print(f"{catalog_size:>8} {history_size:>6} | {old[0]:>9.0f} {old[1]:>8.2f} {old[2]:>8.2f} | {new[0]:>5.0f} {new[1]:>8.2f} {new[2]:>8.2f}")
+
+    conn.rollback()
+    cur.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
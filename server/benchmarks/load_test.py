@@ -0,0 +1,366 @@
+"""HTTP load test: simulated readers browsing, buying and reading.
+
+By default the whole stack is throwaway: a temporary Postgres cluster
+(benchmarks/local_postgres.py), the migrations, a synthetic dataset
+(tools/generate_dataset.py) and gunicorn on a free port, all removed
+afterwards. ``--database-url`` uses an existing *empty* database instead of
+the temporary cluster; ``--url`` skips all setup and targets a running
+server whose database was filled by generate_dataset (start it with
+``RATE_LIMIT_BACKEND=off``: every virtual user logs in from one IP).
+
+    cd server && python -m benchmarks.load_test [--users 20] [--duration 60] [--scale 0.2]
+    cd server && python -m benchmarks.load_test --save-baseline benchmarks/baseline.json
+    cd server && python -m benchmarks.load_test --baseline benchmarks/baseline.json --fail-on-regression
+
+Each virtual user signs in as one of the generated readers and loops over
+the journey browse -> view -> bookmark -> initiate/confirm payment -> read,
+with searches, autocomplete and the dashboard mixed in. It keeps ETags like a
+browser, so repeat views are revalidations. The report gives requests/s and
+p50/p95/p99 latency per endpoint; against a baseline, an endpoint whose p95
+grew by more than ``--tolerance`` is flagged as a regression.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SERVER_DIR)
+PASSWORD = os.environ.get('LOADTEST_PASSWORD', 'loadtest')
+
+# Probability of each optional step per journey
+P_CATEGORY = 0.3
+P_NEXT_PAGE = 0.3
+P_SEARCH = 0.35
+P_BOOKMARK = 0.25
+P_BUY = 0.3
+P_DASHBOARD = 0.15
+CATEGORIES = ('book', 'guide', 'article', 'document')
+# Latency differences below this are noise, whatever the ratio
+NOISE_FLOOR_MS = 2.0
+
+
+# ── Virtual users ──
+
+class VirtualUser(threading.Thread):
+    def __init__(self, index, host, port, email, seed, record_from, deadline, think):
+        super().__init__(name=f'vu-{index}', daemon=True)
+        self.host, self.port, self.email = host, port, email
+        self.rng = random.Random(f'{seed}:{index}')
+        self.record_from, self.deadline, self.think = record_from, deadline, think
+        self.samples = {}   # endpoint -> [latency ms]
+        self.errors = {}    # endpoint -> count
+        self.conn = None
+        self.token = None
+        self.etags = {}     # path -> (etag, parsed body)
+
+    def _record(self, name, started, ok):
+        if started < self.record_from:
+            return
+        self.samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def request(self, name, method, path, body=None, expect=(200,)):
+        """Send one request; returns ``(status, parsed JSON or None)``."""
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        cached = self.etags.get(path) if method == 'GET' else None
+        if cached:
+            headers['If-None-Match'] = cached[0]
+
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            self._record(name, started, False)
+            self.conn.close()
+            self.conn = None
+            return None, None
+        status = response.status
+        if status == 304 and cached:
+            self._record(name, started, True)
+            return 200, cached[1]
+        self._record(name, started, status in expect)
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        etag = response.getheader('ETag')
+        if method == 'GET' and etag and status == 200:
+            self.etags[path] = (etag, data)
+        return status, data
+
+    def pause(self):
+        if self.think:
+            time.sleep(self.rng.uniform(0, 2 * self.think))
+
+    def login(self):
+        status, data = self.request('POST /api/auth/login', 'POST', '/api/auth/login',
+                                    {'email': self.email, 'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'{self.email} could not sign in ({status}); was the dataset generated?')
+        self.token = data['token']
+
+    def journey(self):
+        rng = self.rng
+        query = {'limit': 20}
+        if rng.random() < P_CATEGORY:
+            query['category'] = rng.choice(CATEGORIES)
+        _, page = self.request('GET /api/content', 'GET', '/api/content?' + urllib.parse.urlencode(query))
+        items = (page or {}).get('content', [])
+        if page and page.get('next_cursor') and rng.random() < P_NEXT_PAGE:
+            query['after'] = page['next_cursor']
+            _, page = self.request('GET /api/content', 'GET', '/api/content?' + urllib.parse.urlencode(query))
+            items = (page or {}).get('content', []) or items
+        self.pause()
+
+        if items and rng.random() < P_SEARCH:
+            word = rng.choice(rng.choice(items)['title'].split())
+            self.request('GET /api/content/suggest', 'GET',
+                         '/api/content/suggest?' + urllib.parse.urlencode({'q': word[:3].lower()}))
+            _, found = self.request('GET /api/content?search=', 'GET',
+                                    '/api/content?' + urllib.parse.urlencode({'search': word, 'limit': 20}))
+            items = (found or {}).get('content') or items
+            self.pause()
+        if not items:
+            return
+
+        item = rng.choice(items)
+        content_id = item['id']
+        _, view = self.request('GET /api/content/:id', 'GET', f'/api/content/{content_id}')
+        has_access = bool(view and view['content'].get('has_access'))
+        self.pause()
+
+        if rng.random() < P_BOOKMARK:
+            self.request('POST /api/bookmarks', 'POST', '/api/bookmarks', {'content_id': content_id},
+                         expect=(201, 409))
+
+        if not has_access and rng.random() < P_BUY:
+            status, payment = self.request('POST /api/payments/initiate', 'POST', '/api/payments/initiate',
+                                           {'content_id': content_id, 'phone_number': '0700000000'})
+            if status == 200:
+                otp = re.search(r'(\d{6})', payment['otp_hint']).group(1)
+                self.pause()
+                status, _ = self.request('POST /api/payments/confirm', 'POST', '/api/payments/confirm',
+                                         {'payment_id': payment['payment_id'], 'otp': otp})
+                has_access = status == 200
+
+        if has_access:
+            _, pages = self.request('GET /api/content/:id/pages', 'GET', f'/api/content/{content_id}/pages')
+            if pages and pages.get('next_from'):
+                self.pause()
+                path = f"/api/content/{content_id}/pages?from={pages['next_from']}"
+                self.request('GET /api/content/:id/pages', 'GET', path)
+                total = pages['total_pages'] or 1
+                self.request('PUT /api/reading-progress', 'PUT', '/api/reading-progress', {
+                    'content_id': content_id, 'last_page': pages['next_from'],
+                    'progress_percent': round(100 * pages['next_from'] / total, 1)})
+
+        if rng.random() < P_DASHBOARD:
+            self.request('GET /api/users/dashboard', 'GET', '/api/users/dashboard')
+
+    def run(self):
+        self.login()
+        while time.monotonic() < self.deadline:
+            self.journey()
+            self.pause()
+        if self.conn is not None:
+            self.conn.close()
+
+
+# ── Reporting ──
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(users, seconds):
+    samples, errors = {}, {}
+    for vu in users:
+        for name, values in vu.samples.items():
+            samples.setdefault(name, []).extend(values)
+        for name, count in vu.errors.items():
+            errors[name] = errors.get(name, 0) + count
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        values.sort()
+        endpoints[name] = {
+            'count': len(values),
+            'rps': round(len(values) / seconds, 2),
+            'errors': errors.get(name, 0),
+            'p50': round(percentile(values, 50), 2),
+            'p95': round(percentile(values, 95), 2),
+            'p99': round(percentile(values, 99), 2),
+        }
+    total = sum(len(v) for v in samples.values())
+    return {'requests': total, 'rps': round(total / seconds, 2),
+            'errors': sum(errors.values()), 'endpoints': endpoints}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None, tolerance=0.2):
+    """Print the per-endpoint table; returns the names of regressed endpoints."""
+    regressions = []
+    print(f"\n{'endpoint':<34} {'count':>7} {'req/s':>8} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + (f" {'p95 vs base':>12}" if baseline else ''))
+    for name, row in report['endpoints'].items():
+        line = (f"{name:<34} {row['count']:>7} {row['rps']:>8.1f} {row['errors']:>5} "
+                f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f}")
+        base = (baseline or {}).get('endpoints', {}).get(name)
+        if base:
+            change = (row['p95'] - base['p95']) / base['p95'] if base['p95'] else 0.0
+            flag = ''
+            if change > tolerance and row['p95'] - base['p95'] > NOISE_FLOOR_MS:
+                flag = ' REGRESSED'
+                regressions.append(name)
+            line += f" {change:>+11.0%}{flag}"
+        elif baseline:
+            line += f" {'new':>12}"
+        print(line)
+    print(f"\n{report['requests']} requests, {report['rps']} req/s, {report['errors']} errors "
+          f"over {report['seconds']}s with {report['users']} users")
+    if baseline:
+        print(f"Baseline: {baseline.get('revision')} ({baseline.get('date')}), "
+              f"{baseline['rps']} req/s; {len(regressions)} endpoint(s) regressed by more than {tolerance:.0%}")
+    return regressions
+
+
+# ── Throwaway stack ──
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'The app did not come up on port {port}')
+
+
+def run_stack(args, dsn):
+    """Migrate and fill ``dsn``, start gunicorn on it and run the load. Returns the report."""
+    env = dict(os.environ, DATABASE_URL=dsn, SQL_LOG='off', RATE_LIMIT_BACKEND='off',
+               CATALOG_CACHE_MARKER=os.path.join(tempfile.mkdtemp(prefix='lydistories-lt-'), 'catalog.version'))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    subprocess.run([sys.executable, 'migrate.py'], cwd=SERVER_DIR, env=env, check=True)
+    subprocess.run([sys.executable, '-m', 'server.tools.generate_dataset', '--scale', str(args.scale),
+                    '--seed', str(args.seed), '--login-users', str(args.users)],
+                   cwd=REPO_DIR, env=env, check=True)
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                               '--workers', str(args.app_workers), '--log-level', 'warning'],
+                              cwd=SERVER_DIR, env=env)
+    try:
+        _wait_for('127.0.0.1', port)
+        return run_load('127.0.0.1', port, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_load(host, port, args):
+    now = time.monotonic()
+    record_from = time.perf_counter() + args.warmup
+    deadline = now + args.warmup + args.duration
+    users = [VirtualUser(i, host, port, f'reader{i % args.login_users + 1}@example.com', args.seed,
+                         record_from, deadline, args.think)
+             for i in range(args.users)]
+    print(f"Running {args.users} users for {args.duration}s (+{args.warmup}s warm-up) against {host}:{port}")
+    for vu in users:
+        vu.start()
+    for vu in users:
+        vu.join()
+    report = summarize(users, args.duration)
+    report.update({
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'users': args.users, 'seconds': args.duration, 'scale': args.scale, 'seed': args.seed,
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the API with simulated readers.')
+    parser.add_argument('--url', help='target a running server instead of starting a throwaway stack')
+    parser.add_argument('--database-url', help='use this empty database instead of a temporary cluster')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds before measuring starts')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between steps (seconds)')
+    parser.add_argument('--scale', type=float, default=0.2, help='dataset scale (see generate_dataset)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--login-users', type=int, default=None,
+                        help='generated readers to sign in as (default: one per virtual user)')
+    parser.add_argument('--app-workers', type=int, default=2, help='gunicorn workers for the throwaway stack')
+    parser.add_argument('--report', help='write the JSON report here')
+    parser.add_argument('--save-baseline', metavar='PATH', help='store this run as the baseline')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against a stored baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 growth vs the baseline')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit 1 if any endpoint regressed')
+    args = parser.parse_args()
+    args.login_users = args.login_users or args.users
+
+    if args.url:
+        target = urllib.parse.urlsplit(args.url)
+        report = run_load(target.hostname, target.port or 80, args)
+    elif args.database_url:
+        report = run_stack(args, args.database_url)
+    else:
+        from benchmarks.local_postgres import local_postgres
+        with local_postgres() as dsn:
+            report = run_stack(args, dsn)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = print_report(report, baseline, args.tolerance)
+    for path in filter(None, (args.report, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
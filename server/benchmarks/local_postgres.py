@@ -0,0 +1,53 @@
+"""A throwaway PostgreSQL cluster for benchmarks.
+
+``initdb`` into a temporary directory, start it on a Unix socket only, hand
+out its DSN and delete everything on exit:
+
+    with local_postgres() as dsn:
+        ...
+
+The server binaries are looked up in ``PG_BIN`` and then on ``PATH``.
+Postgres refuses to run as root; use an unprivileged account (or point the
+load test at another throwaway database with ``--database-url``).
+"""
+import contextlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+PG_BIN = os.environ.get('PG_BIN', '')
+# A laptop-sized configuration; the defaults are tuned for 128MB machines
+SETTINGS = {
+    'shared_buffers': '256MB',
+    'max_connections': '200',
+    'listen_addresses': "''",
+}
+
+
+def _binary(name):
+    path = os.path.join(PG_BIN, name) if PG_BIN else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f"PostgreSQL's {name} not found; install PostgreSQL or set PG_BIN")
+    return path
+
+
+@contextlib.contextmanager
+def local_postgres(settings=None):
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        raise RuntimeError('PostgreSQL will not run as root; run as another user or pass --database-url')
+    initdb, pg_ctl = _binary('initdb'), _binary('pg_ctl')
+    root = tempfile.mkdtemp(prefix='lydistories-pg-')
+    data = os.path.join(root, 'data')
+    options = ' '.join(f'-c {key}={value}' for key, value in {**SETTINGS, **(settings or {})}.items())
+    try:
+        subprocess.run([initdb, '-D', data, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8', '--no-instructions'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_ctl, '-D', data, '-l', os.path.join(root, 'postgres.log'), '-w',
+                        '-o', f'{options} -k {root}', 'start'], check=True, stdout=subprocess.DEVNULL)
+        try:
+            yield f'postgresql://postgres@/postgres?host={root}'
+        finally:
+            subprocess.run([pg_ctl, '-D', data, '-m', 'fast', '-w', 'stop'], stdout=subprocess.DEVNULL)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
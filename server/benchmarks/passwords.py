@@ -0,0 +1,126 @@
+"""Benchmark: login throughput and browse latency under a burst of logins.
+
+For each bcrypt cost, ``--clients`` request threads log in back to back
+for ``--duration`` seconds while a probe thread stands in for browse
+traffic (a ~1 ms pure-Python request every 10 ms). Each cost is run twice:
+
+- inline: every request thread hashes on its own, as login did before
+  passwords.py
+- pool: through passwords.verify_password, with ``--workers`` hash threads
+  and a ``--queue`` limit; refused logins count as 503s and retry after
+  a short pause
+
+and the table shows logins/s, login p50/p95, 503s and the browse probe's
+p50/p95, to help choose BCRYPT_ROUNDS and the pool settings.
+
+    cd server && python -m benchmarks.passwords [--costs 10,11,12] [--clients 8] [--duration 10]
+"""
+import argparse
+import os
+import threading
+import time
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import passwords
+
+PASSWORD = 'correct horse battery staple'
+PROBE_INTERVAL = 0.01
+RETRY_PAUSE = 0.05
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _browse_work():
+    # Roughly what a cached catalog page costs in Python: ~1 ms of bytecode
+    total = 0
+    for i in range(20000):
+        total += i * i
+    return total
+
+
+def run(mode, password_hash, clients, duration):
+    stop = threading.Event()
+    logins, busy, probes = [], [0], []
+    lock = threading.Lock()
+
+    def client():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                if mode == 'inline':
+                    ok = bcrypt.checkpw(PASSWORD.encode('utf-8'), password_hash.encode('utf-8'))
+                else:
+                    ok = passwords.verify_password(PASSWORD, password_hash)
+            except passwords.HashingBusy:
+                with lock:
+                    busy[0] += 1
+                time.sleep(RETRY_PAUSE)
+                continue
+            assert ok
+            with lock:
+                logins.append(time.perf_counter() - started)
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            _browse_work()
+            probes.append(time.perf_counter() - started)
+            time.sleep(PROBE_INTERVAL)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)] + [threading.Thread(target=probe)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'logins_per_sec': len(logins) / elapsed,
+        'login_p50': _percentile(logins, 0.5), 'login_p95': _percentile(logins, 0.95),
+        'busy': busy[0],
+        'browse_p50': _percentile(probes, 0.5), 'browse_p95': _percentile(probes, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark password hashing under concurrent logins.')
+    parser.add_argument('--costs', default='10,11,12', help='comma-separated bcrypt costs')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per run')
+    parser.add_argument('--workers', type=int, default=passwords.HASH_WORKERS, help='hash threads (pool mode)')
+    parser.add_argument('--queue', type=int, default=passwords.HASH_QUEUE, help='queue limit (pool mode)')
+    args = parser.parse_args()
+
+    passwords.HASH_WORKERS, passwords.HASH_QUEUE = args.workers, args.queue
+    print(f"{os.cpu_count()} cores, {args.clients} login threads, pool: {args.workers} workers, "
+          f"queue {args.queue}\n")
+    print(f"{'cost':>4} {'hash ms':>8} {'mode':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'503s':>6} "
+          f"{'browse p50':>11} {'browse p95':>11}")
+    for cost in (int(c) for c in args.costs.split(',')):
+        password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(cost)).decode('utf-8')
+        started = time.perf_counter()
+        bcrypt.checkpw(PASSWORD.encode('utf-8'), password_hash.encode('utf-8'))
+        single = time.perf_counter() - started
+        for mode in ('inline', 'pool'):
+            result = run(mode, password_hash, args.clients, args.duration)
+            passwords.shutdown_pool()
+            print(f"{cost:>4} {single * 1000:>8.0f} {mode:>7} {result['logins_per_sec']:>9.1f} "
+                  f"{result['login_p50'] * 1000:>8.0f} {result['login_p95'] * 1000:>8.0f} {result['busy']:>6} "
+                  f"{result['browse_p50'] * 1000:>11.1f} {result['browse_p95'] * 1000:>11.1f}")
+    print(f"\nbrowse: ~1 ms of Python every {PROBE_INTERVAL * 1000:.0f} ms on another thread; "
+          "times in ms include waiting for the CPU")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark: PDF text extraction throughput vs. number of pool processes.
+
+Generates a corpus of multi-hundred-page PDFs (plain Type1-font text pages,
+written directly so no PDF library beyond PyPDF2 is needed), then extracts
+each one with 1, 2, 4, ... processes up to the core count and reports
+pages/sec and speedup over the serial run.
+
+    cd server && python -m benchmarks.pdf_extraction [--docs 4] [--pages 300] [--workers 1,2,4]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import pdf_extract
+from pdf_extract import extract_pages, shutdown_pool
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud').split()
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_pdf(path, pages, rng, lines_per_page=45):
+    """Write a minimal but valid PDF with ``pages`` pages of random text."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            ' '.join(f'{4 + 2 * i} 0 R' for i in range(pages)), pages)).encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i in range(pages):
+        lines = [' '.join(rng.choices(WORDS, k=12)) for _ in range(lines_per_page)]
+        stream = '\n'.join(
+            f'BT /F1 10 Tf 40 {800 - 16 * n} Td ({_escape(line)}) Tj ET' for n, line in enumerate(lines)
+        ).encode('latin-1')
+        objects.append((f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] '
+                        f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>').encode())
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parallel PDF extraction.')
+    parser.add_argument('--docs', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--workers', default='', help='comma-separated process counts (default: 1,2,4.. up to cores)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(n) for n in args.workers.split(',')]
+    else:
+        counts, n = [], 1
+        while n < cores:
+            counts.append(n)
+            n *= 2
+        counts.append(cores)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix='lydistories-pdf-bench-') as tmp:
+        print(f"Generating {args.docs} PDFs x {args.pages} pages ...")
+        paths = []
+        for i in range(args.docs):
+            path = os.path.join(tmp, f'doc{i}.pdf')
+            make_pdf(path, args.pages, rng)
+            paths.append(path)
+
+        print(f"\n{cores} cores available\n")
+        print(f"{'processes':>10} {'total s':>9} {'pages/s':>9} {'speedup':>8}")
+        baseline = None
+        reference = None
+        pdf_extract.PDF_PARALLEL_MIN_PAGES = 0
+        for count in counts:
+            # Warm the pool so process start-up isn't billed to the first document
+            if count > 1:
+                extract_pages(paths[0], workers=count)
+            started = time.perf_counter()
+            results = [extract_pages(path, workers=count) for path in paths]
+            elapsed = time.perf_counter() - started
+
+            texts = [r['pages'] for r in results]
+            if reference is None:
+                reference = texts
+            elif texts != reference:
+                raise SystemExit(f"Output with {count} processes differs from the serial run")
+
+            rate = args.docs * args.pages / elapsed
+            baseline = baseline or rate
+            print(f"{count:>10} {elapsed:>9.2f} {rate:>9.0f} {rate / baseline:>7.2f}x")
+            per_doc = [r['pages_per_sec'] for r in results]
+            print(f"{'':>10} per document: median {statistics.median(per_doc):.0f} pages/s")
+        shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""Query-plan regression check: no sequential scans on the hot paths.
+
+Copies the definitions of the real tables, indexes included, into TEMP tables
+(which shadow them for this session only, so nothing is written to the
+database), fills them with a large synthetic dataset, runs VACUUM ANALYZE and
+EXPLAINs the SQL behind each hot route. Exits with status 1 if any plan still
+contains a Seq Scan, so it can gate CI after a schema or query change.
+
+    cd server && python -m benchmarks.query_plans [--scale 1.0] [--verbose]
+
+Requires the migrations to have run. Route SQL that lives inline in a
+handler is repeated in QUERIES below and has to be kept in step with it;
+helpers that take a cursor (search, entitlements, pages, jobs) are called
+directly through a cursor that EXPLAINs every statement it runs.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import entitlements
+import jobs
+from content_pages import fetch_pages, page_total
+from pagination import keyset_filter, keyset_order
+from search import search_catalog, suggest
+
+TABLES = ('users', 'content', 'payments', 'user_content_access', 'bookmarks',
+          'reading_progress', 'content_pages', 'jobs')
+CATALOG_COLUMNS = ['id', 'title', 'author', 'category', 'description', 'preview_text', 'cover_image',
+                   'page_count', 'price', 'is_featured', 'created_at']
+USER_ID = 4242
+CONTENT_ID = 1234
+PAGE = 21
+
+
+def seed(cur, scale):
+    """Fill the TEMP tables. Sizes are per ``scale``; ids are explicit so no real sequence is used."""
+    def n(count):
+        return max(int(count * scale), 100)
+
+    users, content = n(50000), n(20000)
+    for table in TABLES:
+        cur.execute(f'DROP TABLE IF EXISTS pg_temp.{table}')
+        cur.execute(f'CREATE TEMP TABLE {table} (LIKE public.{table} INCLUDING ALL)')
+
+    cur.execute('''
+        INSERT INTO users (id, name, email, password_hash, role, created_at)
+        SELECT i, 'User ' || i, 'user' || i || '@example.com', 'x',
+               CASE WHEN i %% 1000 = 0 THEN 'admin' ELSE 'user' END,
+               now() - (i || ' minutes')::interval
+        FROM generate_series(1, %s) AS i
+    ''', (users,))
+    cur.execute('''
+        INSERT INTO content (id, title, author, category, description, preview_text, file_path,
+                            full_text, page_count, price, is_featured, created_at, updated_at)
+        SELECT i, 'Title ' || md5(i::text), 'Author ' || (i %% 2000),
+               (ARRAY['book', 'guide', 'article', 'document'])[1 + i %% 4],
+               repeat(md5((i * 7)::text) || ' ', 6), repeat(md5((i * 3)::text) || ' ', 15),
+               'blobs/' || left(md5(i::text), 2) || '/' || md5(i::text) || '.pdf',
+               repeat(md5((i * 11)::text) || ' ', 60), 5, 5000, i %% 50 = 0,
+               now() - (i || ' hours')::interval, now()
+        FROM generate_series(1, %s) AS i
+    ''', (content,))
+    cur.execute('''
+        UPDATE content SET search_vector = content_search_document(title, author, description),
+                           full_text_vector = content_body_document(full_text)
+    ''')
+    cur.execute('''
+        INSERT INTO content_pages (content_id, page_no, text)
+        SELECT c, p, repeat('page text ', 50) FROM generate_series(1, %s) AS c, generate_series(1, 5) AS p
+    ''', (content,))
+    cur.execute('''
+        INSERT INTO payments (id, user_id, content_id, phone_number, amount, transaction_id, status, created_at)
+        SELECT i, 1 + i %% %s, 1 + (i * 7) %% %s, '0700000000', 5000, 'TXN' || i,
+               CASE WHEN i %% 20 < 14 THEN 'confirmed' WHEN i %% 20 < 19 THEN 'pending' ELSE 'failed' END,
+               now() - (i || ' minutes')::interval
+        FROM generate_series(1, %s) AS i
+    ''', (users, content, n(300000)))
+    for table, extra_col, extra_val, count in (
+            ('user_content_access', 'granted_at', "now() - (i || ' minutes')::interval", n(150000)),
+            ('bookmarks', 'created_at', "now() - (i || ' minutes')::interval", n(100000)),
+            ('reading_progress', 'last_page', '1 + i %% 5', n(100000))):
+        cur.execute(f'''
+            INSERT INTO {table} (id, user_id, content_id, {extra_col})
+            SELECT i, 1 + i %% %s, 1 + (i * 13) %% %s, {extra_val}
+            FROM generate_series(1, %s) AS i
+            ON CONFLICT DO NOTHING
+        ''', (users, content, count))
+    cur.execute('''
+        INSERT INTO jobs (id, kind, content_id, status, run_at, locked_at)
+        SELECT i, 'extract_pdf', CASE WHEN i %% 3 = 0 THEN NULL ELSE 1 + i %% %s END,
+               CASE WHEN i %% 100 = 0 THEN 'queued' WHEN i %% 100 = 1 THEN 'running' ELSE 'done' END,
+               now() - (i || ' minutes')::interval, now() - (i || ' minutes')::interval
+        FROM generate_series(1, %s) AS i
+    ''', (content, n(20000)))
+    return {'users': users, 'content': content}
+
+
+def queries():
+    """``(name, sql, params)`` for route SQL that isn't in a helper (mirrors routes/*.py)."""
+    after = (datetime.datetime.now() - datetime.timedelta(days=30), 10 ** 9)
+    catalog = f'SELECT {", ".join(CATALOG_COLUMNS)} FROM content WHERE 1=1'
+    key_sql, key_params = keyset_filter(after)
+    pay_sql, pay_params = keyset_filter(after, 'p.created_at', 'p.id')
+    bm_sql, bm_params = keyset_filter(after, 'b.created_at', 'b.id')
+    return [
+        ('list_content', f'{catalog} AND TRUE ORDER BY {keyset_order()} LIMIT %s', [PAGE]),
+        ('list_content next page', f'{catalog} AND {key_sql} ORDER BY {keyset_order()} LIMIT %s',
+         key_params + [PAGE]),
+        ('list_content ?category=', f'{catalog} AND category = %s AND TRUE ORDER BY {keyset_order()} LIMIT %s',
+         ['guide', PAGE]),
+        ('list_content ?featured=', f'{catalog} AND is_featured = TRUE AND TRUE ORDER BY {keyset_order()} LIMIT %s',
+         [PAGE]),
+        ('get_content', 'SELECT updated_at FROM content WHERE id = %s', [CONTENT_ID]),
+        ('get_content_pages progress',
+         'SELECT last_page FROM reading_progress WHERE user_id = %s AND content_id = %s', [USER_ID, CONTENT_ID]),
+        ('import_catalog resume check', 'SELECT file_path FROM content WHERE file_path = ANY(%s)',
+         [['blobs/aa/missing.pdf', 'blobs/bb/missing.pdf']]),
+        ('delete_content bookmarks', 'DELETE FROM bookmarks WHERE content_id = %s', [CONTENT_ID]),
+        ('delete_content progress', 'DELETE FROM reading_progress WHERE content_id = %s', [CONTENT_ID]),
+        ('delete_content access', 'DELETE FROM user_content_access WHERE content_id = %s', [CONTENT_ID]),
+        ('delete_content payments', 'DELETE FROM payments WHERE content_id = %s', [CONTENT_ID]),
+        ('delete_content pages', 'DELETE FROM content_pages WHERE content_id = %s', [CONTENT_ID]),
+        # What ON DELETE SET NULL does to jobs when the content row goes
+        ('delete_content jobs', 'UPDATE jobs SET content_id = NULL WHERE content_id = %s', [CONTENT_ID]),
+        ('delete_user bookmarks', 'DELETE FROM bookmarks WHERE user_id = %s', [USER_ID]),
+        ('delete_user progress', 'DELETE FROM reading_progress WHERE user_id = %s', [USER_ID]),
+        ('delete_user access', 'DELETE FROM user_content_access WHERE user_id = %s', [USER_ID]),
+        ('delete_user payments', 'DELETE FROM payments WHERE user_id = %s', [USER_ID]),
+        ('confirm_payment', 'SELECT * FROM payments WHERE id = %s AND user_id = %s AND status = %s',
+         [777, USER_ID, 'pending']),
+        ('payment_history', f'''
+            SELECT p.*, c.title as content_title FROM payments p LEFT JOIN content c ON p.content_id = c.id
+            WHERE p.user_id = %s AND {pay_sql} ORDER BY {keyset_order('p.created_at', 'p.id')} LIMIT %s
+         ''', [USER_ID] + pay_params + [PAGE]),
+        ('get_stats users', "SELECT COUNT(*) as c FROM users WHERE role = 'user'", []),
+        ('get_stats content', 'SELECT COUNT(*) as c FROM content', []),
+        ('get_stats payments', "SELECT COUNT(*) as c FROM payments WHERE status = 'confirmed'", []),
+        ('get_stats revenue', "SELECT COALESCE(SUM(amount), 0) as r FROM payments WHERE status = 'confirmed'", []),
+        ('get_stats recent', '''
+            SELECT p.*, u.name as user_name, c.title as content_title
+            FROM payments p LEFT JOIN users u ON p.user_id = u.id LEFT JOIN content c ON p.content_id = c.id
+            WHERE p.status = 'confirmed' ORDER BY p.created_at DESC LIMIT 10
+         ''', []),
+        ('list_users', f'SELECT id, name, email, role, created_at FROM users WHERE {key_sql} '
+                       f'ORDER BY {keyset_order()} LIMIT %s', key_params + [PAGE]),
+        ('get_bookmarks', f'''
+            SELECT b.id, b.created_at, c.id as content_id, c.title FROM bookmarks b
+            JOIN content c ON b.content_id = c.id
+            WHERE b.user_id = %s AND {bm_sql} AND b.content_id = %s
+            ORDER BY {keyset_order('b.created_at', 'b.id')} LIMIT %s
+         ''', [USER_ID] + bm_params + [CONTENT_ID, PAGE]),
+        ('user_dashboard purchases', '''
+            SELECT c.id, c.title, c.author, c.category, c.cover_image, c.page_count,
+                   rp.progress_percent, rp.last_page
+            FROM user_content_access uca
+            JOIN content c ON uca.content_id = c.id
+            LEFT JOIN reading_progress rp ON rp.content_id = c.id AND rp.user_id = %s
+            WHERE uca.user_id = %s ORDER BY uca.granted_at DESC
+         ''', [USER_ID, USER_ID]),
+        ('user_dashboard bookmarks', 'SELECT COUNT(*) as c FROM bookmarks WHERE user_id = %s', [USER_ID]),
+        ('user_dashboard spent',
+         "SELECT COALESCE(SUM(amount), 0) as t FROM payments WHERE user_id = %s AND status = 'confirmed'",
+         [USER_ID]),
+        ('get_progress', 'SELECT * FROM reading_progress WHERE user_id = %s AND content_id = %s',
+         [USER_ID, CONTENT_ID]),
+    ]
+
+
+class ExplainCursor(psycopg2.extras.RealDictCursor):
+    """Records the plan of every statement before running it."""
+
+    plans = []
+
+    def execute(self, query, vars=None):
+        if query.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+            super().execute('EXPLAIN (FORMAT JSON) ' + query, vars)
+            ExplainCursor.plans.append(self.fetchone()['QUERY PLAN'][0]['Plan'])
+        return super().execute(query, vars)
+
+
+def helper_calls(cur):
+    """``(name, callable)`` for the hot queries that live in helper modules."""
+    catalog_ids = list(range(CONTENT_ID, CONTENT_ID + PAGE))
+    return [
+        ('list_content ?search=', lambda: search_catalog(cur, CATALOG_COLUMNS, 'Author 17', limit=PAGE - 1)),
+        ('suggest_content', lambda: suggest(cur, 'title 3a', 8)),
+        ('list_content access flags', lambda: entitlements.accessible_content_ids(cur, USER_ID, 'user', catalog_ids)),
+        ('get_content_pages total', lambda: page_total(cur, CONTENT_ID)),
+        ('get_content_pages window', lambda: fetch_pages(cur, CONTENT_ID, 3, 5)),
+        ('worker claim', lambda: jobs.claim(cur, 'plans')),
+        ('worker requeue_stale', lambda: jobs.requeue_stale(cur)),
+        ('job_status', lambda: jobs.get_job(cur, 99)),
+    ]
+
+
+def seq_scans(plan):
+    """Relations read with a (parallel) sequential scan anywhere in ``plan``.
+
+    System catalogs (e.g. the one-off pg_extension lookup in search.py) are tiny and ignored.
+    """
+    found = []
+    if plan['Node Type'].endswith('Seq Scan') and not plan.get('Relation Name', '').startswith('pg_'):
+        found.append(plan.get('Relation Name', '?'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def node_summary(plan):
+    """Scan nodes in the plan, e.g. ``Index Scan idx_payments_content``."""
+    parts = []
+    if 'Scan' in plan['Node Type']:
+        parts.append(f"{plan['Node Type']} {plan.get('Index Name') or plan.get('Relation Name', '')}".strip())
+    for child in plan.get('Plans', []):
+        parts.extend(node_summary(child))
+    return parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help='dataset size multiplier (small tables are rightly seq-scanned, keep it near 1)')
+    parser.add_argument('--verbose', action='store_true', help='print every scan node')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    # VACUUM can't run in a transaction; TEMP tables live as long as the session
+    conn.autocommit = True
+    cur = conn.cursor(cursor_factory=ExplainCursor)
+
+    start = time.perf_counter()
+    sizes = seed(cur, args.scale)
+    for table in TABLES:
+        cur.execute(f'VACUUM ANALYZE pg_temp.{table}')
+    print(f"Seeded {sizes['users']} users, {sizes['content']} titles in {time.perf_counter() - start:.1f}s")
+
+    results = []
+    for name, sql, params in queries():
+        cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        results.append((name, [cur.fetchone()['QUERY PLAN'][0]['Plan']]))
+    conn.autocommit = False
+    for name, call in helper_calls(cur):
+        ExplainCursor.plans = []
+        call()
+        results.append((name, ExplainCursor.plans))
+    conn.rollback()
+
+    failures = 0
+    for name, plans in results:
+        scanned = [rel for plan in plans for rel in seq_scans(plan)]
+        failures += bool(scanned)
+        status = f"FAIL seq scan on {', '.join(sorted(set(scanned)))}" if scanned else 'ok'
+        print(f"{name:<32} {status}")
+        if args.verbose or scanned:
+            for plan in plans:
+                print(f"{'':<32}   {'; '.join(node_summary(plan)) or plan['Node Type']}")
+
+    cur.close()
+    conn.close()
+    print(f"{len(results) - failures}/{len(results)} queries avoid sequential scans")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
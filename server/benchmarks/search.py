@@ -0,0 +1,145 @@
+"""Benchmark: ILIKE catalog search vs. the tsvector/GIN search engine.
+
+Generates a synthetic corpus (Zipf-distributed vocabulary) into a TEMP
+``content`` table that shadows the real one for this session, builds the
+same GIN index as production, then times both search paths for a mix of
+common, rare and multi-word queries.
+
+    cd server && python -m benchmarks.search [--docs 100000] [--repeat 20]
+
+Requires the migrations to have run (for the content_*_document() functions).
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import time
+import psycopg2
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from search import search_catalog
+
+COLUMNS = ['id', 'title', 'author', 'category', 'description', 'preview_text', 'cover_image',
+           'page_count', 'price', 'is_featured', 'created_at']
+CATEGORIES = ('book', 'guide', 'article', 'document')
+
+
+def make_vocabulary(rng, size):
+    syllables = ['ka', 'lo', 'mi', 'ra', 'tu', 'ne', 'si', 'bo', 'da', 'we', 'yo', 'gu', 'pe', 'zi']
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def zipf_words(rng, vocab, weights, n):
+    return ' '.join(rng.choices(vocab, cum_weights=weights, k=n))
+
+
+def load_corpus(cur, docs, seed):
+    rng = random.Random(seed)
+    vocab = make_vocabulary(rng, 20000)
+    cum, total = [], 0.0
+    for rank in range(1, len(vocab) + 1):
+        total += 1.0 / rank
+        cum.append(total)
+    authors = [zipf_words(rng, vocab, cum, 2).title() for _ in range(2000)]
+
+    cur.execute('DROP TABLE IF EXISTS pg_temp.content')
+    cur.execute('''
+        CREATE TEMP TABLE content (
+            id INTEGER PRIMARY KEY, title TEXT, author TEXT, category TEXT, description TEXT,
+            preview_text TEXT, cover_image TEXT, full_text TEXT, page_count INTEGER, price REAL,
+            is_featured BOOLEAN, created_at TIMESTAMP, search_vector tsvector, full_text_vector tsvector
+        )
+    ''')
+    buf = io.StringIO()
+    for i in range(1, docs + 1):
+        full_text = zipf_words(rng, vocab, cum, 400)
+        row = [
+            str(i), zipf_words(rng, vocab, cum, rng.randint(2, 6)).title(), rng.choice(authors),
+            rng.choice(CATEGORIES), zipf_words(rng, vocab, cum, 30), full_text[:500], '\\N',
+            full_text, str(rng.randint(5, 400)), '5000', 't' if rng.random() < 0.05 else 'f',
+            '2026-01-01 00:00:00',
+        ]
+        buf.write('\t'.join(row) + '\n')
+    buf.seek(0)
+    cur.copy_expert(
+        'COPY content (id, title, author, category, description, preview_text, cover_image, '
+        'full_text, page_count, price, is_featured, created_at) FROM STDIN', buf)
+    cur.execute('''
+        UPDATE content SET search_vector = content_search_document(title, author, description),
+                           full_text_vector = content_body_document(full_text)
+    ''')
+    cur.execute('CREATE INDEX ON content USING GIN (search_vector)')
+    cur.execute('CREATE INDEX ON content USING GIN (full_text_vector)')
+    cur.execute('ANALYZE content')
+    return vocab
+
+
+def ilike_search(cur, text, limit):
+    pattern = f'%{text}%'
+    cur.execute(f'''
+        SELECT {', '.join(COLUMNS)} FROM content
+        WHERE title ILIKE %s OR author ILIKE %s OR description ILIKE %s
+        ORDER BY created_at DESC, id DESC LIMIT %s
+    ''', (pattern, pattern, pattern, limit + 1))
+    return cur.fetchall()
+
+
+def fts_search(cur, text, limit):
+    return search_catalog(cur, COLUMNS, text, limit=limit)[0]
+
+
+def timed(fn, cur, text, limit, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(cur, text, limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    start = time.perf_counter()
+    vocab = load_corpus(cur, args.docs, args.seed)
+    # The index is built right after an UPDATE, so it only becomes usable to
+    # later transactions. TEMP tables survive the commit.
+    conn.commit()
+    print(f"Loaded {args.docs} documents in {time.perf_counter() - start:.1f}s")
+
+    queries = {
+        'common term': vocab[0],
+        'mid-frequency term': vocab[200],
+        'rare term': vocab[15000],
+        'two terms': f'{vocab[5]} {vocab[40]}',
+        'phrase': f'"{vocab[0]} {vocab[1]}"',
+    }
+    print(f"{'query':<20} | {'ILIKE p50':>10} {'p95':>8} | {'FTS p50':>10} {'p95':>8} {'hits':>5}")
+    for label, text in queries.items():
+        ilike = timed(ilike_search, cur, text, args.limit, args.repeat)
+        fts = timed(fts_search, cur, text, args.limit, args.repeat)
+        hits = len(fts_search(cur, text, args.limit))
+        print(f"{label:<20} | {ilike[0]:>10.2f} {ilike[1]:>8.2f} | {fts[0]:>10.2f} {fts[1]:>8.2f} {hits:>5}")
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
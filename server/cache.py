@@ -0,0 +1,157 @@
+"""Small in-process caches. Each gunicorn worker has its own copy.
+
+``SharedVersions`` is the exception: version counters shared by every
+process on the host, which the caches compare against to know when to drop
+entries another worker invalidated.
+"""
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: bumps are still serialized between threads, just not across processes
+    fcntl = None
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry time-to-live.
+
+    ``get`` returns ``None`` on a miss, so ``None`` itself can't be cached.
+    Hit, miss and eviction counts are kept for ``stats()``.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_sec': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+COUNTER = struct.Struct('<Q')
+
+
+class SharedVersions:
+    """An array of version counters in a memory-mapped file shared by the host's processes.
+
+    ``bump(i)`` sets counter ``i`` to ``max(current + 1, time.time_ns())``
+    under an exclusive flock, so it always increases: two bumps within one
+    clock tick still differ. Counters start at the time the file was
+    created, so a wiped /tmp never brings back a version a client may have
+    seen. ``read(i)`` is a stat of the path (to notice that the file was
+    replaced) plus a read from the mapping.
+    """
+
+    def __init__(self, path, slots=1):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._inode = None
+
+    def _open(self):
+        size = self.slots * COUNTER.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                filled = os.fstat(fd).st_size // COUNTER.size
+                if filled < self.slots:
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, COUNTER.pack(time.time_ns()) * (self.slots - filled), filled * COUNTER.size)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            table = mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        if self._pid == os.getpid():
+            # Readers may still hold the old mapping; it is unmapped once they drop it
+            os.close(self._fd)
+        self._fd, self._map, self._inode = fd, table, os.fstat(fd).st_ino
+        # Per process: after a fork, flock on the inherited descriptor would be shared with the parent
+        self._pid = os.getpid()
+
+    def _stale(self):
+        """Whether to reopen: after a fork, or when the file was deleted or replaced."""
+        if self._pid != os.getpid():
+            return True
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except OSError:
+            return True
+
+    def _current(self):
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._open()
+        return self._map
+
+    def read(self, index=0):
+        return COUNTER.unpack_from(self._current(), index % self.slots * COUNTER.size)[0]
+
+    def bump(self, index=0):
+        """Advance counter ``index`` and return its new value."""
+        offset = index % self.slots * COUNTER.size
+        with self._lock:
+            if self._stale():
+                self._open()
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                version = max(COUNTER.unpack_from(self._map, offset)[0] + 1, time.time_ns())
+                COUNTER.pack_into(self._map, offset, version)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return version
@@ -0,0 +1,116 @@
+"""Shared cache for catalog listings (``GET /api/content``).
+
+Pages are stored once for everybody as pre-serialized JSON fragments; the
+per-user ``has_access`` flag is spliced in when the response is rendered, so
+a cache hit costs at most one entitlement lookup and no re-serialization.
+
+Each worker has its own LRU, but invalidation is host-wide: ``invalidate()``
+bumps a version counter in a shared file (``SharedVersions`` in cache.py)
+and every worker drops its entries the next time it sees the version
+change. That keeps an admin's edit visible on the next request regardless
+of which gunicorn worker serves it.
+"""
+import json
+import os
+import tempfile
+import threading
+from cache import LRUCache, SharedVersions
+
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 512))
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 300))
+CATALOG_CACHE_MARKER = os.environ.get(
+    'CATALOG_CACHE_MARKER', os.path.join(tempfile.gettempdir(), 'lydistories-catalog.version'))
+
+_HAS_ACCESS_TRUE = b',"has_access":true}'
+_HAS_ACCESS_FALSE = b',"has_access":false}'
+
+
+class CatalogPage:
+    """One cached listing page: item ids plus each item's JSON minus its closing brace."""
+
+    __slots__ = ('ids', 'fragments', 'next_cursor')
+
+    def __init__(self, items, next_cursor):
+        self.ids = [item['id'] for item in items]
+        self.fragments = [
+            json.dumps(item, separators=(',', ':'), ensure_ascii=False).encode('utf-8')[:-1]
+            for item in items
+        ]
+        self.next_cursor = json.dumps(next_cursor).encode('utf-8')
+
+    def render(self, allowed_ids):
+        parts = [
+            fragment + (_HAS_ACCESS_TRUE if item_id in allowed_ids else _HAS_ACCESS_FALSE)
+            for item_id, fragment in zip(self.ids, self.fragments)
+        ]
+        return b'{"content":[' + b','.join(parts) + b'],"next_cursor":' + self.next_cursor + b'}'
+
+
+class CatalogCache:
+    def __init__(self, maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL, marker=CATALOG_CACHE_MARKER):
+        self._pages = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # The version doubles as the catalog ETag, so it must never repeat:
+        # a counter, not a timestamp that two invalidations could share
+        self._versions = SharedVersions(marker)
+        self._seen_version = self._read_version()
+        self.invalidations = 0
+
+    @staticmethod
+    def key(category, search, featured, limit, after):
+        return (category or '', ' '.join(search.lower().split()), bool(featured), limit, after or '')
+
+    def _read_version(self):
+        try:
+            return self._versions.read()
+        except OSError:
+            return 0
+
+    def _sync(self):
+        """Drop local entries if another worker invalidated since we last looked."""
+        version = self._read_version()
+        if version != self._seen_version:
+            with self._lock:
+                if version != self._seen_version:
+                    self._pages.clear()
+                    self._seen_version = version
+
+    def get(self, key):
+        self._sync()
+        return self._pages.get(key)
+
+    def store(self, key, items, next_cursor, version):
+        """Cache a freshly queried page.
+
+        ``version`` is the value of ``self.version`` taken before the query
+        ran; if the catalog was invalidated meanwhile the page may predate
+        the write, so it is returned but not cached.
+        """
+        page = CatalogPage(items, next_cursor)
+        self._sync()
+        if version == self._seen_version:
+            self._pages.set(key, page)
+        return page
+
+    def invalidate(self):
+        with self._lock:
+            self._pages.clear()
+            self.invalidations += 1
+            try:
+                self._seen_version = self._versions.bump()
+            except OSError as e:
+                print(f"Catalog cache version update failed: {e}")
+
+    @property
+    def version(self):
+        """Changes whenever the catalog is invalidated on this host."""
+        self._sync()
+        return self._seen_version
+
+    def stats(self):
+        stats = self._pages.stats()
+        stats['invalidations'] = self.invalidations
+        return stats
+
+
+catalog_cache = CatalogCache()
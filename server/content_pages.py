@@ -0,0 +1,82 @@
+"""Per-page storage of content text for the paged reading API.
+
+PDF uploads store one row per PDF page (empty pages included, so page
+numbers match the document). Text typed into the admin editor is split into
+pages of roughly ``PAGE_CHARS`` characters on paragraph boundaries.
+"""
+import io
+import psycopg2.extras
+
+PAGE_CHARS = 3000
+DEFAULT_WINDOW = 5
+MAX_WINDOW = 20
+
+
+def chunk_text(text, page_chars=PAGE_CHARS):
+    """Split plain text into pages without breaking paragraphs where possible."""
+    if not text:
+        return []
+    pages, current, size = [], [], 0
+    for para in text.split('\n\n'):
+        # A paragraph longer than a page is hard-wrapped
+        while len(para) > page_chars:
+            if current:
+                pages.append('\n\n'.join(current))
+                current, size = [], 0
+            pages.append(para[:page_chars])
+            para = para[page_chars:]
+        if current and size + len(para) > page_chars:
+            pages.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(para)
+        size += len(para) + 2
+    if current:
+        pages.append('\n\n'.join(current))
+    return pages
+
+
+def replace_pages(cur, content_id, pages):
+    """Store ``pages`` (page 1 first) as the text of ``content_id``."""
+    cur.execute('DELETE FROM content_pages WHERE content_id = %s', (content_id,))
+    if pages:
+        psycopg2.extras.execute_values(
+            cur,
+            'INSERT INTO content_pages (content_id, page_no, text) VALUES %s',
+            [(content_id, i, text or '') for i, text in enumerate(pages, start=1)],
+            page_size=200
+        )
+
+
+def copy_escape(text):
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_pages(cur, pages_by_content):
+    """Bulk-load pages for new content with COPY: ``{content_id: [page text, ...]}``.
+
+    Unlike replace_pages() nothing is deleted first, so only use it for rows
+    that have no pages yet (e.g. a bulk import).
+    """
+    buf = io.StringIO()
+    for content_id, pages in pages_by_content.items():
+        for page_no, text in enumerate(pages, start=1):
+            buf.write(f'{content_id}\t{page_no}\t{copy_escape(text or "")}\n')
+    buf.seek(0)
+    cur.copy_expert('COPY content_pages (content_id, page_no, text) FROM STDIN', buf)
+
+
+def page_total(cur, content_id):
+    cur.execute('SELECT max(page_no) AS total FROM content_pages WHERE content_id = %s', (content_id,))
+    row = cur.fetchone()
+    total = row['total'] if isinstance(row, dict) else row[0]
+    return total or 0
+
+
+def fetch_pages(cur, content_id, start, count):
+    cur.execute('''
+        SELECT page_no, text FROM content_pages
+        WHERE content_id = %s AND page_no >= %s AND page_no < %s
+        ORDER BY page_no
+    ''', (content_id, start, start + count))
+    return [dict(row) for row in cur.fetchall()]
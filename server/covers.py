@@ -0,0 +1,124 @@
+"""Resized cover images for the catalog.
+
+``/uploads/covers/<id>?w=320&v=<cover_image>`` returns the cover scaled to a
+fixed width, as WebP when the browser accepts it and JPEG otherwise, with
+metadata (EXIF, ICC profiles, comments) stripped. Requested widths snap up to
+one of ``COVER_WIDTHS`` so only a handful of files exist per cover.
+
+Derivatives are written to ``uploads/derived/<hash of cover key>/`` the first
+time they are asked for; new uploads also queue a ``cover_derivatives`` job
+that renders the catalog sizes ahead of time. Because ``v`` names the exact
+cover, a matching request can be cached as immutable; a stale ``v`` gets the
+current cover with a short lifetime instead.
+
+Pillow is needed to resize; without it the original file is served.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from storage import UPLOAD_DIR
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+COVER_WIDTHS = (160, 320, 480, 640, 960)
+# Sizes ContentCard asks for (1x and 2x), rendered when a cover is uploaded
+PREGENERATE_WIDTHS = (320, 640)
+DERIVED_DIR = os.path.join(UPLOAD_DIR, 'derived')
+WEBP_QUALITY = 78
+JPEG_QUALITY = 80
+
+
+def available():
+    return Image is not None
+
+
+def snap_width(width):
+    for allowed in COVER_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return COVER_WIDTHS[-1]
+
+
+def _derived_dir(cover_key):
+    return os.path.join(DERIVED_DIR, hashlib.sha256(cover_key.encode('utf-8')).hexdigest()[:32])
+
+
+def derivative_path(cover_key, width, fmt):
+    return os.path.join(_derived_dir(cover_key), f'w{width}.{fmt}')
+
+
+def render(cover_key, width, fmt):
+    """Create (if needed) and return the path of the ``fmt`` ('webp'/'jpeg') derivative."""
+    target = derivative_path(cover_key, width, fmt)
+    if os.path.exists(target):
+        return target
+
+    source = os.path.join(UPLOAD_DIR, cover_key)
+    with Image.open(source) as img:
+        # Let the JPEG decoder downscale while decoding (much faster for big photos)
+        img.draft('RGB', (width, width * 4))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        if fmt == 'jpeg' and img.mode == 'RGBA':
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        # No exif/icc_profile/comment is carried over to the output
+        img.info = {}
+        buf = io.BytesIO()
+        if fmt == 'webp':
+            img.save(buf, 'WEBP', quality=WEBP_QUALITY, method=4)
+        else:
+            img.save(buf, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    marker = os.path.join(directory, 'source')
+    if not os.path.exists(marker):
+        with open(marker, 'w') as f:
+            f.write(cover_key)
+    # Write-then-rename so concurrent requests never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, target)
+    return target
+
+
+def pregenerate(cur, payload):
+    """Job handler for ``cover_derivatives``: render the catalog sizes for a new cover."""
+    if not available():
+        return {'skipped': 'Pillow not installed'}
+    cover_key = payload['cover_image']
+    if not os.path.exists(os.path.join(UPLOAD_DIR, cover_key)):
+        return {'skipped': 'cover removed'}
+    for width in PREGENERATE_WIDTHS:
+        for fmt in ('webp', 'jpeg'):
+            render(cover_key, width, fmt)
+    return {'widths': list(PREGENERATE_WIDTHS)}
+
+
+def prune_derivatives():
+    """Remove derivatives whose source cover no longer exists. Returns how many covers."""
+    if not os.path.isdir(DERIVED_DIR):
+        return 0
+    removed = 0
+    for name in os.listdir(DERIVED_DIR):
+        directory = os.path.join(DERIVED_DIR, name)
+        try:
+            with open(os.path.join(directory, 'source')) as f:
+                source = f.read()
+        except OSError:
+            continue
+        if not os.path.exists(os.path.join(UPLOAD_DIR, source)):
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+    return removed
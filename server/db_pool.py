@@ -0,0 +1,307 @@
+import collections
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class PooledConnection:
+    """Thin proxy around a psycopg2 connection.
+
+    Behaves like the raw connection (cursor, commit, rollback, ...) except that
+    close() hands the connection back to its pool instead of closing the socket.
+    Used as a context manager it commits on success, rolls back on error and
+    always releases the connection. ``cursor_wrapper``, if set, maps the
+    requested cursor class to the one actually used (see query_stats.py).
+    """
+
+    __slots__ = ('_conn', '_pool', '_released', 'cursor_wrapper')
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+        self._released = False
+        self.cursor_wrapper = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name in PooledConnection.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def cursor(self, *args, **kwargs):
+        if self.cursor_wrapper is not None and len(args) < 2:
+            kwargs['cursor_factory'] = self.cursor_wrapper(
+                kwargs.get('cursor_factory') or self._conn.cursor_factory)
+        return self._conn.cursor(*args, **kwargs)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    @property
+    def closed(self):
+        return self._released or self._conn.closed
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if not self._released and not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool for a single worker process.
+
+    Connections are created lazily up to ``max_size``; ``min_size`` of them are
+    kept around even when idle. Idle connections older than ``idle_timeout`` and
+    any connection older than ``max_lifetime`` are closed and replaced. A
+    connection that has sat idle for more than ``check_interval`` seconds is
+    pinged with ``SELECT 1`` before being handed out. Returned connections are
+    rolled back so no transaction state leaks between requests.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10.0,
+                 idle_timeout=300.0, max_lifetime=3600.0, check_interval=30.0,
+                 connect_kwargs=None):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Invalid pool size: min=%s max=%s' % (min_size, max_size))
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.connect_kwargs = connect_kwargs or {}
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = collections.deque()   # (conn, returned_at)
+        self._created_at = {}              # id(conn) -> creation time
+        self._in_use = 0
+        self._opening = 0
+        self._closed = False
+
+        # Stats
+        self._started = time.monotonic()
+        self._checkouts = 0
+        self._recent_checkouts = collections.deque()
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+        self._failed_checks = 0
+
+    # ── Connection lifecycle ──
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        conn.autocommit = False
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, conn, now):
+        created = self._created_at.get(id(conn), now)
+        return self.max_lifetime and now - created > self.max_lifetime
+
+    def _healthy(self, conn, idle_since, now):
+        if conn.closed:
+            return False
+        if self.check_interval is not None and now - idle_since < self.check_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            self._failed_checks += 1
+            return False
+
+    def _reap_idle(self, now):
+        """Close idle connections past idle_timeout while keeping min_size open. Lock held."""
+        if not self.idle_timeout:
+            return
+        keep = collections.deque()
+        while self._idle:
+            conn, idle_since = self._idle.popleft()
+            total = len(self._idle) + len(keep) + self._in_use + self._opening + 1
+            if now - idle_since > self.idle_timeout and total > self.min_size:
+                self._discard(conn)
+            else:
+                keep.append((conn, idle_since))
+        self._idle = keep
+
+    # ── Public API ──
+
+    def getconn(self, timeout=None):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        requested = time.monotonic()
+        deadline = requested + timeout
+        waited = False
+
+        while True:
+            candidate = None
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeout('Connection pool is closed')
+                now = time.monotonic()
+                self._reap_idle(now)
+                while not self._idle and self._in_use + self._opening >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            'No database connection available after %.1fs (max_size=%d)'
+                            % (timeout, self.max_size))
+                    waited = True
+                    self._available.wait(remaining)
+                if self._idle:
+                    # LIFO keeps the warmest connections busy and lets the rest idle out
+                    candidate = self._idle.pop()
+                    self._in_use += 1
+                else:
+                    self._opening += 1
+
+            if candidate is not None:
+                conn, idle_since = candidate
+                now = time.monotonic()
+                if self._expired(conn, now) or not self._healthy(conn, idle_since, now):
+                    with self._lock:
+                        self._in_use -= 1
+                        self._discard(conn)
+                        self._available.notify()
+                    continue
+            else:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opening -= 1
+                        self._available.notify()
+                    raise
+                with self._lock:
+                    self._opening -= 1
+                    self._in_use += 1
+                    self._opened += 1
+                    self._created_at[id(conn)] = time.monotonic()
+
+            self._record_checkout(requested, waited)
+            return PooledConnection(conn, self)
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if isinstance(conn, PooledConnection):
+            conn.close()
+            return
+        reusable = not conn.closed
+        if reusable:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                reusable = False
+
+        with self._lock:
+            self._in_use -= 1
+            now = time.monotonic()
+            if not reusable or self._closed or self._expired(conn, now):
+                self._discard(conn)
+            else:
+                self._idle.append((conn, now))
+            self._available.notify()
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._discard(conn)
+            self._available.notify_all()
+
+    def abandon(self):
+        """Stop handing out connections without closing them.
+
+        Used in a forked child: the sockets belong to the parent, and closing
+        them here would terminate the parent's sessions. The caller must keep
+        a reference to the pool so the connections are never garbage collected.
+        """
+        with self._lock:
+            self._closed = True
+
+    def _record_checkout(self, requested, waited):
+        now = time.monotonic()
+        wait = now - requested
+        with self._lock:
+            self._checkouts += 1
+            self._recent_checkouts.append(now)
+            while self._recent_checkouts and now - self._recent_checkouts[0] > 60:
+                self._recent_checkouts.popleft()
+            if waited:
+                self._waits += 1
+                self._wait_time += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def stats(self):
+        """Snapshot of pool usage, suitable for JSON serialisation."""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent_checkouts and now - self._recent_checkouts[0] > 60:
+                self._recent_checkouts.popleft()
+            window = min(60.0, max(now - self._started, 1e-6))
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'opening': self._opening,
+                'total': self._in_use + len(self._idle) + self._opening,
+                'checkouts': self._checkouts,
+                'checkouts_per_sec': round(len(self._recent_checkouts) / window, 3),
+                'waits': self._waits,
+                'wait_time_total_ms': round(self._wait_time * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_time * 1000 / self._waits, 3) if self._waits else 0.0,
+                'wait_time_max_ms': round(self._max_wait * 1000, 3),
+                'timeouts': self._timeouts,
+                'connections_opened': self._opened,
+                'connections_discarded': self._discarded,
+                'failed_health_checks': self._failed_checks,
+                'uptime_sec': round(now - self._started, 1),
+            }
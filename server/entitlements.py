@@ -0,0 +1,36 @@
+"""Content entitlement resolution shared by the content and payment routes."""
+
+
+def is_admin(role):
+    return role == 'admin'
+
+
+def accessible_content_ids(cur, user_id, role, content_ids):
+    """Return the subset of ``content_ids`` the user may read.
+
+    Admins can read everything and anonymous users nothing, so neither costs a
+    query. Everyone else is resolved with a single ``content_id = ANY(...)``
+    lookup no matter how many ids are asked about.
+    """
+    content_ids = [int(cid) for cid in content_ids]
+    if not content_ids or not user_id:
+        return set()
+    if is_admin(role):
+        return set(content_ids)
+    cur.execute(
+        'SELECT content_id FROM user_content_access WHERE user_id = %s AND content_id = ANY(%s)',
+        (user_id, content_ids)
+    )
+    return {row['content_id'] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
+
+
+def has_access(cur, user_id, role, content_id):
+    return int(content_id) in accessible_content_ids(cur, user_id, role, [content_id])
+
+
+def annotate_access(cur, user_id, role, items):
+    """Set ``has_access`` on each serialized content dict in place."""
+    allowed = accessible_content_ids(cur, user_id, role, [item['id'] for item in items])
+    for item in items:
+        item['has_access'] = item['id'] in allowed
+    return items
@@ -0,0 +1,92 @@
+"""Serving stored uploads: validators, range requests, offload and signed URLs.
+
+By default files are sent by Flask with ``conditional=True``, which answers
+``Range``/``If-Range`` requests with 206 and honours ``If-None-Match``.
+Blobs (see storage.py) are named by their SHA-256, so that hash is used as
+a strong ETag and public blobs are cached as immutable.
+
+With ``UPLOAD_OFFLOAD=x-accel`` (nginx) or ``x-sendfile`` (Apache/lighttpd)
+the app only checks access and sets a header; the front server streams the
+bytes, ranges included, so a slow client never holds a gunicorn worker.
+nginx needs an ``internal`` location at ``UPLOAD_ACCEL_PREFIX`` aliased to
+the uploads directory.
+
+PDFs are never served from ``/uploads``; readers get a short-lived download
+URL signed with the JWT secret instead.
+"""
+import base64
+import hashlib
+import hmac
+import mimetypes
+import os
+import time
+from urllib.parse import quote
+from flask import Response, abort, send_file
+from werkzeug.security import safe_join
+from routes.auth import SECRET_KEY
+from storage import UPLOAD_DIR, BLOB_PREFIX
+
+UPLOAD_OFFLOAD = os.environ.get('UPLOAD_OFFLOAD', '').lower()
+UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+DOWNLOAD_URL_TTL = int(os.environ.get('DOWNLOAD_URL_TTL', 300))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+PUBLIC_MAX_AGE = 3600
+
+
+def _blob_etag(key):
+    """The content hash for blob keys (``blobs/aa/<sha256>.ext``), else None."""
+    if not key.startswith(BLOB_PREFIX + '/'):
+        return None
+    return os.path.splitext(os.path.basename(key))[0]
+
+
+def send_upload(key, private=False, download_name=None):
+    """Respond with the stored file at ``key`` (relative to the uploads directory)."""
+    path = safe_join(UPLOAD_DIR, key)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    etag = _blob_etag(key)
+    if UPLOAD_OFFLOAD in ('x-accel', 'x-sendfile'):
+        response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        if UPLOAD_OFFLOAD == 'x-accel':
+            response.headers['X-Accel-Redirect'] = UPLOAD_ACCEL_PREFIX.rstrip('/') + '/' + quote(key)
+        else:
+            response.headers['X-Sendfile'] = path
+        if download_name:
+            response.headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(download_name)}"
+    else:
+        response = send_file(path, conditional=True, etag=etag or True, download_name=download_name)
+
+    if private:
+        response.headers['Cache-Control'] = f'private, max-age={DOWNLOAD_URL_TTL}'
+    elif etag:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={PUBLIC_MAX_AGE}'
+    return response
+
+
+# ── Signed download URLs ──
+
+def _signature(content_id, user_id, expires):
+    message = f'download:{content_id}:{user_id}:{expires}'.encode('utf-8')
+    digest = hmac.new(SECRET_KEY.encode('utf-8'), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:24]).decode('ascii')
+
+
+def signed_download_url(content_id, user_id, ttl=DOWNLOAD_URL_TTL):
+    """A URL that serves ``content_id``'s PDF without a bearer token until it expires."""
+    expires = int(time.time()) + ttl
+    sig = _signature(content_id, user_id, expires)
+    return f'/api/downloads/{content_id}?u={user_id}&exp={expires}&sig={sig}', expires
+
+
+def verify_download(content_id, user_id, expires, sig):
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(content_id, user_id, expires), sig or '')
@@ -0,0 +1,31 @@
+"""gunicorn settings picked up automatically when gunicorn runs from server/.
+
+Command-line flags (bind, workers) still take precedence.
+"""
+import os
+
+# Threads per worker (gthread). A request waiting on bcrypt, the database or
+# a file doesn't hold the GIL, so the worker's other threads keep serving.
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def on_starting(server):
+    # Emptied by the start command before the job worker and gunicorn start,
+    # since both write to it; here it only has to exist
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # With --preload, app.py (which starts the token revocation listener) ran in
+    # the master; threads don't survive fork, so each worker starts its own
+    if server.cfg.preload_app:
+        from revocation import start
+        start()
+
+
+def child_exit(server, worker):
+    """A recycled or crashed worker's in-flight/pool gauges must stop counting."""
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,29 @@
+"""ETag / conditional-request helpers for JSON endpoints."""
+import hashlib
+from flask import Response, request
+
+
+def make_etag(*parts):
+    """Strong validator derived from the values that determine a response body."""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def cache_headers(response, etag, private):
+    """Attach the validator and ask caches to revalidate on every use.
+
+    Responses that depend on the caller's token are ``private`` so shared
+    caches never store them; ``Vary: Authorization`` keeps the browser and
+    service worker from mixing up anonymous and signed-in copies.
+    """
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = ('private' if private else 'public') + ', no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def not_modified(etag, private):
+    """A 304 response if the client already holds ``etag``, otherwise None."""
+    if request.if_none_match.contains(etag):
+        return cache_headers(Response(status=304), etag, private)
+    return None
@@ -0,0 +1,76 @@
+"""PDF ingestion: text extraction, page counting and preview generation.
+
+Extraction runs in the job worker (see worker.py), never inside a web
+request: a large upload can take tens of seconds. When the same file was
+extracted before, the upload request applies the cached pages directly.
+"""
+import os
+from content_pages import replace_pages
+from metrics import observe_extraction
+from pdf_extract import extract_pages
+from storage import UPLOAD_DIR, cached_extraction, store_extraction
+
+PREVIEW_CHARS = 500
+
+
+def apply_extraction(cur, content_id, pages, fill_preview, preview_text):
+    """Write extracted page texts into a content row and its content_pages."""
+    full_text = '\n\n'.join(text for text in pages if text)
+    updates = {'page_count': len(pages)}
+    if full_text:
+        updates['full_text'] = full_text
+        if fill_preview and not preview_text:
+            updates['preview_text'] = full_text[:PREVIEW_CHARS] + '...'
+
+    assignments = ', '.join(f'{col} = %s' for col in updates)
+    cur.execute(
+        f'UPDATE content SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = %s',
+        list(updates.values()) + [content_id]
+    )
+    if full_text:
+        replace_pages(cur, content_id, pages)
+    return len(full_text)
+
+
+def ingest_pdf(cur, payload):
+    """Job handler for ``extract_pdf``: fill in a content row from its uploaded PDF.
+
+    ``payload`` is ``{'content_id', 'file_path', 'sha256', 'fill_preview'}``.
+    If the row was deleted or has been given a different PDF since the job
+    was queued, or while it was being extracted, the job is a no-op. Text typed into the editor is kept when
+    the PDF has no extractable text (e.g. a scan). The result is cached by
+    hash so the same file is never extracted twice.
+    """
+    content_id = payload['content_id']
+    cur.execute('SELECT file_path FROM content WHERE id = %s', (content_id,))
+    row = cur.fetchone()
+    if not row or row['file_path'] != payload['file_path']:
+        return {'skipped': 'superseded'}
+
+    sha256 = payload.get('sha256')
+    pages = cached_extraction(cur, sha256) if sha256 else None
+    extraction = None
+    if pages is None:
+        # Extract with no transaction open, so admin edits of the title don't wait on it
+        cur.connection.commit()
+        extraction = extract_pages(os.path.join(UPLOAD_DIR, payload['file_path']))
+        observe_extraction(extraction)
+        pages = extraction['pages']
+
+    # The row may have been deleted or given another PDF meanwhile: then the result is dropped
+    cur.execute('SELECT file_path, preview_text FROM content WHERE id = %s FOR UPDATE', (content_id,))
+    row = cur.fetchone()
+    if not row or row['file_path'] != payload['file_path']:
+        return {'skipped': 'superseded'}
+    characters = apply_extraction(cur, content_id, pages, payload.get('fill_preview'), row['preview_text'])
+    if extraction is None:
+        return {'page_count': len(pages), 'characters': characters, 'cached': True}
+    if sha256 and not extraction['timed_out']:
+        store_extraction(cur, sha256, pages)
+    return {
+        'page_count': len(pages),
+        'characters': characters,
+        'timed_out_pages': extraction['timed_out'],
+        'extract_workers': extraction['workers'],
+        'pages_per_sec': extraction['pages_per_sec'],
+    }
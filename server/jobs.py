@@ -0,0 +1,111 @@
+"""Postgres-backed background job queue.
+
+Jobs are rows in the ``jobs`` table. The API enqueues them in the same
+transaction as the change they belong to, so a job never refers to a row that
+was rolled back. Workers (``python worker.py``) claim due jobs with
+``FOR UPDATE SKIP LOCKED``, so any number of them can poll the table without
+blocking each other or running a job twice.
+
+A failed job goes back to ``queued`` with an exponential backoff until it has
+used ``max_attempts``, then stays ``failed`` with the last error. A job whose
+worker died mid-run is requeued once its lock is older than
+``JOB_LOCK_TIMEOUT``.
+"""
+import json
+import os
+import socket
+
+JOB_CHANNEL = 'jobs'
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_BACKOFF_BASE = float(os.environ.get('JOB_BACKOFF_BASE', 10))
+JOB_BACKOFF_MAX = float(os.environ.get('JOB_BACKOFF_MAX', 600))
+JOB_LOCK_TIMEOUT = float(os.environ.get('JOB_LOCK_TIMEOUT', 900))
+
+JOB_COLUMNS = ('id, kind, payload, content_id, status, attempts, max_attempts, run_at, '
+               'last_error, result, created_at, updated_at')
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(cur, kind, payload, content_id=None, max_attempts=JOB_MAX_ATTEMPTS):
+    """Queue a job and wake idle workers once the transaction commits. Returns the job row."""
+    cur.execute(f'''
+        INSERT INTO jobs (kind, payload, content_id, max_attempts)
+        VALUES (%s, %s, %s, %s)
+        RETURNING {JOB_COLUMNS}
+    ''', (kind, json.dumps(payload), content_id, max_attempts))
+    job = cur.fetchone()
+    cur.execute(f'NOTIFY {JOB_CHANNEL}')
+    return job
+
+
+def claim(cur, worker):
+    """Lock the next due job for ``worker`` and mark it running, or return None."""
+    cur.execute(f'''
+        UPDATE jobs
+        SET status = 'running', attempts = attempts + 1, locked_by = %s,
+            locked_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE status = 'queued' AND run_at <= CURRENT_TIMESTAMP
+            ORDER BY run_at, id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {JOB_COLUMNS}
+    ''', (worker,))
+    return cur.fetchone()
+
+
+def complete(cur, job_id, result=None):
+    cur.execute('''
+        UPDATE jobs
+        SET status = 'done', result = %s, last_error = NULL, locked_by = NULL, locked_at = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    ''', (json.dumps(result) if result is not None else None, job_id))
+
+
+def backoff_seconds(attempts):
+    return min(JOB_BACKOFF_BASE * 2 ** max(attempts - 1, 0), JOB_BACKOFF_MAX)
+
+
+def fail(cur, job, error):
+    """Record a failed attempt: retry later with backoff, or give up for good."""
+    retry = job['attempts'] < job['max_attempts']
+    cur.execute('''
+        UPDATE jobs
+        SET status = %s, last_error = %s, locked_by = NULL, locked_at = NULL,
+            run_at = CURRENT_TIMESTAMP + make_interval(secs => %s),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    ''', ('queued' if retry else 'failed', str(error)[:2000],
+          backoff_seconds(job['attempts']) if retry else 0, job['id']))
+    return retry
+
+
+def requeue_stale(cur, lock_timeout=JOB_LOCK_TIMEOUT):
+    """Put jobs whose worker vanished mid-run back in the queue. Returns how many."""
+    cur.execute('''
+        UPDATE jobs
+        SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+            last_error = COALESCE(last_error, 'worker lost while running'),
+            locked_by = NULL, locked_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running' AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+    ''', (lock_timeout,))
+    return cur.rowcount
+
+
+def get_job(cur, job_id):
+    cur.execute(f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = %s', (job_id,))
+    return cur.fetchone()
+
+
+def serialize_job(row):
+    d = dict(row)
+    for key in ('run_at', 'created_at', 'updated_at'):
+        if d.get(key) is not None:
+            d[key] = str(d[key])
+    return d
@@ -0,0 +1,180 @@
+"""Prometheus metrics, served at ``GET /metrics``.
+
+gunicorn runs several worker processes and the job worker is another one,
+so in production every process writes its samples to memory-mapped files in
+``PROMETHEUS_MULTIPROC_DIR`` and the scrape aggregates them: counters and
+histograms are summed over all processes (including exited ones, so nothing
+resets when a worker is recycled), gauges over the live ones. The variable
+must be set before this module is imported and the directory emptied when
+the service starts (the Docker CMD does both); gunicorn.conf.py clears a
+worker's gauges when it exits. Without the variable each process only
+reports its own numbers, which is fine for ``python app.py``.
+
+Scrapes must send ``Authorization: Bearer <METRICS_TOKEN>``. Without a
+token configured the endpoint is off (404), so a deployment that forgot to
+set one doesn't publish its metrics.
+"""
+import hmac
+import os
+import time
+
+from flask import Response, g, jsonify, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 5)
+EXTRACTION_BUCKETS = (.1, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# ── HTTP ──
+
+REQUESTS = Counter(
+    'lydistories_http_requests_total', 'HTTP requests by route and status code',
+    ['blueprint', 'route', 'method', 'status'])
+REQUEST_LATENCY = Histogram(
+    'lydistories_http_request_duration_seconds', 'Time to produce a response, by route',
+    ['blueprint', 'route', 'method'], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = Gauge(
+    'lydistories_http_requests_in_flight', 'Requests currently being handled',
+    multiprocess_mode='livesum')
+
+# ── Database ──
+
+DB_QUERY_LATENCY = Histogram(
+    'lydistories_db_query_duration_seconds', 'SQL statements run while serving requests, by verb',
+    ['verb'], buckets=QUERY_BUCKETS)
+DB_CHECKOUT_WAIT = Histogram(
+    'lydistories_db_pool_checkout_seconds', 'Time to check a connection out of the pool',
+    buckets=QUERY_BUCKETS)
+DB_CONNECTIONS = Gauge(
+    'lydistories_db_pool_connections', "Pool connections per state, as of each worker's last request",
+    ['state'], multiprocess_mode='livesum')
+
+# ── Jobs and PDF extraction ──
+
+JOBS = Counter(
+    'lydistories_jobs_total', 'Background jobs run, by kind and outcome', ['kind', 'outcome'])
+PDF_EXTRACTION_LATENCY = Histogram(
+    'lydistories_pdf_extraction_duration_seconds', 'Wall time to extract the text of one PDF',
+    buckets=EXTRACTION_BUCKETS)
+PDF_PAGES = Counter(
+    'lydistories_pdf_pages_extracted_total', 'PDF pages extracted')
+PDF_PAGES_TIMED_OUT = Counter(
+    'lydistories_pdf_pages_timed_out_total', 'PDF pages skipped after PDF_PAGE_TIMEOUT')
+
+# ── Passwords ──
+
+PASSWORD_HASHES = Counter(
+    'lydistories_password_hashes_total', 'bcrypt hashes and checks, and those refused when the queue was full',
+    ['op', 'outcome'])
+PASSWORD_HASH_LATENCY = Histogram(
+    'lydistories_password_hash_duration_seconds', 'Queueing plus hashing time of one bcrypt call',
+    ['op'], buckets=LATENCY_BUCKETS)
+
+# ── Rate limits ──
+
+RATE_LIMITED = Counter(
+    'lydistories_rate_limited_total', 'Requests rejected with 429 by ratelimit.py, by limit', ['limit'])
+
+# ── Payments ──
+
+PAYMENTS = Counter(
+    'lydistories_payments_total', 'Payment funnel: initiated, confirmed and failed attempts',
+    ['stage', 'reason'])
+PAYMENTS_CONFIRMED_AMOUNT = Counter(
+    'lydistories_payments_confirmed_amount_ugx_total', 'Sum of confirmed payments (UGX)')
+
+
+def payment_event(stage, reason='', amount=None):
+    PAYMENTS.labels(stage, reason).inc()
+    if amount:
+        PAYMENTS_CONFIRMED_AMOUNT.inc(float(amount))
+
+
+def observe_query(sql, elapsed):
+    verb = sql.lstrip()[:6].lower()
+    if verb not in ('select', 'insert', 'update', 'delete'):
+        verb = 'other'
+    DB_QUERY_LATENCY.labels(verb).observe(elapsed)
+
+
+def observe_extraction(extraction):
+    """Record one ``pdf_extract.extract_pages()`` result."""
+    PDF_EXTRACTION_LATENCY.observe(extraction['seconds'])
+    PDF_PAGES.inc(len(extraction['pages']))
+    if extraction['timed_out']:
+        PDF_PAGES_TIMED_OUT.inc(len(extraction['timed_out']))
+
+
+def observe_password(op, outcome, seconds=None):
+    PASSWORD_HASHES.labels(op, outcome).inc()
+    if seconds is not None:
+        PASSWORD_HASH_LATENCY.labels(op).observe(seconds)
+
+
+def observe_pool(stats):
+    DB_CONNECTIONS.labels('in_use').set(stats['in_use'])
+    DB_CONNECTIONS.labels('idle').set(stats['idle'])
+
+
+# ── Flask hooks ──
+
+def _route_labels():
+    rule = request.url_rule
+    return (request.blueprint or 'app', rule.rule if rule else '<unmatched>', request.method)
+
+
+def start_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_in_flight = True
+    IN_FLIGHT.inc()
+
+
+def record_response(response):
+    started = g.pop('_metrics_started', None)
+    if started is not None:
+        labels = _route_labels()
+        REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - started)
+        REQUESTS.labels(*labels, str(response.status_code)).inc()
+    return response
+
+
+def finish_request(exc=None):
+    """teardown_request: always runs, so in-flight is decremented even if the handler raised."""
+    started = g.pop('_metrics_started', None)
+    if started is not None:
+        # after_request never ran: an unhandled exception became a 500
+        labels = _route_labels()
+        REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - started)
+        REQUESTS.labels(*labels, '500').inc()
+    if g.pop('_metrics_in_flight', False):
+        IN_FLIGHT.dec()
+
+
+def init_app(app):
+    app.before_request(start_request)
+    app.after_request(record_response)
+    app.teardown_request(finish_request)
+
+
+def metrics_view():
+    if not METRICS_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop an exited process's live gauges (called from gunicorn.conf.py and worker.py)."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,182 @@
+"""Versioned schema migrations.
+
+Migrations are the files in ``migrations/`` named ``NNNN_description.py``,
+applied in order of their number. Each defines ``upgrade(cur)`` and runs in
+its own transaction together with the row that records it in
+``schema_migrations``; a file that sets ``TRANSACTIONAL = False`` (e.g. for
+``CREATE INDEX CONCURRENTLY``) runs in autocommit mode instead and must be
+safe to re-run. A session advisory lock makes sure only one process migrates
+at a time; the others wait and then find nothing left to do.
+
+Run it once per deploy, before the app and workers start:
+
+    cd server && python migrate.py              # apply everything pending
+    cd server && python migrate.py --status     # list applied/pending migrations
+
+The app and worker only call ``check_schema()``, one query that refuses to
+start against a database older than the code. The early migrations are all
+``IF NOT EXISTS``, so a database created by the old ``init_db()`` is adopted
+as is.
+"""
+import argparse
+import importlib.util
+import os
+import re
+import time
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+import psycopg2
+from database import DATABASE_URL, get_db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# Arbitrary constant shared by every process that migrates this database
+MIGRATION_LOCK_ID = 7_415_201_933
+CONNECT_RETRIES = 5
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def discover():
+    """``[(version, name, path)]`` for every migration file, in order."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.fullmatch(r'(\d+)_(\w+)\.py', filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f'Duplicate migration numbers in {MIGRATIONS_DIR}')
+    return found
+
+
+def _load(version, name, path):
+    spec = importlib.util.spec_from_file_location(f'migration_{version:04d}_{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _ensure_version_table(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def applied_versions(cur):
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return set()
+    cur.execute('SELECT version FROM schema_migrations')
+    return {row[0] for row in cur.fetchall()}
+
+
+def _connect():
+    for attempt in range(CONNECT_RETRIES):
+        try:
+            return psycopg2.connect(DATABASE_URL)
+        except psycopg2.OperationalError as e:
+            print(f"Database connection attempt {attempt + 1}/{CONNECT_RETRIES} failed: {e}")
+            if attempt == CONNECT_RETRIES - 1:
+                raise
+            time.sleep(3)
+
+
+def migrate(target=None):
+    """Apply pending migrations up to ``target`` (default: all). Returns the versions applied."""
+    # A dedicated connection: the advisory lock belongs to the session, which
+    # must not go back into the pool still holding it
+    conn = _connect()
+    applied = []
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_ID,))
+        try:
+            _ensure_version_table(cur)
+            done = applied_versions(cur)
+            conn.commit()
+            for version, name, path in discover():
+                if version in done or (target is not None and version > target):
+                    continue
+                module = _load(version, name, path)
+                transactional = getattr(module, 'TRANSACTIONAL', True)
+                print(f"Applying migration {version:04d}_{name}")
+                started = time.perf_counter()
+                conn.autocommit = not transactional
+                try:
+                    module.upgrade(cur)
+                    cur.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (version, name))
+                    if transactional:
+                        conn.commit()
+                except Exception:
+                    if transactional:
+                        conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = False
+                print(f"  done in {time.perf_counter() - started:.2f}s")
+                applied.append(version)
+        finally:
+            conn.rollback()
+            cur.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_ID,))
+            conn.commit()
+            cur.close()
+    finally:
+        conn.close()
+    return applied
+
+
+def check_schema():
+    """Raise SchemaOutOfDate unless every migration in the tree has been applied.
+
+    Called at app and worker startup instead of creating tables. If the
+    database can't be reached the process still starts (and requests fail
+    until it can), as it did before.
+    """
+    try:
+        conn = get_db()
+    except psycopg2.OperationalError as e:
+        print(f"WARNING: could not check the database schema: {e}")
+        return
+    try:
+        cur = conn.cursor()
+        missing = {version for version, _, _ in discover()} - applied_versions(cur)
+        cur.close()
+    finally:
+        conn.close()
+    if missing:
+        raise SchemaOutOfDate(
+            f"Database schema is missing migration(s) {sorted(missing)}; run 'python migrate.py' in server/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply database schema migrations.')
+    parser.add_argument('--status', action='store_true', help='list migrations and whether they are applied')
+    parser.add_argument('--target', type=int, help='stop after this version')
+    args = parser.parse_args()
+
+    if args.status:
+        conn = _connect()
+        done = applied_versions(conn.cursor())
+        conn.close()
+        for version, name, _ in discover():
+            print(f"{'applied' if version in done else 'pending'}  {version:04d}_{name}")
+        return
+
+    applied = migrate(args.target)
+    if applied:
+        print(f"Applied {len(applied)} migration(s); schema is at version {max(applied)}.")
+    else:
+        print("Schema is up to date.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Core tables: users, content, payments, access grants, bookmarks, reading progress."""
+
+
+def upgrade(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT DEFAULT 'user' CHECK(role IN ('user', 'admin')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS content (
+            id SERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            author TEXT DEFAULT 'Unknown',
+            category TEXT DEFAULT 'article' CHECK(category IN ('book', 'guide', 'article', 'document')),
+            description TEXT,
+            preview_text TEXT,
+            cover_image TEXT,
+            file_path TEXT,
+            full_text TEXT,
+            page_count INTEGER DEFAULT 0,
+            price REAL DEFAULT 5000,
+            is_featured BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            content_id INTEGER NOT NULL REFERENCES content(id),
+            phone_number TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT DEFAULT 'UGX',
+            transaction_id TEXT UNIQUE,
+            otp_code TEXT,
+            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'confirmed', 'failed')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS user_content_access (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            content_id INTEGER NOT NULL REFERENCES content(id),
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, content_id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS bookmarks (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            content_id INTEGER NOT NULL REFERENCES content(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, content_id)
+        )
+    ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS reading_progress (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            content_id INTEGER NOT NULL REFERENCES content(id),
+            progress_percent REAL DEFAULT 0,
+            last_page INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, content_id)
+        )
+    ''')
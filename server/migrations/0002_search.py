@@ -0,0 +1,70 @@
+"""Full-text search vectors and the autocomplete indexes (see search.py)."""
+import psycopg2
+
+
+def upgrade(cur):
+    # Full-text search. search_vector holds the weighted title (A), author (B)
+    # and description (C) and is what results are ranked on; it stays small
+    # enough to be stored inline. full_text_vector holds the book body without
+    # positions (capped, to stay under the 1 MB tsvector limit) and is only
+    # used for matching, so body-only hits rank below any header hit.
+    cur.execute('ALTER TABLE content ADD COLUMN IF NOT EXISTS search_vector tsvector')
+    cur.execute('ALTER TABLE content ADD COLUMN IF NOT EXISTS full_text_vector tsvector')
+    cur.execute('''
+        CREATE OR REPLACE FUNCTION content_search_document(title TEXT, author TEXT, description TEXT)
+        RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                   setweight(to_tsvector('english', coalesce(author, '')), 'B') ||
+                   setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        $$
+    ''')
+    cur.execute('''
+        CREATE OR REPLACE FUNCTION content_body_document(full_text TEXT)
+        RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+            SELECT strip(to_tsvector('english', left(coalesce(full_text, ''), 1000000)))
+        $$
+    ''')
+    cur.execute('''
+        CREATE OR REPLACE FUNCTION content_search_vector_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            -- Only re-tokenize what changed; an edit to the title must not re-parse the whole book
+            IF TG_OP = 'INSERT' OR NEW.search_vector IS NULL
+               OR NEW.title IS DISTINCT FROM OLD.title
+               OR NEW.author IS DISTINCT FROM OLD.author
+               OR NEW.description IS DISTINCT FROM OLD.description THEN
+                NEW.search_vector := content_search_document(NEW.title, NEW.author, NEW.description);
+            END IF;
+            IF TG_OP = 'INSERT' OR NEW.full_text_vector IS NULL
+               OR NEW.full_text IS DISTINCT FROM OLD.full_text THEN
+                NEW.full_text_vector := content_body_document(NEW.full_text);
+            END IF;
+            RETURN NEW;
+        END
+        $$
+    ''')
+    cur.execute('''
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'content_search_vector_update') THEN
+                CREATE TRIGGER content_search_vector_update
+                BEFORE INSERT OR UPDATE OF title, author, description, full_text ON content
+                FOR EACH ROW EXECUTE FUNCTION content_search_vector_refresh();
+            END IF;
+        END $$
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_content_search ON content USING GIN (search_vector)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_content_full_text_search ON content USING GIN (full_text_vector)')
+
+    # Autocomplete: trigram indexes for fuzzy title/author completion. pg_trgm
+    # needs to be available on the server; without it suggestions fall back
+    # to plain prefix matching on btree indexes.
+    cur.execute('SAVEPOINT trigram')
+    try:
+        cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_content_title_trgm ON content USING GIN (lower(title) gin_trgm_ops)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_content_author_trgm ON content USING GIN (lower(author) gin_trgm_ops)')
+        cur.execute('RELEASE SAVEPOINT trigram')
+    except psycopg2.Error as e:
+        cur.execute('ROLLBACK TO SAVEPOINT trigram')
+        print(f"pg_trgm unavailable, autocomplete will use prefix matching only: {e}")
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_content_title_prefix ON content (lower(title) text_pattern_ops)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_content_author_prefix ON content (lower(author) text_pattern_ops)')
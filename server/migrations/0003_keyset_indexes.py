@@ -0,0 +1,10 @@
+"""Composite indexes backing keyset pagination on (created_at, id)."""
+
+
+def upgrade(cur):
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_content_created ON content (created_at DESC, id DESC)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_content_category_created ON content (category, created_at DESC, id DESC)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_content_featured_created ON content (created_at DESC, id DESC) WHERE is_featured')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at DESC, id DESC)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_payments_user_created ON payments (user_id, created_at DESC, id DESC)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_bookmarks_user_created ON bookmarks (user_id, created_at DESC, id DESC)')
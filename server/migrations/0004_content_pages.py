@@ -0,0 +1,13 @@
+"""Per-page text for the paged reading API (see content_pages.py)."""
+
+
+def upgrade(cur):
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS content_pages (
+            content_id INTEGER NOT NULL REFERENCES content(id),
+            page_no INTEGER NOT NULL,
+            text TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (content_id, page_no)
+        )
+    ''')
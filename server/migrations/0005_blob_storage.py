@@ -0,0 +1,22 @@
+"""Content-addressed uploads and their extraction cache (see storage.py)."""
+
+
+def upgrade(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size BIGINT NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            released_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs (released_at) WHERE refcount <= 0')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS blob_extractions (
+            sha256 TEXT PRIMARY KEY,
+            pages TEXT[] NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
@@ -0,0 +1,5 @@
+"""Profile pictures (routes/profile.py)."""
+
+
+def upgrade(cur):
+    cur.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_url TEXT')
@@ -0,0 +1,28 @@
+"""Background job queue (see jobs.py / worker.py).
+
+Workers claim due rows with FOR UPDATE SKIP LOCKED, so the partial index
+only has to cover what is still waiting to run.
+"""
+
+
+def upgrade(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id SERIAL PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}',
+            content_id INTEGER REFERENCES content(id) ON DELETE SET NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            locked_by TEXT,
+            locked_at TIMESTAMP,
+            last_error TEXT,
+            result JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (run_at, id) WHERE status = 'queued'")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs (locked_at) WHERE status = 'running'")
@@ -0,0 +1,53 @@
+"""Default admin account and sample catalog for a fresh database."""
+import bcrypt
+import psycopg2.extras
+
+
+def upgrade(cur):
+    # Seed default admin
+    admin_email = 'admin@lydistories.com'
+    cur.execute('SELECT id FROM users WHERE email = %s', (admin_email,))
+    existing = cur.fetchone()
+    if not existing:
+        pw_hash = bcrypt.hashpw('Lydistories2026!'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        cur.execute(
+            'INSERT INTO users (name, email, password_hash, role) VALUES (%s, %s, %s, %s)',
+            ('Admin', admin_email, pw_hash, 'admin')
+        )
+
+    # Seed sample content
+    cur.execute('SELECT COUNT(*) FROM content')
+    count = cur.fetchone()[0]
+    if count == 0:
+        samples = [
+            ("The Art of Programming", "John Smith", "book",
+             "A comprehensive guide to modern programming paradigms and best practices.",
+             "Chapter 1: Introduction to Programming\n\nProgramming is the art of telling a computer what to do...",
+             "Chapter 1: Introduction to Programming\n\nProgramming is the art of telling a computer what to do. In this comprehensive guide, we'll explore the fundamental concepts that every programmer should know.\n\nChapter 2: Variables and Data Types\n\nEvery program needs to store and manipulate data.\n\nChapter 3: Control Flow\n\nControl flow determines the order in which statements are executed.",
+             250, 15000, True),
+            ("Study Guide: Data Science Fundamentals", "Jane Doe", "guide",
+             "Master the basics of data science with this comprehensive study guide.",
+             "Module 1: Introduction to Data Science\n\nData science is a multidisciplinary field...",
+             "Module 1: Introduction to Data Science\n\nData science is a multidisciplinary field that uses scientific methods to extract knowledge from data.\n\nModule 2: Statistics for Data Science\n\nKey concepts include mean, median, mode, standard deviation.\n\nModule 3: Machine Learning\n\nTypes: Supervised, Unsupervised, Reinforcement Learning.",
+             180, 12000, True),
+            ("Understanding Cloud Computing", "Tech Weekly", "article",
+             "An in-depth article exploring the evolution and future of cloud computing technologies.",
+             "Cloud computing has revolutionized the way businesses use technology...",
+             "Cloud computing has revolutionized the way businesses use technology.\n\nTypes: IaaS, PaaS, SaaS.\n\nBenefits: Scalability, Cost efficiency, Global accessibility.",
+             30, 5000, False),
+            ("API Design Best Practices", "Developer Docs", "document",
+             "Official documentation on designing clean, maintainable, and scalable APIs.",
+             "API Design Principles\n\nA well-designed API is the cornerstone of any successful software platform...",
+             "API Design Principles\n\n1. Use RESTful Conventions\n2. Authentication & Authorization\n3. Versioning\n4. Error Handling\n5. Documentation",
+             45, 8000, False),
+            ("The History of African Literature", "Amara Okafor", "book",
+             "A journey through centuries of African literary traditions.",
+             "Part I: The Roots of African Storytelling\n\nLong before the written word reached Africa...",
+             "Part I: The Roots of African Storytelling\n\nLong before the written word reached Africa, communities passed down their histories through oral traditions.\n\nPart II: Colonial Period Literature\n\nPart III: Post-Independence Voices\n\nPart IV: Contemporary African Literature",
+             320, 18000, True),
+        ]
+
+        psycopg2.extras.execute_values(cur, '''
+            INSERT INTO content (title, author, category, description, preview_text, full_text, page_count, price, is_featured)
+            VALUES %s
+        ''', samples)
@@ -0,0 +1,42 @@
+"""Indexes for the remaining hot queries (checked by benchmarks/query_plans.py).
+
+- Admin stats and the dashboard read confirmed payments only: partial
+  indexes that carry ``amount`` so the counts and sums are index-only.
+- Deleting content or a user scans every child table by ``content_id``;
+  without these each delete is a sequential scan of payments, bookmarks,
+  reading_progress, user_content_access and jobs (ON DELETE SET NULL).
+- The dashboard lists purchases newest first.
+- The bulk importer looks rows up by their PDF blob.
+
+Built CONCURRENTLY so a deploy never blocks writes to these tables.
+"""
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    'idx_payments_confirmed_created':
+        "payments (created_at DESC, id DESC) INCLUDE (amount) WHERE status = 'confirmed'",
+    'idx_payments_user_confirmed': "payments (user_id) INCLUDE (amount) WHERE status = 'confirmed'",
+    'idx_payments_content': 'payments (content_id)',
+    'idx_bookmarks_content': 'bookmarks (content_id)',
+    'idx_reading_progress_content': 'reading_progress (content_id)',
+    'idx_access_content': 'user_content_access (content_id)',
+    'idx_access_user_granted': 'user_content_access (user_id, granted_at DESC) INCLUDE (content_id)',
+    'idx_users_role': 'users (role)',
+    'idx_jobs_content': 'jobs (content_id) WHERE content_id IS NOT NULL',
+    'idx_content_file_path': 'content (file_path) WHERE file_path IS NOT NULL',
+}
+
+
+def upgrade(cur):
+    for name, definition in INDEXES.items():
+        # A CONCURRENTLY build that was interrupted leaves an invalid index
+        # behind, which IF NOT EXISTS would otherwise keep forever
+        cur.execute('''
+            SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND c.relnamespace = 'public'::regnamespace
+        ''', (name,))
+        row = cur.fetchone()
+        if row and row[0]:
+            cur.execute(f'DROP INDEX CONCURRENTLY {name}')
+        cur.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
@@ -0,0 +1,20 @@
+"""Revoked tokens (see revocation.py).
+
+A row revokes either one token (``jti``) or every token issued to a user up
+to ``revoked_at`` (logout everywhere). ``expires_at`` is when the last token
+it covers expires; after that worker.py deletes the row.
+"""
+
+
+def upgrade(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS token_revocations (
+            id SERIAL PRIMARY KEY,
+            jti TEXT UNIQUE,
+            user_id INTEGER,
+            revoked_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMPTZ NOT NULL,
+            CHECK (jti IS NOT NULL OR user_id IS NOT NULL)
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations (expires_at)')
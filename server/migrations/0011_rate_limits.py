@@ -0,0 +1,17 @@
+"""Token buckets for RATE_LIMIT_BACKEND=postgres (see ratelimit.py).
+
+UNLOGGED: buckets are rewritten on every check and losing them in a crash
+only resets the limits, so they skip the WAL. worker.py deletes idle rows.
+"""
+
+
+def upgrade(cur):
+    cur.execute('''
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at DOUBLE PRECISION NOT NULL,
+            allowed BOOLEAN NOT NULL DEFAULT TRUE
+        )
+    ''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_updated ON rate_limits (updated_at)')
@@ -0,0 +1,83 @@
+"""Keyset pagination over ``(created_at, id)`` for newest-first listings.
+
+Clients pass ``?limit=`` and ``?after=<cursor>``; responses carry a
+``next_cursor`` that is ``None`` on the last page. Cursors are opaque to
+clients (base64 of the last row's sort key), so the sort key can change
+without breaking the API.
+"""
+import base64
+import datetime
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def _encode(key):
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def encode_cursor(created_at, row_id):
+    return _encode([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = _decode(cursor)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def encode_rank_cursor(rank, row_id):
+    """Cursor for relevance-ordered results, keyed on (rank, id)."""
+    return _encode([rank, row_id])
+
+
+def decode_rank_cursor(cursor):
+    try:
+        rank, row_id = _decode(cursor)
+        return float(rank), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def page_args(args, default=DEFAULT_PAGE_SIZE, decode=decode_cursor):
+    """Parse ``limit``/``after`` from request args. Raises ValueError on bad input."""
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = args.get('after')
+    return limit, decode(after) if after else None
+
+
+def keyset_filter(after, created_col='created_at', id_col='id'):
+    """SQL condition (and params) selecting rows strictly after the cursor."""
+    if after is None:
+        return 'TRUE', []
+    return f'({created_col}, {id_col}) < (%s, %s)', list(after)
+
+
+def keyset_order(created_col='created_at', id_col='id'):
+    return f'{created_col} DESC, {id_col} DESC'
+
+
+def split_page(rows, limit, created_key='created_at', id_key='id'):
+    """Trim the extra look-ahead row and build the cursor for the next page.
+
+    Queries fetch ``limit + 1`` rows; the extra one only tells us whether
+    another page exists.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[created_key], last[id_key])
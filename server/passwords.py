@@ -0,0 +1,100 @@
+"""Password hashing off the request threads, with backpressure.
+
+bcrypt is slow on purpose (a few hundred ms of CPU at cost 12). Hashes run
+on a small thread pool per process, ``PASSWORD_HASH_WORKERS`` threads
+(default: half the usable cores, so browsing keeps the rest). bcrypt releases the
+GIL, so the worker's other request threads (gunicorn.conf.py runs gthread
+workers) keep serving while a login waits for its hash.
+
+At most ``PASSWORD_HASH_QUEUE`` hashes can be running or waiting per
+process. Past that, ``hash_password``/``verify_password`` raise
+``HashingBusy`` at once and the route answers 503 instead of queueing a
+login behind seconds of other logins.
+
+New hashes use ``BCRYPT_ROUNDS``. After a successful login ``needs_rehash``
+tells whether the stored hash was made with another cost, so changing the
+setting migrates users as they sign in.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from metrics import observe_password
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+# Cores this process may run on (a container's, not the host's)
+_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or max(1, _CPUS // 2)
+HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 0)) or 4 * HASH_WORKERS
+
+
+class HashingBusy(Exception):
+    """Too many hashes queued in this process; the client should retry shortly."""
+
+
+# One pool per process, created on first use (so after gunicorn forks)
+_executor = None
+_slots = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pool():
+    global _executor, _slots, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _executor = ThreadPoolExecutor(HASH_WORKERS, thread_name_prefix='bcrypt')
+            _slots = threading.BoundedSemaphore(HASH_QUEUE)
+            _pool_pid = os.getpid()
+        return _executor, _slots
+
+
+def shutdown_pool():
+    global _executor, _pool_pid
+    with _pool_lock:
+        if _executor is not None and _pool_pid == os.getpid():
+            _executor.shutdown()
+        _executor = _pool_pid = None
+
+
+def _run(op, fn, *args):
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        observe_password(op, 'busy')
+        raise HashingBusy(f'{HASH_QUEUE} password hashes already queued')
+    started = time.perf_counter()
+    try:
+        result = executor.submit(fn, *args).result()
+    finally:
+        slots.release()
+    observe_password(op, 'ok', time.perf_counter() - started)
+    return result
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_password(password, rounds=None):
+    """bcrypt hash of ``password`` as a str. Raises HashingBusy."""
+    return _run('hash', _hash, password.encode('utf-8'), rounds or BCRYPT_ROUNDS)
+
+
+def verify_password(password, password_hash):
+    """Whether ``password`` matches ``password_hash``. Raises HashingBusy."""
+    return _run('verify', bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    """The cost a bcrypt hash was made with (``$2b$12$...`` -> 12), or None."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    return hash_rounds(password_hash) != BCRYPT_ROUNDS
@@ -0,0 +1,208 @@
+"""Parallel PDF text extraction.
+
+A PDF's page range is split into chunks that run on a process pool. Each
+pool process opens the file itself and returns plain strings, so no PyPDF2
+objects are ever pickled; the parent reassembles the chunks in page order.
+
+Every page gets ``PDF_PAGE_TIMEOUT`` seconds. A page that takes longer (a
+pathological content stream, say) is abandoned and comes back as an empty
+string, and its number is reported in ``timed_out``, so one bad page can't
+hold up the rest of the book. NUL characters are stripped from the text,
+since Postgres text columns reject them.
+"""
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from PyPDF2 import PdfReader
+
+
+def _usable_cpus():
+    """Cores this process may run on (its affinity, not the host's core count)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Each pool process re-imports PyPDF2 and holds a parsed PDF: cap the default for small instances
+DEFAULT_MAX_WORKERS = 4
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', 0)) or min(_usable_cpus(), DEFAULT_MAX_WORKERS)
+PDF_PAGE_TIMEOUT = float(os.environ.get('PDF_PAGE_TIMEOUT', 10))
+# Below this many pages the pool's overhead outweighs the parallelism
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 16))
+# Time allowed for spawning pool processes on top of the per-page limits
+POOL_START_GRACE = 30
+PDF_POOL_IDLE = float(os.environ.get('PDF_POOL_IDLE', 60))
+# Several chunks per process so one slow chunk doesn't leave the others idle
+CHUNKS_PER_WORKER = 4
+
+
+class PageTimeout(BaseException):
+    """Not an Exception: PyPDF2 catches and logs those in places while parsing."""
+
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+
+def _extract_range(filepath, start, stop, page_timeout):
+    """Extract pages ``start``..``stop - 1`` (0-based). Runs in a pool process."""
+    reader = PdfReader(filepath)
+    texts, timed_out = [], []
+    use_alarm = page_timeout > 0 and hasattr(signal, 'setitimer') \
+        and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+    try:
+        for index in range(start, stop):
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                try:
+                    text = reader.pages[index].extract_text() or ''
+                finally:
+                    # Cancelled before the page is recorded, so a late alarm can't add a second entry
+                    if use_alarm:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+            except PageTimeout:
+                text = ''
+                timed_out.append(index + 1)
+                # The interrupted parse can leave the reader's stream mid-object
+                reader = PdfReader(filepath)
+            # Postgres text can't hold NUL, which some PDFs' text streams contain
+            texts.append(text.replace('\x00', ''))
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous)
+    return start, texts, timed_out
+
+
+# ── Process pool ──
+# One pool per process, created on first use. It uses 'spawn' so the pool
+# processes never inherit the parent's database sockets. worker.py shuts it
+# down once the job queue has been idle for PDF_POOL_IDLE seconds.
+
+_pool = None
+_pool_size = 0
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool, _pool_size, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid() or _pool_size < workers:
+            if _pool is not None and _pool_pid == os.getpid():
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_size = workers
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool():
+    """Kill the pool after a chunk overran its deadline (e.g. stuck in C code) or a process died."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            for process in list(getattr(_pool, '_processes', {}).values()):
+                process.terminate()
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+def extract_pages(filepath, workers=None, page_timeout=None):
+    """Extract every page of ``filepath``.
+
+    Returns ``{'pages': [...], 'timed_out': [page numbers], 'workers',
+    'seconds', 'pages_per_sec'}``; ``pages`` has one string per PDF page,
+    empty for image-only or timed-out pages.
+    """
+    workers = workers or PDF_EXTRACT_WORKERS
+    page_timeout = PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+    started = time.perf_counter()
+    total = len(PdfReader(filepath).pages)
+
+    if workers <= 1 or total < PDF_PARALLEL_MIN_PAGES:
+        workers = 1
+        _, pages, timed_out = _extract_range(filepath, 0, total, page_timeout)
+    else:
+        chunk = max(1, math.ceil(total / (workers * CHUNKS_PER_WORKER)))
+        pool = _get_pool(workers)
+        futures = [pool.submit(_extract_range, filepath, start, min(start + chunk, total), page_timeout)
+                   for start in range(0, total, chunk)]
+        pages, timed_out = [''] * total, []
+        # Backstop for a page the alarm can't interrupt: no chunk may take
+        # longer than all of its pages timing out, after waiting its turn
+        deadline = None
+        if page_timeout > 0:
+            deadline = (time.monotonic() + POOL_START_GRACE
+                        + page_timeout * chunk * math.ceil(len(futures) / workers + 1))
+        try:
+            for future in futures:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                start, texts, slow = future.result(timeout=remaining)
+                pages[start:start + len(texts)] = texts
+                timed_out.extend(slow)
+        except FutureTimeout:
+            _discard_pool()
+            raise TimeoutError(f'PDF extraction exceeded its time limit ({total} pages)')
+        except BrokenProcessPool:
+            _discard_pool()
+            raise
+        timed_out.sort()
+
+    seconds = time.perf_counter() - started
+    return {
+        'pages': pages,
+        'timed_out': timed_out,
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'pages_per_sec': round(total / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def _extract_document(filepath, page_timeout):
+    """Every page of one PDF, serially. Runs in a pool process."""
+    total = len(PdfReader(filepath).pages)
+    _, pages, timed_out = _extract_range(filepath, 0, total, page_timeout)
+    return pages, timed_out
+
+
+def extract_documents(filepaths, workers=None, page_timeout=None):
+    """Extract many PDFs at once, one whole document per pool task.
+
+    For bulk imports, where there are more files than processes and
+    splitting each file would only add overhead. Yields ``(index, pages,
+    timed_out, error)`` in completion order; a file PyPDF2 can't read comes
+    back with its exception in ``error`` instead of stopping the rest.
+    """
+    if not filepaths:
+        return
+    workers = workers or PDF_EXTRACT_WORKERS
+    page_timeout = PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+    pool = _get_pool(workers)
+    futures = {pool.submit(_extract_document, path, page_timeout): index
+               for index, path in enumerate(filepaths)}
+    for future in as_completed(futures):
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            _discard_pool()
+            raise error
+        if error is not None:
+            yield futures[future], None, [], error
+        else:
+            pages, timed_out = future.result()
+            yield futures[future], pages, timed_out, None
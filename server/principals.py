@@ -0,0 +1,115 @@
+"""Who is making a request: the user's current role, name and avatar.
+
+A token only proves the user id. The role and profile come from the users
+row, so a role change made by an admin takes effect on the user's next
+request instead of when their 7-day token expires.
+
+Rows are cached per worker for ``PRINCIPAL_CACHE_TTL`` seconds, so the auth
+decorators and ``/api/auth/me`` normally don't touch the database. Each user
+also has a version counter shared by every process on the host
+(``SharedVersions`` in cache.py, one slot per ``user_id`` modulo
+``PRINCIPAL_VERSION_SLOTS``). A cached entry is used only while its user's
+counter is unchanged. Whenever a role, name, password or avatar changes, or
+the user is deleted, ``invalidate(user_id)`` bumps that user's counter, so
+every worker reloads that user on the next request and keeps everyone
+else cached. Other hosts catch up within the TTL.
+"""
+import os
+import tempfile
+import psycopg2.extras
+from cache import LRUCache, SharedVersions
+from database import get_db
+
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 4096))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+PRINCIPAL_CACHE_MARKER = os.environ.get(
+    'PRINCIPAL_CACHE_MARKER', os.path.join(tempfile.gettempdir(), 'lydistories-principals.version'))
+# Users sharing a slot also share invalidations, which only costs an extra reload
+PRINCIPAL_VERSION_SLOTS = int(os.environ.get('PRINCIPAL_VERSION_SLOTS', 65536))
+
+PRINCIPAL_COLUMNS = 'id, name, email, role, avatar_url, created_at'
+
+
+class PrincipalCache:
+    def __init__(self, maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL, marker=PRINCIPAL_CACHE_MARKER,
+                 slots=PRINCIPAL_VERSION_SLOTS):
+        self._users = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._versions = SharedVersions(marker, slots)
+        self.invalidations = 0
+        # Found in the LRU (and counted as hits there) but invalidated since
+        self.stale = 0
+
+    def version(self, user_id):
+        """``user_id``'s current version; None if it can't be read, which disables caching."""
+        try:
+            return self._versions.read(user_id)
+        except OSError:
+            return None
+
+    def get(self, user_id):
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        principal, version = entry
+        if version is None or version != self.version(user_id):
+            self.stale += 1
+            return None
+        return principal
+
+    def store(self, user_id, principal, version):
+        """Cache a row read after ``self.version(user_id)`` returned ``version``.
+
+        If the user was invalidated meanwhile, the entry simply never matches.
+        """
+        if version is not None:
+            self._users.set(user_id, (principal, version))
+
+    def invalidate(self, user_id):
+        self.invalidations += 1
+        try:
+            self._versions.bump(user_id)
+        except OSError as e:
+            print(f"Principal cache version update failed: {e}")
+
+    def stats(self):
+        stats = self._users.stats()
+        stats['invalidations'] = self.invalidations
+        stats['stale'] = self.stale
+        return stats
+
+
+principal_cache = PrincipalCache()
+
+
+def principal_row(row):
+    """A users row (``PRINCIPAL_COLUMNS``) as the JSON-ready dict handed out by ``get_principal``."""
+    principal = dict(row)
+    principal['created_at'] = str(principal['created_at'])
+    return principal
+
+
+def get_principal(user_id):
+    """``{id, name, email, role, avatar_url, created_at}`` for ``user_id``, or None if the user is gone.
+
+    The dict is shared between requests: don't modify it.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    version = principal_cache.version(user_id)
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(f'SELECT {PRINCIPAL_COLUMNS} FROM users WHERE id = %s', (user_id,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    if row is None:
+        return None
+    principal = principal_row(row)
+    principal_cache.store(user_id, principal, version)
+    return principal
+
+
+def invalidate(user_id):
+    """Call after committing a change to the user's role, name, password or avatar, or deleting them."""
+    principal_cache.invalidate(user_id)
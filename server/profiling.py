@@ -0,0 +1,332 @@
+"""Opt-in request profiling, usable in production without a redeploy.
+
+On demand: an admin adds ``X-Profile: sample`` (or ``?_profile=sample``) to
+any request. A thread samples that request's stack every
+``PROFILE_SAMPLE_INTERVAL_MS`` and the result is saved to ``PROFILE_DIR`` as
+a speedscope profile (open it at https://www.speedscope.app) and as
+collapsed stacks (``flamegraph.pl``, speedscope, most flame graph tools).
+``X-Profile: cprofile`` runs the request under cProfile instead and saves a
+``.prof`` file for ``pstats``/snakeviz. The response names the saved files
+in ``X-Profile-Id``; routes/profiles.py lists and serves them. Anyone else
+sending the flag gets admin_required's 401/403.
+
+Continuous: with ``PROFILE_CONTINUOUS_HZ`` > 0 each worker samples whatever
+its requests are doing at that rate, at a cost that does not depend on
+traffic, and aggregates the stacks per route. Every worker flushes its
+counts to ``PROFILE_DIR`` once a minute, so the report merges all workers
+on the host.
+"""
+import cProfile
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, request
+
+from routes.auth import admin_required
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'lydistories-profiles')
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000
+CONTINUOUS_HZ = float(os.environ.get('PROFILE_CONTINUOUS_HZ', 0))
+# On-demand profiles kept on disk; older ones are deleted
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+# Distinct stacks kept per route in continuous mode; rarer ones are merged
+MAX_STACKS_PER_ROUTE = 2000
+FLUSH_INTERVAL = 60
+
+MODES = ('sample', 'cprofile')
+_SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ── Stacks ──
+
+_frame_names = {}
+
+
+def _frame_name(code):
+    name = _frame_names.get(code)
+    if name is None:
+        path = code.co_filename
+        if path.startswith(_SERVER_DIR):
+            path = os.path.relpath(path, _SERVER_DIR)
+        else:
+            path = '/'.join(path.split(os.sep)[-2:])
+        name = _frame_names[code] = f'{code.co_name} ({path}:{code.co_firstlineno})'
+    return name
+
+
+def _stack(frame):
+    """Frame names from the outermost call to ``frame``."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return tuple(names)
+
+
+def collapsed(stacks):
+    """``{stack tuple: count}`` in the collapsed format: ``a;b;c 12`` per line."""
+    lines = [';'.join(frame.replace(';', ':') for frame in stack) + f' {count}'
+             for stack, count in sorted(stacks.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def speedscope(stacks, name, interval):
+    """``{stack tuple: count}`` as a speedscope "sampled" profile, weighted in milliseconds."""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        sample = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({'name': frame})
+            sample.append(index[frame])
+        samples.append(sample)
+        weights.append(round(count * interval * 1000, 3))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'lydistories',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled', 'name': name, 'unit': 'milliseconds',
+            'startValue': 0, 'endValue': sum(weights),
+            'samples': samples, 'weights': weights,
+        }],
+    }
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack every ``interval`` seconds until stopped."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_stack(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+# ── On-demand profiles ──
+
+def _requested_mode():
+    mode = request.headers.get('X-Profile') or request.args.get('_profile')
+    if not mode:
+        return None
+    mode = mode.lower()
+    return mode if mode in MODES else 'sample'
+
+
+def _profile_name():
+    now = time.time()
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}-{os.getpid()}-{endpoint}"
+
+
+def _prune():
+    names = sorted(os.listdir(PROFILE_DIR))
+    ids = sorted({name.split('.', 1)[0] for name in names if not name.startswith('continuous')})
+    stale = set(ids[:-PROFILE_KEEP]) if len(ids) > PROFILE_KEEP else set()
+    for name in names:
+        if name.split('.', 1)[0] in stale:
+            os.remove(os.path.join(PROFILE_DIR, name))
+
+
+def _save(profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = _profile_name()
+    title = f'{request.method} {request.path}'
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f'{name}.prof'))
+    else:
+        stacks = profiler.stop()
+        with open(os.path.join(PROFILE_DIR, f'{name}.speedscope.json'), 'w') as f:
+            json.dump(speedscope(stacks, title, profiler.interval), f)
+        with open(os.path.join(PROFILE_DIR, f'{name}.collapsed'), 'w') as f:
+            f.write(collapsed(stacks))
+    _prune()
+    print(f"Profiled {title} ({'cprofile' if isinstance(profiler, cProfile.Profile) else 'sample'}): {name}")
+    return name
+
+
+def _allow():
+    return None
+
+
+def start_request():
+    _track_request()
+    mode = _requested_mode()
+    if mode is None:
+        return None
+    denied = admin_required(_allow)()
+    if denied is not None:
+        return denied
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = StackSampler(threading.get_ident(), SAMPLE_INTERVAL)
+        profiler.start()
+    g._profiler = profiler
+    return None
+
+
+def _finish(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    return _save(profiler)
+
+
+def finish_response(response):
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        response.headers['X-Profile-Id'] = _finish(profiler)
+    return response
+
+
+def teardown_request(exc=None):
+    # after_request didn't run (the handler raised): still keep the profile
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        _finish(profiler)
+    _untrack_request()
+
+
+# ── Continuous sampling ──
+
+_active = {}                     # thread id -> route label
+_routes = defaultdict(Counter)   # route label -> {stack: samples}
+_routes_lock = threading.Lock()
+_continuous_pid = None
+# Touched by reset_continuous(); every worker drops its counts when it changes
+RESET_MARKER = os.path.join(PROFILE_DIR, 'continuous.reset')
+_reset_seen = None
+
+
+def _continuous_file(pid):
+    return os.path.join(PROFILE_DIR, f'continuous-{pid}.json')
+
+
+def _reset_mtime():
+    try:
+        return os.stat(RESET_MARKER).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _flush():
+    global _reset_seen
+    reset = _reset_mtime()
+    with _routes_lock:
+        if reset != _reset_seen:
+            _routes.clear()
+            _reset_seen = reset
+        data = {route: [[list(stack), count] for stack, count in stacks.items()]
+                for route, stacks in _routes.items()}
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp = _continuous_file(os.getpid()) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'interval': 1 / CONTINUOUS_HZ, 'routes': data}, f)
+    os.replace(tmp, _continuous_file(os.getpid()))
+
+
+def _continuous_loop():
+    interval = 1 / CONTINUOUS_HZ
+    last_flush = time.monotonic()
+    while True:
+        time.sleep(interval)
+        frames = sys._current_frames()
+        with _routes_lock:
+            for thread_id, route in list(_active.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stacks = _routes[route]
+                stack = _stack(frame)
+                if stack not in stacks and len(stacks) >= MAX_STACKS_PER_ROUTE:
+                    stack = ('[other stacks]',)
+                stacks[stack] += 1
+        del frames
+        if time.monotonic() - last_flush > FLUSH_INTERVAL:
+            try:
+                _flush()
+            except OSError as e:
+                print(f"Could not write the continuous profile: {e}")
+            last_flush = time.monotonic()
+
+
+def _track_request():
+    global _continuous_pid, _reset_seen
+    if CONTINUOUS_HZ <= 0:
+        return
+    if _continuous_pid != os.getpid():
+        # Started lazily, in each gunicorn worker after the fork
+        _continuous_pid = os.getpid()
+        _routes.clear()
+        _reset_seen = _reset_mtime()
+        threading.Thread(target=_continuous_loop, name='profile-continuous', daemon=True).start()
+    rule = request.url_rule
+    _active[threading.get_ident()] = f"{request.method} {rule.rule if rule else '<unmatched>'}"
+
+
+def _untrack_request():
+    _active.pop(threading.get_ident(), None)
+
+
+def continuous_report():
+    """Stacks of every worker on this host, merged: ``(interval, {stack: samples})``.
+
+    Each stack starts with its route, so one flame graph splits by route first.
+    """
+    if CONTINUOUS_HZ > 0 and _continuous_pid == os.getpid():
+        _flush()
+    merged = Counter()
+    interval = 1 / CONTINUOUS_HZ if CONTINUOUS_HZ > 0 else 0
+    if not os.path.isdir(PROFILE_DIR):
+        return interval, merged
+    for name in os.listdir(PROFILE_DIR):
+        if not (name.startswith('continuous-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        interval = data['interval']
+        for route, stacks in data['routes'].items():
+            for stack, count in stacks:
+                merged[(route,) + tuple(stack)] += count
+    return interval, merged
+
+
+def reset_continuous():
+    """Start the continuous report over, in every worker on this host."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(RESET_MARKER, 'a'):
+        os.utime(RESET_MARKER)
+    for name in os.listdir(PROFILE_DIR):
+        if name.startswith('continuous-'):
+            os.remove(os.path.join(PROFILE_DIR, name))
+
+
+def init_app(app):
+    app.before_request(start_request)
+    app.after_request(finish_response)
+    app.teardown_request(teardown_request)
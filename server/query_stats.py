@@ -0,0 +1,176 @@
+"""Per-request SQL instrumentation.
+
+Connections handed out by ``get_db()`` inside a Flask request return cursors
+that time every ``execute``/``executemany``/``copy_expert`` and add it to a
+``QueryStats`` on ``flask.g``. When the request finishes, ``report_request``
+adds a ``Server-Timing`` header (query count, total DB time, slowest
+statement) and prints a one-line JSON log for requests worth a look:
+
+- the same normalized statement ran more than ``SQL_REPEAT_THRESHOLD`` times
+  (the shape of an N+1: one query per row of an earlier result), or
+- the request spent more than ``SQL_SLOW_MS`` in the database.
+
+``SQL_LOG=all`` logs every request that touched the database, ``SQL_LOG=off``
+none. Statements are logged as fingerprints, with literals and parameters
+replaced by ``?``, so no user data ends up in the logs.
+"""
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+import psycopg2.extensions
+from flask import g, has_app_context, request
+
+from metrics import observe_query
+
+REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 10))
+SLOW_MS = float(os.environ.get('SQL_SLOW_MS', 200))
+LOG_MODE = os.environ.get('SQL_LOG', 'flagged').lower()
+SERVER_TIMING = os.environ.get('SQL_SERVER_TIMING', '1').lower() not in ('0', 'false', 'no', 'off')
+# Fingerprints listed in the log line, most repeated first
+LOG_TOP = 5
+
+
+# ── Fingerprints ──
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"--[^\n]*"), ' '),                              # line comments
+    (re.compile(r"/\*.*?\*/", re.S), ' '),                       # block comments
+    (re.compile(r"\$(\w*)\$.*?\$\1\$", re.S), '?'),              # dollar-quoted strings
+    (re.compile(r"[EeBbXxUu]?'(?:[^']|'')*'"), '?'),             # string literals
+    (re.compile(r"%\(\w+\)s|%s"), '?'),                          # driver placeholders
+    (re.compile(r"\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b"), '?'),    # numbers
+    (re.compile(r"\b(?:true|false|null)\b", re.I), '?'),
+    (re.compile(r"\s+"), ' '),
+    (re.compile(r"\(\s*\?(?:\s*(?:,|::\w+)\s*\??)*\s*\)"), '(?)'),  # IN lists and VALUES rows
+    (re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+"), '(?)'),            # multi-row VALUES
+]
+
+
+def fingerprint(sql):
+    """Normalize a statement so that runs differing only in their values compare equal."""
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def _statement_text(cur, query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    if isinstance(query, str):
+        return query
+    # psycopg2.sql.Composable
+    return query.as_string(cur)
+
+
+# ── Collection ──
+
+class QueryStats:
+    """Queries run while serving one request."""
+
+    __slots__ = ('count', 'total', 'slowest', 'slowest_sql', 'by_fingerprint', 'time_by_fingerprint')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+        self.by_fingerprint = Counter()
+        self.time_by_fingerprint = defaultdict(float)
+
+    def record(self, sql, elapsed):
+        fp = fingerprint(sql)
+        self.count += 1
+        self.total += elapsed
+        self.by_fingerprint[fp] += 1
+        self.time_by_fingerprint[fp] += elapsed
+        if elapsed >= self.slowest:
+            self.slowest = elapsed
+            self.slowest_sql = fp
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """``[(fingerprint, count)]`` for statements run more than ``threshold`` times."""
+        return [(fp, n) for fp, n in self.by_fingerprint.most_common() if n > threshold]
+
+
+def current():
+    """The QueryStats of the current request, or None outside one."""
+    if not has_app_context():
+        return None
+    stats = g.get('_query_stats')
+    if stats is None:
+        stats = g._query_stats = QueryStats()
+    return stats
+
+
+def _timed(method):
+    def wrapper(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(self, query, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            sql = _statement_text(self, query)
+            observe_query(sql, elapsed)
+            stats = current()
+            if stats is not None:
+                stats.record(sql, elapsed)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+_traced_classes = {}
+
+
+def traced_cursor_class(factory):
+    """Subclass of a cursor class (e.g. RealDictCursor) whose statements are recorded."""
+    factory = factory or psycopg2.extensions.cursor
+    traced = _traced_classes.get(factory)
+    if traced is None:
+        traced = type('Traced' + factory.__name__, (factory,), {
+            'execute': _timed(factory.execute),
+            'executemany': _timed(factory.executemany),
+            'copy_expert': _timed(factory.copy_expert),
+        })
+        _traced_classes[factory] = traced
+    return traced
+
+
+# ── Reporting ──
+
+def report_request(response):
+    """Flask after_request hook: Server-Timing header and the structured log line."""
+    stats = g.get('_query_stats')
+    if stats is None or not stats.count:
+        return response
+
+    if SERVER_TIMING:
+        timing = (f'db;dur={stats.total * 1000:.2f};desc="{stats.count} queries", '
+                  f'db-slowest;dur={stats.slowest * 1000:.2f}')
+        existing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+    repeated = stats.repeated()
+    slow = stats.total * 1000 > SLOW_MS
+    if LOG_MODE == 'all' or (LOG_MODE != 'off' and (repeated or slow)):
+        top = stats.by_fingerprint.most_common(LOG_TOP)
+        print(json.dumps({
+            'event': 'sql',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.total * 1000, 2),
+            'slowest_ms': round(stats.slowest * 1000, 2),
+            'slowest': stats.slowest_sql,
+            'n_plus_one': bool(repeated),
+            'slow': slow,
+            'repeated': [
+                {'sql': fp, 'count': n, 'ms': round(stats.time_by_fingerprint[fp] * 1000, 2)}
+                for fp, n in top if n > 1
+            ],
+        }), flush=True)
+    return response
@@ -0,0 +1,228 @@
+"""Rate limits for abuse-prone endpoints: login, register, OTP confirmation.
+
+    @auth_bp.route('/api/auth/login', methods=['POST'])
+    @rate_limit('login', RATE_LIMIT_LOGIN)
+    @rate_limit('login-email', RATE_LIMIT_LOGIN_EMAIL, key=json_field('email'))
+    def login(): ...
+
+Each limit is a token bucket. ``'10/minute'`` allows a burst of 10 and then
+refills at 10 per minute. A rejected request gets a 429 with Retry-After
+before the view runs, so it costs no query and no bcrypt. By default a
+limit is keyed by client IP. Behind a load balancer, set
+TRUSTED_PROXY_HOPS (app.py) so the IP is the client's rather than the
+proxy's. A limit can also be keyed by a request field (``json_field``) or
+by the signed-in user (``current_user``, below ``login_required``).
+
+``RATE_LIMIT_BACKEND`` picks where the buckets live:
+
+- ``local`` (default): a fixed-size hash table in a memory-mapped file
+  (``RATE_LIMIT_FILE``). Every process on the host shares it, so gunicorn
+  workers enforce one limit between them. A check takes a few
+  microseconds under a file lock. Slots are reused only by buckets that
+  have refilled; when none is free the check falls back to ``postgres``.
+- ``postgres``: one UPSERT per check on the rate_limits table, shared
+  by several app hosts. Each check costs a database round trip.
+- ``off``: no limits (benchmarks/load_test.py uses this).
+"""
+import functools
+import hmac
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from database import get_db
+from metrics import RATE_LIMITED
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the table is still shared by threads, just not across processes
+    fcntl = None
+
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'local')
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE') or os.path.join(tempfile.gettempdir(), 'lydistories-ratelimit.bin')
+RATE_LIMIT_SLOTS = int(os.environ.get('RATE_LIMIT_SLOTS', 65536))
+
+RATE_LIMIT_LOGIN = os.environ.get('RATE_LIMIT_LOGIN', '10/minute')              # per IP
+RATE_LIMIT_LOGIN_EMAIL = os.environ.get('RATE_LIMIT_LOGIN_EMAIL', '5/minute')   # per account
+RATE_LIMIT_REGISTER = os.environ.get('RATE_LIMIT_REGISTER', '5/hour')           # per IP
+RATE_LIMIT_OTP = os.environ.get('RATE_LIMIT_OTP', '5/minute')                   # per user
+
+# Postgres buckets untouched for this long are deleted by worker.py
+IDLE_BUCKET_TTL = 24 * 3600
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    """``'10/minute'`` -> ``(capacity 10, refill 10/60 per second)``; ``''`` or ``'0'`` -> None."""
+    if not limit or limit.strip() == '0':
+        return None
+    count, _, period = limit.partition('/')
+    period = period.strip().lower() or 'second'
+    seconds = PERIODS[period.rstrip('s')] if period.rstrip('s') in PERIODS else float(period.rstrip('s'))
+    return float(count), float(count) / seconds
+
+
+# ── Backends ──
+
+class PostgresBackend:
+    """Token buckets in the rate_limits table, one UPSERT per check."""
+
+    def hit(self, key, capacity, rate):
+        refill = 'LEAST(%(capacity)s, r.tokens + GREATEST(0, %(now)s - r.updated_at) * %(rate)s)'
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            cur.execute(f'''
+                INSERT INTO rate_limits AS r (key, tokens, updated_at, allowed)
+                VALUES (%(key)s, %(capacity)s - 1, %(now)s, TRUE)
+                ON CONFLICT (key) DO UPDATE SET
+                    allowed = {refill} >= 1,
+                    tokens = {refill} - CASE WHEN {refill} >= 1 THEN 1 ELSE 0 END,
+                    updated_at = %(now)s
+                RETURNING allowed, tokens
+            ''', {'key': key, 'capacity': capacity, 'rate': rate, 'now': time.time()})
+            allowed, tokens = cur.fetchone()
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+# File header: format marker, then a random key for hashing bucket names
+MAGIC = b'lydistories-ratelimit-1\0'
+HEADER = struct.Struct(f'<{len(MAGIC)}s32s')
+# One bucket: key hash (0 = empty), tokens, last update, when it will be full again (epoch seconds)
+SLOT = struct.Struct('<Qddd')
+PROBES = 8
+
+
+class SharedMemoryBackend:
+    """Token buckets in an open-addressed hash table in a shared memory-mapped file.
+
+    Bucket names are hashed with a random key kept in the file, so nobody
+    can pick names that land on someone else's slots. A slot is only taken
+    over once its bucket has refilled, when forgetting it changes nothing.
+    If every probed slot holds a bucket that is still draining, the check
+    goes to the Postgres backend instead of resetting somebody's count.
+    """
+
+    def __init__(self, path=RATE_LIMIT_FILE, slots=RATE_LIMIT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._overflow = PostgresBackend()
+
+    def _open(self):
+        # Per process: after a fork, flock on the inherited descriptor would be shared with the parent
+        if self._pid != os.getpid():
+            size = HEADER.size + self.slots * SLOT.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                magic, key = HEADER.unpack(os.pread(fd, HEADER.size, 0).ljust(HEADER.size, b'\0'))
+                if magic != MAGIC or os.fstat(fd).st_size < size:
+                    # New file, or one in an older layout: start empty
+                    key = os.urandom(32)
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, HEADER.pack(MAGIC, key), 0)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fd, self._map, self._key, self._pid = fd, mmap.mmap(fd, size), key, os.getpid()
+        return self._map
+
+    def hit(self, key, capacity, rate):
+        """Take one token from ``key``'s bucket. Returns ``(allowed, seconds until one is available)``."""
+        now = time.time()
+        with self._lock:
+            table = self._open()
+            digest = int.from_bytes(hmac.new(self._key, key.encode('utf-8'), 'blake2b').digest()[:8], 'little') or 1
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                start = digest % self.slots
+                free = None
+                for probe in range(PROBES):
+                    offset = HEADER.size + (start + probe) % self.slots * SLOT.size
+                    slot_key, tokens, updated, full_at = SLOT.unpack_from(table, offset)
+                    if slot_key == digest:
+                        break
+                    if free is None and (slot_key == 0 or full_at <= now):
+                        free = offset
+                else:
+                    if free is None:
+                        offset = None
+                    else:
+                        offset, tokens, updated = free, capacity, now
+                if offset is not None:
+                    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+                    allowed = tokens >= 1
+                    if allowed:
+                        tokens -= 1
+                    SLOT.pack_into(table, offset, digest, tokens, now, now + (capacity - tokens) / rate)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        if offset is None:
+            return self._overflow.hit(key, capacity, rate)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+def prune_idle(cur):
+    """Delete Postgres buckets that have been full again for a long time. Returns the number deleted."""
+    cur.execute('DELETE FROM rate_limits WHERE updated_at < %s', (time.time() - IDLE_BUCKET_TTL,))
+    return cur.rowcount
+
+
+BACKENDS = {'local': SharedMemoryBackend, 'postgres': PostgresBackend, 'off': None}
+if RATE_LIMIT_BACKEND not in BACKENDS:
+    raise RuntimeError(f"RATE_LIMIT_BACKEND must be one of {', '.join(BACKENDS)}")
+backend = BACKENDS[RATE_LIMIT_BACKEND]() if BACKENDS[RATE_LIMIT_BACKEND] else None
+
+
+# ── Keys and decorator ──
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def current_user():
+    return str(g.user_id)
+
+
+def json_field(field):
+    """Key on a JSON body field (e.g. the email being logged into); requests without it aren't limited."""
+    def key():
+        value = (request.get_json(silent=True) or {}).get(field)
+        return str(value).strip().lower() if value else None
+    return key
+
+
+def rate_limit(name, limit, key=client_ip):
+    """Answer 429 once ``key()`` has used up ``limit`` (e.g. ``'5/minute'``) for this ``name``."""
+    parsed = parse_limit(limit)
+
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated(*args, **kwargs):
+            subject = key() if parsed and backend is not None else None
+            if subject is not None:
+                allowed, retry_after = backend.hit(f'{name}:{subject}', *parsed)
+                if not allowed:
+                    RATE_LIMITED.labels(name).inc()
+                    return (jsonify({'error': 'Too many attempts, please try again later'}), 429,
+                            {'Retry-After': str(max(1, math.ceil(retry_after)))})
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
@@ -0,0 +1,202 @@
+"""Token revocation: logout, logout everywhere, deleted and demoted users.
+
+Tokens carry a random ``jti`` and their issue time ``iat``. A revocation is
+a row in token_revocations, either for one jti or for every token a user
+was issued up to ``revoked_at``.
+
+Checking a token must not cost a query, so each process keeps the
+revocations that are still unexpired in memory: a dict of revoked jtis and
+a dict of per-user cutoffs. ``is_revoked`` is two dict lookups and
+allocates nothing.
+
+Every process learns about new revocations through LISTEN/NOTIFY. The
+revoking transaction notifies ``REVOCATION_CHANNEL`` with the row itself,
+and a listener thread in each process applies it. ``start()`` launches the
+thread when the app is loaded (app.py, and gunicorn's post_fork hook for
+preloaded apps) and returns at once: the thread connects, retrying with
+backoff while the database is unreachable. It also reloads the table every
+``REVOCATION_RESYNC`` seconds, which covers connection poolers that don't
+pass NOTIFY through.
+
+Until the listener has loaded the table, and whenever it has lost its
+connection (so notifications may be missing), ``is_revoked`` asks the
+database instead, on a pooled connection like any other query.
+worker.py deletes rows whose tokens have all expired.
+"""
+import json
+import os
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+from database import DATABASE_URL, get_db
+
+REVOCATION_CHANNEL = 'token_revocations'
+REVOCATION_RESYNC = float(os.environ.get('REVOCATION_RESYNC', 60))
+RECONNECT_DELAY = 5
+RECONNECT_MAX_DELAY = 60
+# Lifetime of a token from create_token(); a user cutoff must outlive every token it covers
+TOKEN_LIFETIME = 7 * 24 * 3600
+
+_jtis = {}       # jti -> expiry (epoch seconds)
+_cutoffs = {}    # user_id -> (tokens issued at or before this are revoked, expiry)
+_listener_pid = None
+_loaded_pid = None   # this process's in-memory revocations are current
+_start_lock = threading.Lock()
+
+
+# ── Checking tokens ──
+
+def is_revoked(payload):
+    """Whether a decoded, otherwise valid token has been revoked."""
+    if _listener_pid != os.getpid():
+        start()
+    if _loaded_pid != os.getpid():
+        return _query_revoked(payload)
+    jti = payload.get('jti')
+    if jti is not None and jti in _jtis:
+        return True
+    cutoff = _cutoffs.get(payload.get('user_id'))
+    # Tokens from before revocation existed have no iat: any cutoff covers them
+    return cutoff is not None and payload.get('iat', 0) <= cutoff[0]
+
+
+def _query_revoked(payload):
+    """``is_revoked`` straight from the table, for when the in-memory copy may be behind."""
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute('''
+            SELECT EXISTS (
+                SELECT 1 FROM token_revocations
+                WHERE expires_at > CURRENT_TIMESTAMP
+                  AND (jti = %s OR (jti IS NULL AND user_id = %s AND revoked_at >= to_timestamp(%s)))
+            )
+        ''', (payload.get('jti'), payload.get('user_id'), payload.get('iat', 0)))
+        return cur.fetchone()[0]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _apply(entry):
+    if entry.get('jti'):
+        _jtis[entry['jti']] = entry['exp']
+    else:
+        previous = _cutoffs.get(entry['user_id'])
+        if previous is None or previous[0] < entry['cutoff']:
+            _cutoffs[entry['user_id']] = (entry['cutoff'], entry['exp'])
+
+
+def _reload(conn):
+    """Replace the in-memory revocations with the table's unexpired rows."""
+    global _jtis, _cutoffs, _loaded_pid
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT jti, user_id, EXTRACT(EPOCH FROM revoked_at)::float8, EXTRACT(EPOCH FROM expires_at)::float8
+        FROM token_revocations WHERE expires_at > CURRENT_TIMESTAMP
+    ''')
+    jtis, cutoffs = {}, {}
+    for jti, user_id, revoked_at, expires_at in cur.fetchall():
+        if jti:
+            jtis[jti] = expires_at
+        elif user_id not in cutoffs or cutoffs[user_id][0] < revoked_at:
+            cutoffs[user_id] = (revoked_at, expires_at)
+    cur.close()
+    # Swapped in whole, so request threads never see a half-loaded set
+    _jtis, _cutoffs = jtis, cutoffs
+    _loaded_pid = os.getpid()
+
+
+# ── Listener ──
+
+def _listen():
+    listener = psycopg2.connect(DATABASE_URL)
+    listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    listener.cursor().execute(f'LISTEN {REVOCATION_CHANNEL}')
+    return listener
+
+
+def start():
+    """Start this process's listener thread, once per process. Doesn't wait for it to connect."""
+    global _listener_pid
+    with _start_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    threading.Thread(target=_listen_loop, name='token-revocations', daemon=True).start()
+
+
+def _listen_loop():
+    global _loaded_pid
+    listener = None
+    delay = RECONNECT_DELAY
+    while True:
+        try:
+            if listener is None:
+                # LISTEN before loading, so nothing committed in between is missed
+                listener = _listen()
+                _reload(listener)
+                last_reload = time.monotonic()
+                delay = RECONNECT_DELAY
+            timeout = max(0.0, REVOCATION_RESYNC - (time.monotonic() - last_reload))
+            if select.select([listener], [], [], timeout) != ([], [], []):
+                listener.poll()
+                while listener.notifies:
+                    _apply(json.loads(listener.notifies.pop(0).payload))
+            if time.monotonic() - last_reload >= REVOCATION_RESYNC:
+                _reload(listener)
+                last_reload = time.monotonic()
+        except (psycopg2.Error, OSError, ValueError) as e:
+            # Notifications may be missed from here on: check tokens against the table until reloaded
+            _loaded_pid = None
+            print(f"Token revocation listener: {e}; reconnecting in {delay}s")
+            if listener is not None:
+                try:
+                    listener.close()
+                except psycopg2.Error:
+                    pass
+            listener = None
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+# ── Revoking ──
+
+def _revoke(entry, jti, user_id, revoked_at):
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute('''
+            INSERT INTO token_revocations (jti, user_id, revoked_at, expires_at)
+            VALUES (%s, %s, to_timestamp(%s), to_timestamp(%s))
+            ON CONFLICT (jti) DO NOTHING
+        ''', (jti, user_id, revoked_at, entry['exp']))
+        # Delivered on commit, to every process including this one
+        cur.execute('SELECT pg_notify(%s, %s)', (REVOCATION_CHANNEL, json.dumps(entry)))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    # This process's listener would apply it a moment later; the caller's next request must not race it
+    _apply(entry)
+
+
+def revoke_token(payload):
+    """Revoke one token (logout). ``payload`` is the decoded token."""
+    _revoke({'jti': payload['jti'], 'exp': payload['exp']}, payload['jti'], payload.get('user_id'), time.time())
+
+
+def revoke_user(user_id):
+    """Revoke every token issued to ``user_id`` so far: logout everywhere, deletion, role change."""
+    now = time.time()
+    _revoke({'user_id': user_id, 'cutoff': now, 'exp': now + TOKEN_LIFETIME}, None, user_id, now)
+
+
+def prune_expired(cur):
+    """Delete revocations whose tokens have all expired. Returns the number deleted."""
+    cur.execute('DELETE FROM token_revocations WHERE expires_at <= CURRENT_TIMESTAMP')
+    return cur.rowcount
@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify, g
-import bcrypt
 import jwt
 import datetime
 import os
 import functools
+import secrets
+import time
 from database import get_db
+from passwords import HashingBusy, hash_password, needs_rehash, verify_password
+from principals import get_principal
+from revocation import TOKEN_LIFETIME, is_revoked, revoke_token, revoke_user
+from ratelimit import RATE_LIMIT_LOGIN, RATE_LIMIT_LOGIN_EMAIL, RATE_LIMIT_REGISTER, json_field, rate_limit
 import psycopg2.extras
 
 auth_bp = Blueprint('auth', __name__)
@@ -15,67 +20,86 @@ def create_token(user_id, role):
     payload = {
         'user_id': user_id,
         'role': role,
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
+        # jti and iat let a token be revoked alone or with all of a user's older ones
+        'jti': secrets.token_urlsafe(12),
+        'iat': time.time(),
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=TOKEN_LIFETIME)
     }
     return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
 def decode_token(token):
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    # In-memory check, no query (see revocation.py)
+    if is_revoked(payload):
+        return None
+    return payload
+
+def authenticate():
+    """The principal (see principals.py) for the request's bearer token, or an error response.
+
+    Returns ``(principal, None)`` or ``(None, response)``.
+    """
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    if not token:
+        return None, (jsonify({'error': 'Authentication required'}), 401)
+    payload = decode_token(token)
+    if not payload:
+        return None, (jsonify({'error': 'Invalid or expired token'}), 401)
+    # The role comes from the users row, not the token, so role changes apply at once
+    principal = get_principal(payload['user_id'])
+    if principal is None:
+        return None, (jsonify({'error': 'Invalid or expired token'}), 401)
+    g.token_payload = payload
+    return principal, None
+
+def _set_principal(principal):
+    g.principal = principal
+    g.user_id = principal['id'] if principal else None
+    g.user_role = principal['role'] if principal else None
 
 def login_required(f):
     @functools.wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'Authentication required'}), 401
-        payload = decode_token(token)
-        if not payload:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        g.user_id = payload['user_id']
-        g.user_role = payload['role']
+        principal, error = authenticate()
+        if error:
+            return error
+        _set_principal(principal)
         return f(*args, **kwargs)
     return decorated
 
 def admin_required(f):
     @functools.wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'Authentication required'}), 401
-        payload = decode_token(token)
-        if not payload:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        if payload['role'] != 'admin':
+        principal, error = authenticate()
+        if error:
+            return error
+        if principal['role'] != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
-        g.user_id = payload['user_id']
-        g.user_role = payload['role']
+        _set_principal(principal)
         return f(*args, **kwargs)
     return decorated
 
 def optional_auth(f):
     @functools.wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if token:
-            payload = decode_token(token)
-            if payload:
-                g.user_id = payload['user_id']
-                g.user_role = payload['role']
-            else:
-                g.user_id = None
-                g.user_role = None
-        else:
-            g.user_id = None
-            g.user_role = None
+        principal = None
+        if request.headers.get('Authorization'):
+            principal, _ = authenticate()
+        _set_principal(principal)
         return f(*args, **kwargs)
     return decorated
 
+def hashing_busy():
+    """503 for when the password hashing queue is full (see passwords.py)."""
+    return jsonify({'error': 'Too many sign-ins right now, please try again in a moment'}), 503, {'Retry-After': '1'}
+
 @auth_bp.route('/api/auth/register', methods=['POST'])
+@rate_limit('register', RATE_LIMIT_REGISTER)
 def register():
     data = request.get_json()
     name = data.get('name', '').strip()
@@ -97,7 +121,12 @@ def register():
         conn.close()
         return jsonify({'error': 'Email already registered'}), 409
 
-    pw_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    try:
+        pw_hash = hash_password(password)
+    except HashingBusy:
+        cur.close()
+        conn.close()
+        return hashing_busy()
     cur.execute(
         'INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s) RETURNING id',
         (name, email, pw_hash)
@@ -120,6 +149,8 @@ def register():
     }), 201
 
 @auth_bp.route('/api/auth/login', methods=['POST'])
+@rate_limit('login', RATE_LIMIT_LOGIN)
+@rate_limit('login-email', RATE_LIMIT_LOGIN_EMAIL, key=json_field('email'))
 def login():
     data = request.get_json()
     email = data.get('email', '').strip().lower()
@@ -138,8 +169,14 @@ def login():
     if not user:
         return jsonify({'error': 'Invalid email or password'}), 401
 
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
-        return jsonify({'error': 'Invalid email or password'}), 401
+    try:
+        if not verify_password(password, user['password_hash']):
+            return jsonify({'error': 'Invalid email or password'}), 401
+    except HashingBusy:
+        return hashing_busy()
+
+    if needs_rehash(user['password_hash']):
+        rehash_password(user['id'], user['password_hash'], password)
 
     token = create_token(user['id'], user['role'])
 
@@ -154,18 +191,44 @@ def login():
         }
     })
 
-@auth_bp.route('/api/auth/me', methods=['GET'])
-@login_required
-def get_me():
+def rehash_password(user_id, old_hash, password):
+    """Re-hash with the current BCRYPT_ROUNDS after a successful login.
+
+    Best effort: when the hashing queue is full the next login tries again.
+    """
+    try:
+        new_hash = hash_password(password)
+    except HashingBusy:
+        return
     conn = get_db()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('SELECT id, name, email, role, created_at FROM users WHERE id = %s', (g.user_id,))
-    user = cur.fetchone()
+    cur = conn.cursor()
+    # Unless the password was changed meanwhile
+    cur.execute('UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s',
+                (new_hash, user_id, old_hash))
+    conn.commit()
     cur.close()
     conn.close()
 
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
+@auth_bp.route('/api/auth/logout', methods=['POST'])
+@login_required
+def logout():
+    """Revoke the token this request was made with."""
+    if 'jti' in g.token_payload:
+        revoke_token(g.token_payload)
+    else:
+        # Issued before tokens had ids: the only way to revoke it is with all the others
+        revoke_user(g.user_id)
+    return jsonify({'message': 'Logged out'})
+
+@auth_bp.route('/api/auth/logout-all', methods=['POST'])
+@login_required
+def logout_everywhere():
+    """Revoke every token issued to this user so far, on every device (including this one)."""
+    revoke_user(g.user_id)
+    return jsonify({'message': 'Logged out on all devices'})
 
-    user['created_at'] = str(user['created_at'])
-    return jsonify({'user': dict(user)})
+@auth_bp.route('/api/auth/me', methods=['GET'])
+@login_required
+def get_me():
+    # Served from the principal cache: no query on the hot path
+    return jsonify({'user': g.principal})
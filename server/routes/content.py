@@ -1,15 +1,32 @@
-from flask import Blueprint, request, jsonify, g
-import os
+from flask import Blueprint, Response, request, jsonify, g
 from database import get_db
 from routes.auth import login_required, admin_required, optional_auth
-from PyPDF2 import PdfReader
+from entitlements import accessible_content_ids, has_access, is_admin
+from catalog_cache import catalog_cache
+from http_cache import make_etag, cache_headers, not_modified
+from pagination import page_args, keyset_filter, keyset_order, split_page, decode_cursor, decode_rank_cursor
+from search import search_catalog, suggest, normalize_suggest_query
+from cache import LRUCache
+from content_pages import chunk_text, replace_pages, page_total, fetch_pages, DEFAULT_WINDOW, MAX_WINDOW
+from ingest import apply_extraction
+from storage import receive, acquire, release, file_ext, cached_extraction
+from jobs import enqueue, serialize_job
 import psycopg2.extras
 
 content_bp = Blueprint('content', __name__)
 
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-UPLOAD_DIR = os.path.abspath(UPLOAD_DIR)
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+SUGGEST_LIMIT = 8
+# Hot prefixes ("th", "the", ...) are shared by everyone typing, so cache per worker.
+# Keyed on the catalog version: any catalog write, from any process, retires every entry
+suggest_cache = LRUCache(maxsize=2048, ttl=120)
+
+# Every column except the search vectors, which are only ever used inside SQL
+CONTENT_COLUMNS = ('id, title, author, category, description, preview_text, cover_image, file_path, '
+                   'full_text, page_count, price, is_featured, created_at, updated_at')
+PUBLIC_CONTENT_COLUMNS = ('id, title, author, category, description, preview_text, cover_image, '
+                          'page_count, price, is_featured, created_at, updated_at')
+CATALOG_COLUMNS = ['id', 'title', 'author', 'category', 'description', 'preview_text', 'cover_image',
+                   'page_count', 'price', 'is_featured', 'created_at']
 
 def _serialize_content(row):
     """Convert a content row dict so all values are JSON-serializable."""
@@ -23,83 +40,213 @@ def _serialize_content(row):
 @optional_auth
 def list_content():
     category = request.args.get('category', '')
-    search = request.args.get('search', '')
+    search = request.args.get('search', '').strip()
     featured = request.args.get('featured', '')
+    try:
+        limit, after = page_args(request.args, decode=decode_rank_cursor if search else decode_cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = catalog_cache.key(category, search, featured, limit, request.args.get('after'))
+    version = catalog_cache.version
+    private = g.user_id is not None
+
+    # Anonymous users and admins see the same access flags on every item, so the
+    # validator is known before touching the cache or the database
+    access_tag = 'admin' if is_admin(g.user_role) else None if g.user_id else 'anonymous'
+    if access_tag:
+        etag = make_etag('catalog', version, key, access_tag)
+        cached = not_modified(etag, private)
+        if cached:
+            return cached
+
+    page = catalog_cache.get(key)
+    conn = cur = None
+
+    if page is None:
+        conn = get_db()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        if search:
+            rows, next_cursor = search_catalog(cur, CATALOG_COLUMNS, search, category, bool(featured), limit, after)
+        else:
+            query = f'SELECT {", ".join(CATALOG_COLUMNS)} FROM content WHERE 1=1'
+            params = []
+
+            if category:
+                query += ' AND category = %s'
+                params.append(category)
+            if featured:
+                query += ' AND is_featured = TRUE'
+
+            keyset_sql, keyset_params = keyset_filter(after)
+            query += f' AND {keyset_sql} ORDER BY {keyset_order()} LIMIT %s'
+            params.extend(keyset_params + [limit + 1])
+
+            cur.execute(query, params)
+            rows, next_cursor = split_page(cur.fetchall(), limit)
+        page = catalog_cache.store(key, [_serialize_content(row) for row in rows], next_cursor, version)
+
+    # The cached page is shared by everyone; only regular users need a lookup
+    if g.user_id and not is_admin(g.user_role) and page.ids:
+        if conn is None:
+            conn = get_db()
+            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    allowed = accessible_content_ids(cur, g.user_id, g.user_role, page.ids)
+
+    if conn is not None:
+        cur.close()
+        conn.close()
 
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    query = 'SELECT id, title, author, category, description, preview_text, cover_image, page_count, price, is_featured, created_at FROM content WHERE 1=1'
-    params = []
-
-    if category:
-        query += ' AND category = %s'
-        params.append(category)
-    if search:
-        query += ' AND (title ILIKE %s OR author ILIKE %s OR description ILIKE %s)'
-        params.extend([f'%{search}%'] * 3)
-    if featured:
-        query += ' AND is_featured = TRUE'
-
-    query += ' ORDER BY created_at DESC'
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    content_list = [_serialize_content(row) for row in rows]
-
-    # Check user access for each content item
-    if g.user_id:
-        for item in content_list:
-            cur.execute(
-                'SELECT id FROM user_content_access WHERE user_id = %s AND content_id = %s',
-                (g.user_id, item['id'])
-            )
-            access = cur.fetchone()
-            item['has_access'] = access is not None
-            if g.user_role == 'admin':
-                item['has_access'] = True
-    else:
-        for item in content_list:
-            item['has_access'] = False
+    if not access_tag:
+        etag = make_etag('catalog', version, key, sorted(allowed))
+        cached = not_modified(etag, private)
+        if cached:
+            return cached
+    return cache_headers(Response(page.render(allowed), mimetype='application/json'), etag, private)
+
+@content_bp.route('/api/content/suggest', methods=['GET'])
+def suggest_content():
+    q = normalize_suggest_query(request.args.get('q', ''))
+    if len(q) < 2:
+        return jsonify({'suggestions': []})
+    q = q[:64]
+
+    # Read before querying, so results racing a write are filed under the old version
+    key = (catalog_cache.version, q)
+    suggestions = suggest_cache.get(key)
+    if suggestions is None:
+        conn = get_db()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        suggestions = suggest(cur, q, SUGGEST_LIMIT)
+        cur.close()
+        conn.close()
+        suggest_cache.set(key, suggestions)
 
-    cur.close()
-    conn.close()
-    return jsonify({'content': content_list})
+    return jsonify({'suggestions': suggestions})
 
 @content_bp.route('/api/content/<int:content_id>', methods=['GET'])
 @optional_auth
 def get_content(content_id):
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('SELECT * FROM content WHERE id = %s', (content_id,))
-    item = cur.fetchone()
+    cur.execute('SELECT updated_at FROM content WHERE id = %s', (content_id,))
+    meta = cur.fetchone()
+
+    if not meta:
+        cur.close()
+        conn.close()
+        return jsonify({'error': 'Content not found'}), 404
 
+    # Validate before reading the row itself: a revalidation never touches full_text
+    access = has_access(cur, g.user_id, g.user_role, content_id)
+    # Readers fetch the text page by page from /pages; only the admin editor needs it whole
+    include_text = access and request.args.get('full_text') in ('1', 'true')
+    private = g.user_id is not None
+    etag = make_etag('content', content_id, meta['updated_at'], access, include_text)
+    cached = not_modified(etag, private)
+    if cached:
+        cur.close()
+        conn.close()
+        return cached
+
+    # The book body is only read when it is actually going to be sent. The
+    # PDF's location never leaves the server; readers ask for a signed URL.
+    columns = PUBLIC_CONTENT_COLUMNS + ', file_path IS NOT NULL AS has_file'
+    if include_text:
+        columns += ', full_text'
+
+    cur.execute(f'SELECT {columns} FROM content WHERE id = %s', (content_id,))
+    item = cur.fetchone()
     if not item:
         cur.close()
         conn.close()
         return jsonify({'error': 'Content not found'}), 404
 
     result = _serialize_content(item)
-    has_access = False
+    result['has_access'] = access
 
-    if g.user_id:
-        cur.execute(
-            'SELECT id FROM user_content_access WHERE user_id = %s AND content_id = %s',
-            (g.user_id, content_id)
-        )
-        access = cur.fetchone()
-        has_access = access is not None
-        if g.user_role == 'admin':
-            has_access = True
+    cur.close()
+    conn.close()
+    return cache_headers(jsonify({'content': result}), etag, private)
 
-    result['has_access'] = has_access
+@content_bp.route('/api/content/<int:content_id>/pages', methods=['GET'])
+@optional_auth
+def get_content_pages(content_id):
+    """A window of pages. Without ?from= a signed-in reader resumes at their last page."""
+    try:
+        count = max(1, min(int(request.args.get('count', DEFAULT_WINDOW)), MAX_WINDOW))
+        start = int(request.args['from']) if request.args.get('from') else None
+    except ValueError:
+        return jsonify({'error': 'from and count must be integers'}), 400
 
-    if not has_access:
-        result.pop('full_text', None)
-        result.pop('file_path', None)
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute('SELECT updated_at FROM content WHERE id = %s', (content_id,))
+    meta = cur.fetchone()
+    if not meta:
+        cur.close()
+        conn.close()
+        return jsonify({'error': 'Content not found'}), 404
+    if not has_access(cur, g.user_id, g.user_role, content_id):
+        cur.close()
+        conn.close()
+        return jsonify({'error': 'Purchase this content to read it'}), 403
+
+    if start is None:
+        start = 1
+        if g.user_id:
+            cur.execute(
+                'SELECT last_page FROM reading_progress WHERE user_id = %s AND content_id = %s',
+                (g.user_id, content_id)
+            )
+            progress = cur.fetchone()
+            if progress and progress['last_page']:
+                start = progress['last_page']
+
+    # Clamp before deriving the validator, so every out-of-range from= shares the last window's ETag
+    total = page_total(cur, content_id)
+    chunks = None
+    if not total:
+        # Rows from before per-page storage: split the stored text on the fly
+        cur.execute('SELECT full_text FROM content WHERE id = %s', (content_id,))
+        chunks = chunk_text(cur.fetchone()['full_text'] or '')
+        total = len(chunks)
+    start = max(1, min(start, total or 1))
+
+    etag = make_etag('pages', content_id, meta['updated_at'], start, count)
+    cached = not_modified(etag, True)
+    if cached:
+        cur.close()
+        conn.close()
+        return cached
+
+    if chunks is None:
+        pages = fetch_pages(cur, content_id, start, count)
+    else:
+        pages = [{'page_no': i, 'text': chunks[i - 1]} for i in range(start, min(start + count, total + 1))]
 
     cur.close()
     conn.close()
-    return jsonify({'content': result})
+
+    end = start + len(pages)
+    result = jsonify({
+        'pages': pages,
+        'from': start,
+        'total_pages': total,
+        'next_from': end if end <= total else None,
+        'prev_from': max(1, start - count) if start > 1 else None,
+    })
+    return cache_headers(result, etag, True)
+
+def _ingest(cur, content_id, file_path, sha256, fill_preview, preview_text):
+    """Fill in text from a PDF seen before, or queue extraction. Returns the job, if any."""
+    pages = cached_extraction(cur, sha256)
+    if pages is not None:
+        apply_extraction(cur, content_id, pages, fill_preview, preview_text)
+        return None
+    return enqueue(cur, 'extract_pdf', {
+        'content_id': content_id, 'file_path': file_path, 'sha256': sha256, 'fill_preview': fill_preview
+    }, content_id=content_id)
 
 @content_bp.route('/api/content', methods=['POST'])
 @admin_required
@@ -115,63 +262,43 @@ def create_content():
     if not title:
         return jsonify({'error': 'Title is required'}), 400
 
-    full_text = ''
-    file_path = None
-    page_count = 0
-
-    # Handle PDF upload
-    if 'pdf_file' in request.files:
-        pdf_file = request.files['pdf_file']
-        if pdf_file.filename:
-            filename = f"{title.replace(' ', '_').lower()}_{os.urandom(4).hex()}.pdf"
-            filepath = os.path.join(UPLOAD_DIR, filename)
-            pdf_file.save(filepath)
-            file_path = filename
-
-            try:
-                reader = PdfReader(filepath)
-                page_count = len(reader.pages)
-                text_parts = []
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_parts.append(text)
-                full_text = '\n\n'.join(text_parts)
-
-                if not preview_text and full_text:
-                    preview_text = full_text[:500] + '...'
-            except Exception as e:
-                print(f"PDF extraction error: {e}")
-
-    # Handle cover image
-    cover_image = None
-    if 'cover_image' in request.files:
+    # Uploads are hashed on the way in and stored once per distinct file
+    pdf_upload = cover_upload = None
+    if 'pdf_file' in request.files and request.files['pdf_file'].filename:
+        pdf_upload = receive(request.files['pdf_file'], 'pdf')
+    if 'cover_image' in request.files and request.files['cover_image'].filename:
         img_file = request.files['cover_image']
-        if img_file.filename:
-            img_filename = f"cover_{os.urandom(4).hex()}_{img_file.filename}"
-            img_path = os.path.join(UPLOAD_DIR, img_filename)
-            img_file.save(img_path)
-            cover_image = img_filename
+        cover_upload = receive(img_file, file_ext(img_file.filename, 'jpg'))
 
-    if not full_text and request.form.get('full_text'):
-        full_text = request.form.get('full_text', '')
+    full_text = request.form.get('full_text', '')
 
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    file_path = acquire(cur, pdf_upload) if pdf_upload else None
+    cover_image = acquire(cur, cover_upload) if cover_upload else None
     cur.execute('''
         INSERT INTO content (title, author, category, description, preview_text, cover_image, file_path, full_text, page_count, price, is_featured)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
-    ''', (title, author, category, description, preview_text, cover_image, file_path, full_text, page_count, price, is_featured))
+    ''', (title, author, category, description, preview_text, cover_image, file_path, full_text, 0, price, is_featured))
 
     content_id = cur.fetchone()['id']
+    replace_pages(cur, content_id, chunk_text(full_text))
+    job = None
+    if pdf_upload:
+        job = _ingest(cur, content_id, file_path, pdf_upload.sha256, not preview_text, preview_text)
+    if cover_image:
+        enqueue(cur, 'cover_derivatives', {'cover_image': cover_image}, content_id=content_id)
     conn.commit()
+    catalog_cache.invalidate()
 
-    cur.execute('SELECT * FROM content WHERE id = %s', (content_id,))
+    cur.execute(f'SELECT {CONTENT_COLUMNS} FROM content WHERE id = %s', (content_id,))
     new_item = cur.fetchone()
     cur.close()
     conn.close()
 
+    if job:
+        return jsonify({'content': _serialize_content(new_item), 'job': serialize_job(job)}), 202
     return jsonify({'content': _serialize_content(new_item)}), 201
 
 @content_bp.route('/api/content/<int:content_id>', methods=['PUT'])
@@ -179,7 +306,7 @@ def create_content():
 def update_content(content_id):
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('SELECT * FROM content WHERE id = %s', (content_id,))
+    cur.execute(f'SELECT {CONTENT_COLUMNS} FROM content WHERE id = %s', (content_id,))
     existing = cur.fetchone()
 
     if not existing:
@@ -211,36 +338,21 @@ def update_content(content_id):
     file_path = existing['file_path']
     page_count = existing['page_count']
     cover_image = existing['cover_image']
-
-    # Handle new PDF upload
-    if request.files and 'pdf_file' in request.files:
-        pdf_file = request.files['pdf_file']
-        if pdf_file.filename:
-            filename = f"{title.replace(' ', '_').lower()}_{os.urandom(4).hex()}.pdf"
-            filepath = os.path.join(UPLOAD_DIR, filename)
-            pdf_file.save(filepath)
-            file_path = filename
-
-            try:
-                reader = PdfReader(filepath)
-                page_count = len(reader.pages)
-                text_parts = []
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_parts.append(text)
-                full_text = '\n\n'.join(text_parts)
-            except Exception as e:
-                print(f"PDF extraction error: {e}")
-
-    # Handle new cover image
-    if request.files and 'cover_image' in request.files:
+    new_pdf = None
+
+    # New uploads take a reference to their blob and drop the old one.
+    # Re-uploading the same file is a no-op, including its extraction.
+    if request.files and 'pdf_file' in request.files and request.files['pdf_file'].filename:
+        new_pdf = receive(request.files['pdf_file'], 'pdf')
+        file_path = acquire(cur, new_pdf)
+        release(cur, existing['file_path'])
+        if file_path == existing['file_path']:
+            new_pdf = None
+
+    if request.files and 'cover_image' in request.files and request.files['cover_image'].filename:
         img_file = request.files['cover_image']
-        if img_file.filename:
-            img_filename = f"cover_{os.urandom(4).hex()}_{img_file.filename}"
-            img_path = os.path.join(UPLOAD_DIR, img_filename)
-            img_file.save(img_path)
-            cover_image = img_filename
+        cover_image = acquire(cur, receive(img_file, file_ext(img_file.filename, 'jpg')))
+        release(cur, existing['cover_image'])
 
     cur.execute('''
         UPDATE content SET title=%s, author=%s, category=%s, description=%s, preview_text=%s,
@@ -249,12 +361,23 @@ def update_content(content_id):
     ''', (title, author, category, description, preview_text, cover_image, file_path,
           full_text, page_count, price, is_featured, content_id))
 
+    if full_text != existing['full_text']:
+        replace_pages(cur, content_id, chunk_text(full_text))
+    job = None
+    if new_pdf:
+        job = _ingest(cur, content_id, file_path, new_pdf.sha256, False, preview_text)
+    if cover_image != existing['cover_image']:
+        enqueue(cur, 'cover_derivatives', {'cover_image': cover_image}, content_id=content_id)
+
     conn.commit()
-    cur.execute('SELECT * FROM content WHERE id = %s', (content_id,))
+    catalog_cache.invalidate()
+    cur.execute(f'SELECT {CONTENT_COLUMNS} FROM content WHERE id = %s', (content_id,))
     updated = cur.fetchone()
     cur.close()
     conn.close()
 
+    if job:
+        return jsonify({'content': _serialize_content(updated), 'job': serialize_job(job)}), 202
     return jsonify({'content': _serialize_content(updated)})
 
 @content_bp.route('/api/content/<int:content_id>', methods=['DELETE'])
@@ -262,7 +385,7 @@ def update_content(content_id):
 def delete_content(content_id):
     conn = get_db()
     cur = conn.cursor()
-    cur.execute('SELECT id FROM content WHERE id = %s', (content_id,))
+    cur.execute('SELECT file_path, cover_image FROM content WHERE id = %s', (content_id,))
     existing = cur.fetchone()
 
     if not existing:
@@ -270,13 +393,19 @@ def delete_content(content_id):
         conn.close()
         return jsonify({'error': 'Content not found'}), 404
 
+    # Files are reclaimed by the blob sweep once nothing else refers to them
+    release(cur, existing[0])
+    release(cur, existing[1])
+
     # Delete associated records
+    cur.execute('DELETE FROM content_pages WHERE content_id = %s', (content_id,))
     cur.execute('DELETE FROM bookmarks WHERE content_id = %s', (content_id,))
     cur.execute('DELETE FROM reading_progress WHERE content_id = %s', (content_id,))
     cur.execute('DELETE FROM user_content_access WHERE content_id = %s', (content_id,))
     cur.execute('DELETE FROM payments WHERE content_id = %s', (content_id,))
     cur.execute('DELETE FROM content WHERE id = %s', (content_id,))
     conn.commit()
+    catalog_cache.invalidate()
     cur.close()
     conn.close()
 
@@ -0,0 +1,47 @@
+from flask import Blueprint, request, jsonify, send_file
+from database import get_db
+from http_cache import make_etag
+from file_serving import send_upload, IMMUTABLE_MAX_AGE
+import covers
+
+covers_bp = Blueprint('covers', __name__)
+
+@covers_bp.route('/uploads/covers/<int:content_id>', methods=['GET'])
+def cover_image(content_id):
+    """The cover of ``content_id`` resized to ``?w=`` pixels wide (see covers.py)."""
+    try:
+        width = covers.snap_width(int(request.args.get('w', covers.COVER_WIDTHS[1])))
+    except ValueError:
+        return jsonify({'error': 'w must be an integer'}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute('SELECT cover_image FROM content WHERE id = %s', (content_id,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    if not row or not row[0]:
+        return jsonify({'error': 'Not found'}), 404
+    key = row[0]
+
+    if not covers.available():
+        return send_upload(key)
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    try:
+        path = covers.render(key, width, fmt)
+    except FileNotFoundError:
+        return jsonify({'error': 'Not found'}), 404
+    except Exception as e:
+        # Not something Pillow can decode (or a decompression bomb): send it as uploaded
+        print(f"Cover {content_id}: serving original, could not resize {key}: {e}")
+        return send_upload(key)
+
+    response = send_file(path, mimetype=f'image/{fmt}', conditional=True,
+                         etag=make_etag('cover', key, width, fmt))
+    response.vary.add('Accept')
+    # ?v= names the cover file, so a URL that matches it can never change
+    if request.args.get('v') == key:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
@@ -0,0 +1,50 @@
+from flask import Blueprint, request, jsonify, g
+from database import get_db
+from routes.auth import login_required
+from entitlements import has_access
+from file_serving import send_upload, signed_download_url, verify_download
+import psycopg2.extras
+
+downloads_bp = Blueprint('downloads', __name__)
+
+@downloads_bp.route('/api/content/<int:content_id>/download', methods=['GET'])
+@login_required
+def get_download_url(content_id):
+    """A short-lived signed URL for the content's PDF (readers with access only)."""
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute('SELECT file_path FROM content WHERE id = %s', (content_id,))
+    item = cur.fetchone()
+    if not item:
+        cur.close()
+        conn.close()
+        return jsonify({'error': 'Content not found'}), 404
+    access = has_access(cur, g.user_id, g.user_role, content_id)
+    cur.close()
+    conn.close()
+
+    if not access:
+        return jsonify({'error': 'Purchase this content to download it'}), 403
+    if not item['file_path']:
+        return jsonify({'error': 'This content has no PDF'}), 404
+
+    url, expires = signed_download_url(content_id, g.user_id)
+    return jsonify({'url': url, 'expires_at': expires})
+
+@downloads_bp.route('/api/downloads/<int:content_id>', methods=['GET'])
+def download(content_id):
+    """Serve a PDF to the holder of a valid signed URL; supports Range requests."""
+    args = request.args
+    if not verify_download(content_id, args.get('u'), args.get('exp'), args.get('sig')):
+        return jsonify({'error': 'Download link is invalid or has expired'}), 403
+
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute('SELECT title, file_path FROM content WHERE id = %s', (content_id,))
+    item = cur.fetchone()
+    cur.close()
+    conn.close()
+
+    if not item or not item['file_path']:
+        return jsonify({'error': 'Content not found'}), 404
+    return send_upload(item['file_path'], private=True, download_name=f"{item['title']}.pdf")
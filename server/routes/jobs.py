@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from database import get_db
+from routes.auth import admin_required
+from jobs import get_job, serialize_job
+import psycopg2.extras
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def job_status(job_id):
+    """Status of a background job; the admin editor polls this after an upload."""
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    job = get_job(cur, job_id)
+    cur.close()
+    conn.close()
+
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': serialize_job(job)})
@@ -4,6 +4,10 @@ import string
 import datetime
 from database import get_db
 from routes.auth import login_required
+from ratelimit import RATE_LIMIT_OTP, current_user, rate_limit
+from entitlements import has_access
+from metrics import payment_event
+from pagination import page_args, keyset_filter, keyset_order, split_page
 import psycopg2.extras
 
 payments_bp = Blueprint('payments', __name__)
@@ -31,13 +35,7 @@ def initiate_payment():
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
     # Check if user already has access
-    cur.execute(
-        'SELECT id FROM user_content_access WHERE user_id = %s AND content_id = %s',
-        (g.user_id, content_id)
-    )
-    access = cur.fetchone()
-
-    if access:
+    if has_access(cur, g.user_id, g.user_role, content_id):
         cur.close()
         conn.close()
         return jsonify({'error': 'You already have access to this content'}), 400
@@ -65,6 +63,7 @@ def initiate_payment():
     conn.commit()
     cur.close()
     conn.close()
+    payment_event('initiated')
 
     return jsonify({
         'message': f'Payment initiated for "{content["title"]}". Enter the OTP to confirm.',
@@ -78,6 +77,8 @@ def initiate_payment():
 
 @payments_bp.route('/api/payments/confirm', methods=['POST'])
 @login_required
+# Six-digit OTPs: guessing is only hopeless if attempts are limited
+@rate_limit('otp', RATE_LIMIT_OTP, key=current_user)
 def confirm_payment():
     data = request.get_json()
     payment_id = data.get('payment_id')
@@ -97,11 +98,13 @@ def confirm_payment():
     if not payment:
         cur.close()
         conn.close()
+        payment_event('failed', 'not_found')
         return jsonify({'error': 'Payment not found or already processed'}), 404
 
     if payment['otp_code'] != otp:
         cur.close()
         conn.close()
+        payment_event('failed', 'invalid_otp')
         return jsonify({'error': 'Invalid OTP. Please try again.'}), 400
 
     # Confirm payment
@@ -115,6 +118,7 @@ def confirm_payment():
     ''', (g.user_id, payment['content_id']))
 
     conn.commit()
+    payment_event('confirmed', amount=payment['amount'])
 
     cur.execute('SELECT title FROM content WHERE id = %s', (payment['content_id'],))
     content = cur.fetchone()
@@ -130,16 +134,23 @@ def confirm_payment():
 @payments_bp.route('/api/payments/history', methods=['GET'])
 @login_required
 def payment_history():
+    try:
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    keyset_sql, keyset_params = keyset_filter(after, 'p.created_at', 'p.id')
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('''
+    cur.execute(f'''
         SELECT p.*, c.title as content_title
         FROM payments p
         LEFT JOIN content c ON p.content_id = c.id
-        WHERE p.user_id = %s
-        ORDER BY p.created_at DESC
-    ''', (g.user_id,))
-    payments = cur.fetchall()
+        WHERE p.user_id = %s AND {keyset_sql}
+        ORDER BY {keyset_order('p.created_at', 'p.id')}
+        LIMIT %s
+    ''', [g.user_id] + keyset_params + [limit + 1])
+    payments, next_cursor = split_page(cur.fetchall(), limit)
     cur.close()
     conn.close()
 
@@ -148,4 +159,4 @@ def payment_history():
         if 'created_at' in p and p['created_at']:
             p['created_at'] = str(p['created_at'])
 
-    return jsonify({'payments': [dict(p) for p in payments]})
+    return jsonify({'payments': [dict(p) for p in payments], 'next_cursor': next_cursor})
@@ -1,10 +1,12 @@
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, request, jsonify, g
 from database import get_db
-from routes.auth import login_required
+from routes.auth import login_required, hashing_busy
+from passwords import HashingBusy, hash_password, verify_password
+from principals import PRINCIPAL_COLUMNS, principal_row
+import principals
+from storage import UPLOAD_DIR, receive, acquire, release, UploadTooLarge
 import psycopg2.extras
-import bcrypt
 import os
-import uuid
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -27,44 +29,44 @@ def update_profile():
     if not name:
         return jsonify({'error': 'Name is required'}), 400
 
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('SELECT * FROM users WHERE id = %s', (g.user_id,))
-    user = cur.fetchone()
-
-    if not user:
-        cur.close(); conn.close()
-        return jsonify({'error': 'User not found'}), 404
-
-    # Handle password change
-    new_hash = user['password_hash']
+    updates = {'name': name}
     if new_password:
         if not current_password:
-            cur.close(); conn.close()
             return jsonify({'error': 'Current password is required to set a new password'}), 400
-        if not bcrypt.checkpw(current_password.encode('utf-8'), user['password_hash'].encode('utf-8')):
-            cur.close(); conn.close()
-            return jsonify({'error': 'Current password is incorrect'}), 401
-        if len(new_password) < 6:
-            cur.close(); conn.close()
-            return jsonify({'error': 'New password must be at least 6 characters'}), 400
-        new_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-    cur.execute(
-        'UPDATE users SET name = %s, password_hash = %s WHERE id = %s',
-        (name, new_hash, g.user_id)
-    )
-    conn.commit()
-
+        conn = get_db()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute('SELECT password_hash FROM users WHERE id = %s', (g.user_id,))
+        user = cur.fetchone()
+        cur.close(); conn.close()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        try:
+            if not verify_password(current_password, user['password_hash']):
+                return jsonify({'error': 'Current password is incorrect'}), 401
+            if len(new_password) < 6:
+                return jsonify({'error': 'New password must be at least 6 characters'}), 400
+            updates['password_hash'] = hash_password(new_password)
+        except HashingBusy:
+            return hashing_busy()
+    elif name == g.principal['name']:
+        # Nothing changed: answer from the principal cache
+        return jsonify({'message': 'Profile updated successfully', 'user': g.principal})
+
+    assignments = ', '.join(f'{col} = %s' for col in updates)
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
     cur.execute(
-        'SELECT id, name, email, role, avatar_url, created_at FROM users WHERE id = %s',
-        (g.user_id,)
+        f'UPDATE users SET {assignments} WHERE id = %s RETURNING {PRINCIPAL_COLUMNS}',
+        list(updates.values()) + [g.user_id]
     )
     updated = cur.fetchone()
+    conn.commit()
     cur.close(); conn.close()
+    if not updated:
+        return jsonify({'error': 'User not found'}), 404
 
-    updated['created_at'] = str(updated['created_at'])
-    return jsonify({'message': 'Profile updated successfully', 'user': dict(updated)})
+    principals.invalidate(g.user_id)
+    return jsonify({'message': 'Profile updated successfully', 'user': principal_row(updated)})
 
 
 @profile_bp.route('/api/profile/avatar', methods=['POST'])
@@ -81,40 +83,31 @@ def upload_avatar():
     if not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file type. Only PNG, JPG, GIF, WEBP allowed.'}), 400
 
-    # Check file size
-    file.seek(0, 2)
-    size = file.tell()
-    file.seek(0)
-    if size > MAX_FILE_SIZE:
+    # Streamed to disk and hashed; identical pictures share one stored file
+    try:
+        upload = receive(file, file.filename.rsplit('.', 1)[1], max_size=MAX_FILE_SIZE)
+    except UploadTooLarge:
         return jsonify({'error': 'File too large. Maximum size is 5MB.'}), 400
 
-    # Save with a unique filename
-    ext = file.filename.rsplit('.', 1)[1].lower()
-    filename = f"avatar_{g.user_id}_{uuid.uuid4().hex[:8]}.{ext}"
-
-    upload_folder = os.path.join(current_app.root_path, 'uploads', 'avatars')
-    os.makedirs(upload_folder, exist_ok=True)
-
-    # Remove old avatar file if it exists
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('SELECT avatar_url FROM users WHERE id = %s', (g.user_id,))
+    # Locked until commit: a concurrent upload or delete_user must not release the same old blob
+    cur.execute('SELECT avatar_url FROM users WHERE id = %s FOR UPDATE', (g.user_id,))
     row = cur.fetchone()
-    if row and row['avatar_url']:
-        old_path = os.path.join(current_app.root_path, row['avatar_url'].lstrip('/'))
+
+    avatar_url = '/uploads/' + acquire(cur, upload)
+    if row and row['avatar_url'] and not release(cur, row['avatar_url']):
+        # Pre-blob avatars belonged to this user alone
+        old_path = os.path.join(UPLOAD_DIR, row['avatar_url'][len('/uploads/'):])
         if os.path.exists(old_path):
             try:
                 os.remove(old_path)
             except Exception:
                 pass
 
-    file_path = os.path.join(upload_folder, filename)
-    file.save(file_path)
-
-    avatar_url = f'/uploads/avatars/{filename}'
-
     cur.execute('UPDATE users SET avatar_url = %s WHERE id = %s', (avatar_url, g.user_id))
     conn.commit()
     cur.close(); conn.close()
+    principals.invalidate(g.user_id)
 
     return jsonify({'message': 'Avatar uploaded successfully', 'avatar_url': avatar_url})
@@ -0,0 +1,79 @@
+from flask import Blueprint, Response, jsonify, request, send_from_directory
+import datetime
+import json
+import os
+import re
+from routes.auth import admin_required
+import profiling
+
+profiles_bp = Blueprint('profiles', __name__)
+
+# On-demand profiles are stored as <id>.speedscope.json + <id>.collapsed, or <id>.prof
+PROFILE_FORMATS = {
+    'speedscope': ('.speedscope.json', 'application/json'),
+    'collapsed': ('.collapsed', 'text/plain'),
+    'cprofile': ('.prof', 'application/octet-stream'),
+}
+
+
+@profiles_bp.route('/api/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Saved on-demand profiles, newest first (see profiling.py)."""
+    profiles = {}
+    if os.path.isdir(profiling.PROFILE_DIR):
+        for name in os.listdir(profiling.PROFILE_DIR):
+            for fmt, (suffix, _) in PROFILE_FORMATS.items():
+                if name.endswith(suffix) and not name.startswith('continuous'):
+                    profile_id = name[:-len(suffix)]
+                    stat = os.stat(os.path.join(profiling.PROFILE_DIR, name))
+                    entry = profiles.setdefault(profile_id, {
+                        'id': profile_id,
+                        'created_at': datetime.datetime.utcfromtimestamp(stat.st_mtime).isoformat() + 'Z',
+                        'formats': [],
+                    })
+                    entry['formats'].append(fmt)
+    return jsonify({'profiles': sorted(profiles.values(), key=lambda p: p['id'], reverse=True)})
+
+
+@profiles_bp.route('/api/profiles/continuous', methods=['GET'])
+@admin_required
+def continuous_profile():
+    """Hot stacks per route from continuous sampling, merged over this host's workers."""
+    fmt = request.args.get('format', 'speedscope')
+    if fmt not in ('speedscope', 'collapsed'):
+        return jsonify({'error': "format must be 'speedscope' or 'collapsed'"}), 400
+    if profiling.CONTINUOUS_HZ <= 0:
+        return jsonify({'error': 'Continuous profiling is off (set PROFILE_CONTINUOUS_HZ)'}), 404
+
+    route = request.args.get('route')
+    interval, stacks = profiling.continuous_report()
+    if route:
+        stacks = {stack: count for stack, count in stacks.items() if stack[0] == route}
+    if fmt == 'collapsed':
+        body, mimetype, filename = profiling.collapsed(stacks), 'text/plain', 'continuous.collapsed'
+    else:
+        body = json.dumps(profiling.speedscope(stacks, 'continuous: ' + (route or 'all routes'), interval))
+        mimetype, filename = 'application/json', 'continuous.speedscope.json'
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@profiles_bp.route('/api/profiles/continuous', methods=['DELETE'])
+@admin_required
+def reset_continuous_profile():
+    profiling.reset_continuous()
+    return jsonify({'message': 'Continuous profile reset'})
+
+
+@profiles_bp.route('/api/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def download_profile(profile_id):
+    fmt = request.args.get('format', 'speedscope')
+    if fmt not in PROFILE_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(PROFILE_FORMATS)}"}), 400
+    suffix, mimetype = PROFILE_FORMATS[fmt]
+    filename = profile_id + suffix
+    if not re.fullmatch(r'[\w-]+', profile_id) or not os.path.isfile(os.path.join(profiling.PROFILE_DIR, filename)):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_from_directory(profiling.PROFILE_DIR, filename, mimetype=mimetype, as_attachment=True)
@@ -1,6 +1,11 @@
+import os
 from flask import Blueprint, request, jsonify, g
 from database import get_db
 from routes.auth import login_required, admin_required
+from pagination import page_args, keyset_filter, keyset_order, split_page
+import principals
+from revocation import revoke_user
+from storage import UPLOAD_DIR, release
 import psycopg2.extras
 
 users_bp = Blueprint('users', __name__)
@@ -10,15 +15,24 @@ users_bp = Blueprint('users', __name__)
 @users_bp.route('/api/users', methods=['GET'])
 @admin_required
 def list_users():
+    try:
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    keyset_sql, keyset_params = keyset_filter(after)
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('SELECT id, name, email, role, created_at FROM users ORDER BY created_at DESC')
-    users = cur.fetchall()
+    cur.execute(
+        f'SELECT id, name, email, role, created_at FROM users WHERE {keyset_sql} ORDER BY {keyset_order()} LIMIT %s',
+        keyset_params + [limit + 1]
+    )
+    users, next_cursor = split_page(cur.fetchall(), limit)
     cur.close()
     conn.close()
     for u in users:
         u['created_at'] = str(u['created_at'])
-    return jsonify({'users': [dict(u) for u in users]})
+    return jsonify({'users': [dict(u) for u in users], 'next_cursor': next_cursor})
 
 @users_bp.route('/api/users/stats', methods=['GET'])
 @admin_required
@@ -83,11 +97,15 @@ def update_user(user_id):
 
     cur.execute('UPDATE users SET role = %s, name = %s WHERE id = %s', (role, name, user_id))
     conn.commit()
+    principals.invalidate(user_id)
 
     cur.execute('SELECT id, name, email, role, created_at FROM users WHERE id = %s', (user_id,))
     updated = cur.fetchone()
     cur.close()
     conn.close()
+    if role != user['role']:
+        # Sessions opened under the old role end; the user signs in again
+        revoke_user(user_id)
 
     updated['created_at'] = str(updated['created_at'])
     return jsonify({'user': dict(updated)})
@@ -98,7 +116,8 @@ def delete_user(user_id):
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
 
-    cur.execute('SELECT * FROM users WHERE id = %s', (user_id,))
+    # Locked so a concurrent avatar upload can't swap the blob released below
+    cur.execute('SELECT * FROM users WHERE id = %s FOR UPDATE', (user_id,))
     user = cur.fetchone()
     if not user:
         cur.close()
@@ -109,6 +128,8 @@ def delete_user(user_id):
         conn.close()
         return jsonify({'error': 'Cannot delete admin user'}), 400
 
+    avatar_url = user['avatar_url']
+    legacy_avatar = bool(avatar_url) and not release(cur, avatar_url)
     cur.execute('DELETE FROM bookmarks WHERE user_id = %s', (user_id,))
     cur.execute('DELETE FROM reading_progress WHERE user_id = %s', (user_id,))
     cur.execute('DELETE FROM user_content_access WHERE user_id = %s', (user_id,))
@@ -117,6 +138,16 @@ def delete_user(user_id):
     conn.commit()
     cur.close()
     conn.close()
+    principals.invalidate(user_id)
+    if legacy_avatar and avatar_url.startswith('/uploads/'):
+        # Pre-blob avatars belonged to this user alone
+        old_path = os.path.join(UPLOAD_DIR, avatar_url[len('/uploads/'):])
+        if os.path.exists(old_path):
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    revoke_user(user_id)
 
     return jsonify({'message': 'User deleted successfully'})
 
@@ -125,17 +156,34 @@ def delete_user(user_id):
 @users_bp.route('/api/bookmarks', methods=['GET'])
 @login_required
 def get_bookmarks():
+    try:
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    keyset_sql, keyset_params = keyset_filter(after, 'b.created_at', 'b.id')
+    params = [g.user_id] + keyset_params
+    content_filter = ''
+    if 'content_id' in request.args:
+        # Lets a content page ask "is this bookmarked?" without paging through everything
+        content_id = request.args.get('content_id', type=int)
+        if content_id is None:
+            return jsonify({'error': 'content_id must be an integer'}), 400
+        content_filter = 'AND b.content_id = %s'
+        params.append(content_id)
+
     conn = get_db()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    cur.execute('''
+    cur.execute(f'''
         SELECT b.id, b.created_at, c.id as content_id, c.title, c.author, c.category,
                c.description, c.cover_image, c.price
         FROM bookmarks b
         JOIN content c ON b.content_id = c.id
-        WHERE b.user_id = %s
-        ORDER BY b.created_at DESC
-    ''', (g.user_id,))
-    bookmarks = cur.fetchall()
+        WHERE b.user_id = %s AND {keyset_sql} {content_filter}
+        ORDER BY {keyset_order('b.created_at', 'b.id')}
+        LIMIT %s
+    ''', params + [limit + 1])
+    bookmarks, next_cursor = split_page(cur.fetchall(), limit)
     cur.close()
     conn.close()
 
@@ -143,7 +191,7 @@ def get_bookmarks():
         if 'created_at' in b and b['created_at']:
             b['created_at'] = str(b['created_at'])
 
-    return jsonify({'bookmarks': [dict(b) for b in bookmarks]})
+    return jsonify({'bookmarks': [dict(b) for b in bookmarks], 'next_cursor': next_cursor})
 
 @users_bp.route('/api/bookmarks', methods=['POST'])
 @login_required
@@ -0,0 +1,130 @@
+"""Full-text catalog search over the content search vectors.
+
+Both vectors are maintained by the ``content_search_vector_update`` trigger
+(see migrations/0002_search.py). A row matches if either its weighted header vector
+(title > author > description) or its body vector (full_text) matches; it is
+ranked on the header vector only, which is small and stored inline, so
+ranking thousands of hits never has to detoast whole books. Results are
+ordered by relevance and paginated on ``(rank, id)``.
+"""
+from pagination import encode_rank_cursor
+
+SEARCH_CONFIG = 'english'
+
+# Highlight markers are plain <mark> tags; the frontend splits on them rather
+# than injecting HTML, so any markup in the source text stays inert.
+HEADLINE_OPTIONS = (
+    'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=12, '
+    'MaxFragments=2, FragmentDelimiter=" … "'
+)
+TITLE_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true'
+
+
+def search_catalog(cur, columns, text, category=None, featured=False, limit=50, after=None):
+    """Run a ranked catalog search and return ``(rows, next_cursor)``.
+
+    ``columns`` is the list of ``content`` columns to return. Each row also
+    carries ``title_highlight`` and ``snippet`` with matched terms wrapped in
+    ``<mark>``. Snippets are built from the description and preview only, and
+    only for the rows on the requested page.
+    """
+    filters = ''
+    params = [text]
+    if category:
+        filters += ' AND c.category = %s'
+        params.append(category)
+    if featured:
+        filters += ' AND c.is_featured = TRUE'
+    if after is not None:
+        filters += ' AND (ts_rank_cd(c.search_vector, q), c.id) < (%s::real, %s)'
+        params.extend(after)
+    params.extend([limit + 1, text])
+
+    select_cols = ', '.join(f'c.{col}' for col in columns)
+    cur.execute(f'''
+        SELECT r.*,
+               ts_headline('{SEARCH_CONFIG}', r.title, q, %s) AS title_highlight,
+               ts_headline('{SEARCH_CONFIG}', concat_ws(' ', r.description, r.preview_text), q, %s) AS snippet
+        FROM (
+            SELECT {select_cols}, ts_rank_cd(c.search_vector, q) AS rank
+            FROM content c, websearch_to_tsquery('{SEARCH_CONFIG}', %s) q
+            WHERE (c.search_vector @@ q OR c.full_text_vector @@ q) {filters}
+            ORDER BY rank DESC, c.id DESC
+            LIMIT %s
+        ) r, websearch_to_tsquery('{SEARCH_CONFIG}', %s) q
+        ORDER BY r.rank DESC, r.id DESC
+    ''', [TITLE_HEADLINE_OPTIONS, HEADLINE_OPTIONS] + params)
+    rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1]['rank'], rows[-1]['id'])
+    for row in rows:
+        row.pop('rank', None)
+    return rows, next_cursor
+
+
+# ── Autocomplete ──
+
+SUGGEST_SIMILARITY = 0.4
+
+_trigram_support = None
+
+
+def trigram_available(cur):
+    """Whether pg_trgm is installed; checked once per worker."""
+    global _trigram_support
+    if _trigram_support is None:
+        cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _trigram_support = cur.fetchone() is not None
+    return _trigram_support
+
+
+def normalize_suggest_query(text):
+    return ' '.join(text.lower().split())
+
+
+def _like_escape(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def suggest(cur, text, limit=8):
+    """Top title/author completions for a partially typed query.
+
+    Prefix matches (of the whole value or of any word in it) come first, then
+    typo-tolerant matches by trigram word similarity. Without pg_trgm only
+    whole-value prefix matches are returned.
+    """
+    q = normalize_suggest_query(text)
+    params = {
+        'q': q,
+        'prefix': _like_escape(q) + '%',
+        'word_prefix': '% ' + _like_escape(q) + '%',
+        'limit': limit,
+    }
+    if trigram_available(cur):
+        cur.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(SUGGEST_SIMILARITY),))
+        match = '''(lower({col}) LIKE %(prefix)s OR lower({col}) LIKE %(word_prefix)s OR %(q)s <%% lower({col}))'''
+        score = 'word_similarity(%(q)s, lower({col}))'
+    else:
+        match = 'lower({col}) LIKE %(prefix)s'
+        score = '0'
+    is_prefix = '(lower({col}) LIKE %(prefix)s OR lower({col}) LIKE %(word_prefix)s)'
+
+    cur.execute(f'''
+        SELECT type, text, id FROM (
+            (SELECT 'title' AS type, title AS text, id,
+                    {is_prefix.format(col='title')} AS is_prefix, {score.format(col='title')} AS score
+             FROM content WHERE {match.format(col='title')}
+             ORDER BY is_prefix DESC, score DESC, title LIMIT %(limit)s)
+            UNION ALL
+            (SELECT 'author', author, NULL,
+                    {is_prefix.format(col='author')}, {score.format(col='author')}
+             FROM content WHERE {match.format(col='author')}
+             GROUP BY author ORDER BY 4 DESC, 5 DESC, author LIMIT %(limit)s)
+        ) s
+        ORDER BY is_prefix DESC, score DESC, type DESC, text
+        LIMIT %(limit)s
+    ''', params)
+    return [dict(row) for row in cur.fetchall()]
@@ -0,0 +1,215 @@
+"""Content-addressed upload storage.
+
+Uploads are streamed to a temp file while their SHA-256 is computed, then
+stored once per distinct content under ``uploads/blobs/<aa>/<sha256>.<ext>``.
+The ``blobs`` table counts how many rows (content PDFs and covers, user
+avatars) refer to each blob; the stored path is what those rows keep, and is
+served by the existing ``/uploads/<path>`` route.
+
+Reference counts change in the same transaction as the row that gains or
+drops the reference. Blobs whose count has been zero for
+``BLOB_GC_GRACE`` seconds are deleted by ``collect_garbage()``, which the job
+worker runs periodically. ``acquire()`` moves the upload into place only after
+it holds the blob's row lock, so a concurrent sweep can never delete the file
+out from under a new reference.
+
+Text extracted from a PDF blob is cached in ``blob_extractions`` so uploading
+the same file again (to another title, or while editing) skips extraction.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'uploads'))
+BLOB_PREFIX = 'blobs'
+BLOB_DIR = os.path.join(UPLOAD_DIR, BLOB_PREFIX)
+BLOB_TMP_DIR = os.path.join(BLOB_DIR, 'tmp')
+BLOB_GC_GRACE = float(os.environ.get('BLOB_GC_GRACE', 3600))
+CHUNK_SIZE = 64 * 1024
+
+os.makedirs(BLOB_TMP_DIR, exist_ok=True)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class Upload:
+    """A received file waiting in the temp directory to be acquired or discarded."""
+
+    __slots__ = ('sha256', 'size', 'ext', 'tmp_path')
+
+    def __init__(self, sha256, size, ext, tmp_path):
+        self.sha256 = sha256
+        self.size = size
+        self.ext = ext
+        self.tmp_path = tmp_path
+
+    @property
+    def key(self):
+        return f'{BLOB_PREFIX}/{self.sha256[:2]}/{self.sha256}.{self.ext}'
+
+    def discard(self):
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def file_ext(filename, default='bin'):
+    """Lower-cased extension of an uploaded filename, safe to use in a path."""
+    ext = os.path.splitext(filename or '')[1].lstrip('.').lower()
+    return ext if ext.isalnum() and len(ext) <= 8 else default
+
+
+def receive(stream, ext, max_size=None):
+    """Stream ``stream`` (e.g. a werkzeug FileStorage) to a temp file, hashing as it goes.
+
+    Raises UploadTooLarge (after cleaning up) once more than ``max_size``
+    bytes have been read.
+    """
+    ext = ext.lower().lstrip('.') or 'bin'
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_TMP_DIR, suffix='.' + ext)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(f'Upload exceeds {max_size} bytes')
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return Upload(digest.hexdigest(), size, ext, tmp_path)
+
+
+def acquire(cur, upload):
+    """Add a reference to ``upload``'s blob and return its storage key.
+
+    If the content is already stored the temp file is dropped and the
+    existing key is returned (whatever extension it was first uploaded with).
+    """
+    cur.execute('''
+        INSERT INTO blobs (sha256, path, size, refcount)
+        VALUES (%s, %s, %s, 1)
+        ON CONFLICT (sha256) DO UPDATE SET refcount = blobs.refcount + 1, released_at = NULL
+        RETURNING path
+    ''', (upload.sha256, upload.key, upload.size))
+    row = cur.fetchone()
+    key = row['path'] if isinstance(row, dict) else row[0]
+    target = os.path.join(UPLOAD_DIR, key)
+    # Holding the row lock now: a sweep that deleted this blob has committed,
+    # so (re)writing the file here can't race with its unlink
+    if os.path.exists(target):
+        upload.discard()
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(upload.tmp_path, target)
+    return key
+
+
+def release(cur, key):
+    """Drop one reference to the blob stored at ``key``.
+
+    Returns False for paths from before content-addressed storage, which are
+    not blobs and are left alone.
+    """
+    key = (key or '').lstrip('/')
+    if key.startswith('uploads/'):
+        key = key[len('uploads/'):]
+    if not key.startswith(BLOB_PREFIX + '/'):
+        return False
+    cur.execute('''
+        UPDATE blobs SET refcount = GREATEST(refcount - 1, 0),
+            released_at = CASE WHEN refcount <= 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+        WHERE path = %s
+    ''', (key,))
+    return True
+
+
+# ── Extraction cache ──
+
+def cached_extraction(cur, sha256):
+    """Per-page text previously extracted from this blob, or None."""
+    cur.execute('SELECT pages FROM blob_extractions WHERE sha256 = %s', (sha256,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    return row['pages'] if isinstance(row, dict) else row[0]
+
+
+def store_extraction(cur, sha256, pages):
+    cur.execute('''
+        INSERT INTO blob_extractions (sha256, pages) VALUES (%s, %s)
+        ON CONFLICT (sha256) DO UPDATE SET pages = EXCLUDED.pages, created_at = CURRENT_TIMESTAMP
+    ''', (sha256, pages))
+
+
+# ── Garbage collection ──
+
+def collect_garbage(conn, grace=BLOB_GC_GRACE, batch_size=500):
+    """Delete blobs that have been unreferenced for ``grace`` seconds.
+
+    Also removes stray temp files and blob files with no row (left by a crash
+    between writing and committing). Returns ``(blobs_deleted, bytes_freed)``.
+    """
+    cur = conn.cursor()
+    deleted = freed = 0
+    try:
+        while True:
+            cur.execute('''
+                DELETE FROM blobs WHERE sha256 IN (
+                    SELECT sha256 FROM blobs
+                    WHERE refcount <= 0 AND released_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    LIMIT %s FOR UPDATE SKIP LOCKED
+                )
+                RETURNING sha256, path, size
+            ''', (grace, batch_size))
+            rows = cur.fetchall()
+            # Unlink while the deleted rows are still locked (see acquire())
+            for sha256, path, size in rows:
+                try:
+                    os.remove(os.path.join(UPLOAD_DIR, path))
+                except FileNotFoundError:
+                    pass
+                freed += size or 0
+            if rows:
+                cur.execute('DELETE FROM blob_extractions WHERE sha256 = ANY(%s)', ([r[0] for r in rows],))
+            conn.commit()
+            deleted += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        cutoff = time.time() - grace
+        for name in os.listdir(BLOB_TMP_DIR):
+            path = os.path.join(BLOB_TMP_DIR, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        _remove_orphans(cur, cutoff)
+        conn.commit()
+    finally:
+        cur.close()
+    return deleted, freed
+
+
+def _remove_orphans(cur, cutoff):
+    for shard in os.listdir(BLOB_DIR):
+        shard_dir = os.path.join(BLOB_DIR, shard)
+        if shard == 'tmp' or not os.path.isdir(shard_dir):
+            continue
+        names = [n for n in os.listdir(shard_dir) if os.path.getmtime(os.path.join(shard_dir, n)) < cutoff]
+        if not names:
+            continue
+        keys = [f'{BLOB_PREFIX}/{shard}/{name}' for name in names]
+        cur.execute('SELECT path FROM blobs WHERE path = ANY(%s)', (keys,))
+        known = {row[0] for row in cur.fetchall()}
+        for key in keys:
+            if key not in known:
+                os.remove(os.path.join(UPLOAD_DIR, key))
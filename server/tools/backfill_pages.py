@@ -0,0 +1,65 @@
+"""Split the text of content created before per-page storage into content_pages.
+
+The pages endpoint already falls back to splitting ``full_text`` on every
+request for such rows; this stores the pages once so reads become a primary
+key range scan. Rows that already have pages are skipped, so the script can
+be interrupted and re-run safely.
+
+    python -m server.tools.backfill_pages [--batch-size 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+import psycopg2.extras
+from database import get_db
+from migrate import check_schema
+from content_pages import chunk_text, replace_pages
+
+
+def backfill(batch_size):
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    done = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            cur.execute('''
+                SELECT c.id, c.full_text FROM content c
+                WHERE c.full_text <> ''
+                  AND NOT EXISTS (SELECT 1 FROM content_pages p WHERE p.content_id = c.id)
+                ORDER BY c.id LIMIT %s FOR UPDATE SKIP LOCKED
+            ''', (batch_size,))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            for row in rows:
+                replace_pages(cur, row['id'], chunk_text(row['full_text']))
+            conn.commit()
+            done += len(rows)
+            rate = done / max(time.perf_counter() - start, 1e-6)
+            print(f"  {done} items paged ({rate:.0f} items/s)")
+    finally:
+        cur.close()
+        conn.close()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill per-page content text in batches.')
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    check_schema()
+    total = backfill(args.batch_size)
+    print(f"Page backfill complete: {total} items split into pages.")
+
+
+if __name__ == '__main__':
+    main()
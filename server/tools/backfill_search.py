@@ -0,0 +1,68 @@
+"""Populate the content search vectors for rows created before full-text search.
+
+New and edited rows are handled by the content_search_vector_update trigger;
+this only fills in rows whose vectors are still NULL. Each batch commits on its
+own so the table is never locked for long, and the script can be interrupted
+and re-run safely.
+
+    python -m server.tools.backfill_search [--batch-size 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+from database import get_db
+from migrate import check_schema
+
+
+def backfill(batch_size, pause):
+    conn = get_db()
+    cur = conn.cursor()
+    done = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            cur.execute('''
+                UPDATE content
+                SET search_vector = content_search_document(title, author, description),
+                    full_text_vector = content_body_document(full_text)
+                WHERE id IN (
+                    SELECT id FROM content WHERE search_vector IS NULL OR full_text_vector IS NULL
+                    ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+                )
+            ''', (batch_size,))
+            updated = cur.rowcount
+            conn.commit()
+            if not updated:
+                break
+            done += updated
+            rate = done / max(time.perf_counter() - start, 1e-6)
+            print(f"  {done} rows indexed ({rate:.0f} rows/s)")
+            if pause:
+                time.sleep(pause)
+    finally:
+        cur.close()
+        conn.close()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill content search vectors in batches.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between batches')
+    args = parser.parse_args()
+
+    # Make sure the column, trigger and index exist before filling them in
+    check_schema()
+    total = backfill(args.batch_size, args.pause)
+    print(f"Search backfill complete: {total} rows updated.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,535 @@
+"""Fill the database with a large, realistic, reproducible synthetic dataset.
+
+    python -m server.tools.generate_dataset [--scale 1.0] [--seed 42] [--jobs N]
+        [--pending-ratio 0.12] [--failed-ratio 0.06] [--zipf 1.1]
+
+Meant for a throwaway database (benchmarks/load_test.py runs it against a
+temporary Postgres): rows are added after whatever is already there and
+nothing is deleted. All six tables are filled, plus the content's pages:
+
+- ``--scale 1`` is 10k users and 1k titles; purchases, bookmarks and reading
+  progress follow from the distributions below, about 9 rows per user in
+  all. ``--scale 100`` is roughly 10M rows.
+- Title popularity is Zipfian (``--zipf``): a few titles get most of the
+  purchases and bookmarks. Popularity is shuffled against id and date, so
+  the popular titles are not simply the oldest ones.
+- Purchase history is power-law: ~40% of readers never buy, most buy a few
+  titles and a small tail of power users buy hundreds.
+- Each payment attempt is pending/failed with the given ratios, otherwise
+  confirmed; after a pending or failed attempt the reader retries the same
+  title half of the time. Every confirmed payment has exactly one access
+  grant (same user, title and time) and no grant exists without one.
+- Payments happen after both the reader signed up and the title was
+  published; reading progress only exists for titles the reader owns.
+
+Everything is derived from ``(seed, row id)``, never from generation order,
+so the same seed gives the same rows whatever ``--jobs`` is. Users are split
+into shards that ``--jobs`` processes generate and ``COPY FROM STDIN`` in
+parallel, each over its own connection. As a superuser the activity tables
+are loaded with ``session_replication_role = replica``, skipping the
+per-row foreign-key triggers (the rows are consistent by construction).
+
+The first ``--login-users`` readers can sign in as ``reader<N>@example.com``
+with the password ``LOADTEST_PASSWORD`` (default ``loadtest``).
+"""
+import argparse
+import bisect
+import datetime
+import io
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+import bcrypt
+import psycopg2
+from database import DATABASE_URL, get_db
+from migrate import check_schema
+from content_pages import copy_escape
+
+LOADTEST_PASSWORD = os.environ.get('LOADTEST_PASSWORD', 'loadtest')
+
+USERS_PER_SCALE = 10000
+TITLES_PER_SCALE = 1000
+SHARD_USERS = 20000
+SHARD_TITLES = 1000
+
+CATEGORIES = ('book', 'guide', 'article', 'document')
+CATEGORY_WEIGHTS = (0.45, 0.25, 0.2, 0.1)
+PRICES = (2000, 3000, 5000, 5000, 7500, 10000)
+FEATURED_SHARE = 0.02
+PAGES_MIN, PAGES_MAX, WORDS_PER_PAGE = 2, 12, 80
+
+INACTIVE_SHARE = 0.4       # readers who never buy anything
+PURCHASE_ALPHA = 1.3       # Pareto shape of titles bought per active reader
+MAX_TITLES_PER_USER = 1000
+RETRY_SHARE = 0.5          # retry after a pending/failed attempt
+MEAN_BOOKMARKS = 1.5
+PROGRESS_SHARE = 0.7       # owned titles the reader has started
+
+HISTORY_START = datetime.datetime(2024, 1, 1)
+HISTORY_END = datetime.datetime(2026, 1, 1)
+HISTORY_SECONDS = (HISTORY_END - HISTORY_START).total_seconds()
+SYLLABLES = ('ka', 'lo', 'mi', 'ra', 'tu', 'ne', 'si', 'bo', 'da', 'we', 'yo', 'gu', 'pe', 'zi', 'an', 'ol')
+
+# Independent random streams per row
+_SHAPE, _DETAIL, _CONTENT, _TIME, _PAGES, _PRICE = range(6)
+
+TABLE_COLUMNS = {
+    'users': 'id, name, email, password_hash, role, created_at',
+    'content': 'id, title, author, category, description, preview_text, full_text, page_count, price, '
+               'is_featured, created_at, updated_at',
+    'content_pages': 'content_id, page_no, text',
+    'payments': 'id, user_id, content_id, phone_number, amount, currency, transaction_id, otp_code, status, '
+                'created_at',
+    'user_content_access': 'id, user_id, content_id, granted_at',
+    'bookmarks': 'id, user_id, content_id, created_at',
+    'reading_progress': 'id, user_id, content_id, progress_percent, last_page, updated_at',
+}
+ACTIVITY_TABLES = ('payments', 'user_content_access', 'bookmarks', 'reading_progress')
+
+
+# ── Deterministic randomness ──
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(*values):
+    """splitmix64 over ``values``: a stable pseudo-random 64-bit integer."""
+    x = 0
+    for value in values:
+        x = (x + value + 0x9E3779B97F4A7C15) & _MASK64
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+        x ^= x >> 31
+    return x
+
+
+def _rng(seed, row_id, stream):
+    return random.Random(_mix(seed, row_id, stream))
+
+
+def _zipf_cumulative(n, s):
+    total, cumulative = 0.0, []
+    for rank in range(1, n + 1):
+        total += rank ** -s
+        cumulative.append(total)
+    return cumulative
+
+
+class Zipf:
+    """Draws from ``values`` with P(rank k) proportional to 1/k**s."""
+
+    def __init__(self, values, s):
+        self.values = values
+        self.cumulative = _zipf_cumulative(len(values), s)
+        self.total = self.cumulative[-1]
+
+    def sample(self, rng):
+        index = bisect.bisect_left(self.cumulative, rng.random() * self.total)
+        return self.values[min(index, len(self.values) - 1)]
+
+    def distinct(self, rng, n):
+        chosen, seen = [], set()
+        while len(chosen) < n:
+            value = self.sample(rng)
+            if value not in seen:
+                seen.add(value)
+                chosen.append(value)
+        return chosen
+
+
+class Plan:
+    """Everything a worker needs to generate any row: ids, sizes and distributions."""
+
+    def __init__(self, seed, first_user, users, first_content, titles, login_users, password_hash,
+                 pending_ratio, failed_ratio, zipf_s, skip_fk_triggers):
+        self.seed = seed
+        self.first_user, self.users = first_user, users
+        self.first_content, self.titles = first_content, titles
+        self.login_users = login_users
+        self.password_hash = password_hash
+        self.statuses = ('confirmed', 'pending', 'failed')
+        self.status_weights = (1 - pending_ratio - failed_ratio, pending_ratio, failed_ratio)
+        self.skip_fk_triggers = skip_fk_triggers
+        self.max_titles = max(1, min(MAX_TITLES_PER_USER, titles // 2))
+
+        rng = random.Random(_mix(seed, 0, 99))
+        self.vocabulary = _vocabulary(rng, 5000)
+        self.word_cumulative = _zipf_cumulative(len(self.vocabulary), 1.0)
+        self.authors = [' '.join(rng.choices(self.vocabulary, k=2)).title() for _ in range(max(titles // 8, 10))]
+        self.author_zipf = Zipf(self.authors, 0.8)
+        popularity = list(range(first_content, first_content + titles))
+        rng.shuffle(popularity)
+        self.popularity = Zipf(popularity, zipf_s)
+
+    def words(self, rng, n):
+        return ' '.join(rng.choices(self.vocabulary, cum_weights=self.word_cumulative, k=n))
+
+    def user_created(self, user_id):
+        """Signup times increase with id, with a little jitter."""
+        i = user_id - self.first_user
+        return (i + _mix(self.seed, user_id, _TIME) / 2 ** 64) / self.users * HISTORY_SECONDS
+
+    def content_created(self, content_id):
+        i = content_id - self.first_content
+        return (i + _mix(self.seed, content_id, _TIME) / 2 ** 64) / self.titles * HISTORY_SECONDS
+
+    def page_count(self, content_id):
+        return PAGES_MIN + _mix(self.seed, content_id, _PAGES) % (PAGES_MAX - PAGES_MIN + 1)
+
+    def price(self, content_id):
+        return PRICES[_mix(self.seed, content_id, _PRICE) % len(PRICES)]
+
+
+def _vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def _timestamp(seconds):
+    return (HISTORY_START + datetime.timedelta(seconds=seconds)).isoformat(sep=' ', timespec='seconds')
+
+
+# ── Row generation ──
+
+class CopyStream:
+    """File-like object over an iterator of rows, for ``copy_expert``.
+
+    Rows are tuples of values; ``None`` becomes ``\\N``.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+
+    def _line(self, row):
+        self.count += 1
+        return '\t'.join('\\N' if value is None else copy_escape(str(value)) for value in row) + '\n'
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += self._line(row)
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def user_rows(plan, first, last):
+    for user_id in range(first, last):
+        i = user_id - plan.first_user
+        email = f'reader{i + 1}@example.com' if i < plan.login_users else f'user{user_id}.{plan.seed}@example.com'
+        yield (user_id, f'Reader {user_id}', email, plan.password_hash, 'user',
+               _timestamp(plan.user_created(user_id)))
+
+
+def content_pages(plan, content_id):
+    rng = _rng(plan.seed, content_id, _PAGES)
+    return [plan.words(rng, WORDS_PER_PAGE) for _ in range(plan.page_count(content_id))]
+
+
+def content_rows(plan, first, last):
+    for content_id in range(first, last):
+        rng = _rng(plan.seed, content_id, _CONTENT)
+        pages = content_pages(plan, content_id)
+        created = _timestamp(plan.content_created(content_id))
+        yield (content_id, plan.words(rng, rng.randint(2, 6)).title(), plan.author_zipf.sample(rng),
+               rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0], plan.words(rng, 30), pages[0][:500] + '...',
+               '\n\n'.join(pages), len(pages), plan.price(content_id), rng.random() < FEATURED_SHARE,
+               created, created)
+
+
+def page_rows(plan, first, last):
+    for content_id in range(first, last):
+        for page_no, text in enumerate(content_pages(plan, content_id), start=1):
+            yield (content_id, page_no, text)
+
+
+def user_shape(plan, user_id):
+    """How much one reader did: ``(attempts per title, progress per title, bookmarks)``.
+
+    ``attempts`` is a list of status tuples, one per title bought, ending in
+    'confirmed' unless the reader gave up. Drawn from its own stream so row
+    counts (and so ids) can be computed without generating the rows.
+    """
+    rng = _rng(plan.seed, user_id, _SHAPE)
+    titles = 0
+    if rng.random() >= INACTIVE_SHARE:
+        titles = min(int(rng.paretovariate(PURCHASE_ALPHA)), plan.max_titles)
+    attempts = []
+    for _ in range(titles):
+        statuses = []
+        while True:
+            status = rng.choices(plan.statuses, plan.status_weights)[0]
+            statuses.append(status)
+            if status == 'confirmed' or rng.random() >= RETRY_SHARE:
+                break
+        attempts.append(statuses)
+    progress = [statuses[-1] == 'confirmed' and rng.random() < PROGRESS_SHARE for statuses in attempts]
+    bookmarks = min(int(rng.expovariate(1 / MEAN_BOOKMARKS)), plan.max_titles)
+    return attempts, progress, bookmarks
+
+
+def shape_counts(plan, user_id):
+    attempts, progress, bookmarks = user_shape(plan, user_id)
+    return (sum(len(statuses) for statuses in attempts),
+            sum(statuses[-1] == 'confirmed' for statuses in attempts),
+            bookmarks, sum(progress))
+
+
+def activity_buffers(plan, first, last, ids):
+    """COPY text for the four activity tables of users ``[first, last)``.
+
+    ``ids`` holds the first id of each table for this shard. Returns
+    ``({table: StringIO}, {table: rows}, {status: payments})``.
+    """
+    buffers = {table: io.StringIO() for table in ACTIVITY_TABLES}
+    payments, access, bookmarks, progress = (buffers[table] for table in ACTIVITY_TABLES)
+    payment_id, access_id, bookmark_id, progress_id = ids
+    statuses_seen = dict.fromkeys(plan.statuses, 0)
+    seed = plan.seed
+
+    for user_id in range(first, last):
+        attempts, progress_flags, bookmark_count = user_shape(plan, user_id)
+        rng = _rng(seed, user_id, _DETAIL)
+        signed_up = plan.user_created(user_id)
+        phone = f'07{user_id % 100000000:08d}'
+        titles = plan.popularity.distinct(rng, len(attempts))
+        for content_id, statuses, started in zip(titles, attempts, progress_flags):
+            earliest = max(signed_up, plan.content_created(content_id))
+            at = rng.uniform(earliest, HISTORY_SECONDS)
+            price = plan.price(content_id)
+            for status in statuses:
+                otp = f'{rng.randrange(1000000):06d}' if status == 'pending' else '\\N'
+                payments.write(f'{payment_id}\t{user_id}\t{content_id}\t{phone}\t{price}\tUGX\t'
+                               f'GEN{seed}X{payment_id}\t{otp}\t{status}\t{_timestamp(at)}\n')
+                payment_id += 1
+                statuses_seen[status] += 1
+                if status == 'confirmed':
+                    access.write(f'{access_id}\t{user_id}\t{content_id}\t{_timestamp(at)}\n')
+                    access_id += 1
+                    if started:
+                        pages = plan.page_count(content_id)
+                        last_page = rng.randint(1, pages)
+                        read_at = rng.uniform(at, max(at, HISTORY_SECONDS))
+                        progress.write(f'{progress_id}\t{user_id}\t{content_id}\t'
+                                       f'{round(100 * last_page / pages, 1)}\t{last_page}\t{_timestamp(read_at)}\n')
+                        progress_id += 1
+                else:
+                    at += rng.uniform(30, 3600)
+        for content_id in plan.popularity.distinct(rng, bookmark_count):
+            earliest = max(signed_up, plan.content_created(content_id))
+            bookmarks.write(f'{bookmark_id}\t{user_id}\t{content_id}\t'
+                            f'{_timestamp(rng.uniform(earliest, HISTORY_SECONDS))}\n')
+            bookmark_id += 1
+
+    counts = {table: row_id - start for table, row_id, start in zip(
+        ACTIVITY_TABLES, (payment_id, access_id, bookmark_id, progress_id), ids)}
+    for buffer in buffers.values():
+        buffer.seek(0)
+    return buffers, counts, statuses_seen
+
+
+# ── Workers ──
+
+_plan = None
+_conn = None
+
+
+def _init_worker(plan):
+    global _plan, _conn
+    _plan = plan
+    _conn = None
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        _conn = psycopg2.connect(DATABASE_URL)
+    return _conn
+
+
+def _copy(cur, table, source):
+    cur.copy_expert(f'COPY {table} ({TABLE_COLUMNS[table]}) FROM STDIN', source, size=65536)
+
+
+def _load_users(shard):
+    conn = _connection()
+    with conn.cursor() as cur:
+        stream = CopyStream(user_rows(_plan, *shard))
+        _copy(cur, 'users', stream)
+    conn.commit()
+    return {'users': stream.count}
+
+
+def _load_content(shard):
+    conn = _connection()
+    with conn.cursor() as cur:
+        content = CopyStream(content_rows(_plan, *shard))
+        _copy(cur, 'content', content)
+        pages = CopyStream(page_rows(_plan, *shard))
+        _copy(cur, 'content_pages', pages)
+    conn.commit()
+    return {'content': content.count, 'content_pages': pages.count}
+
+
+def _count_shard(shard):
+    totals = [0, 0, 0, 0]
+    for user_id in range(*shard):
+        for i, n in enumerate(shape_counts(_plan, user_id)):
+            totals[i] += n
+    return totals
+
+
+def _load_activity(job):
+    shard, ids = job
+    buffers, counts, statuses = activity_buffers(_plan, shard[0], shard[1], ids)
+    conn = _connection()
+    with conn.cursor() as cur:
+        if _plan.skip_fk_triggers:
+            cur.execute('SET session_replication_role = replica')
+        for table in ACTIVITY_TABLES:
+            _copy(cur, table, buffers[table])
+        if _plan.skip_fk_triggers:
+            cur.execute('SET session_replication_role = DEFAULT')
+    conn.commit()
+    counts.update({f'payments {status}': n for status, n in statuses.items()})
+    return counts
+
+
+def _run(pool, fn, jobs, label, totals):
+    started = time.perf_counter()
+    rows = 0
+    results = pool.imap_unordered(fn, jobs) if pool else (fn(job) for job in jobs)
+    for counts in results:
+        for table, n in counts.items():
+            totals[table] = totals.get(table, 0) + n
+            if not table.startswith('payments '):
+                rows += n
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<34} {rows:>12,} rows in {elapsed:7.1f}s ({rows / max(elapsed, 1e-9):>9,.0f} rows/s)")
+
+
+def _shards(first, count, size):
+    return [(start, min(start + size, first + count)) for start in range(first, first + count, size)]
+
+
+# ── Driver ──
+
+def _next_id(cur, table):
+    cur.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}')
+    return cur.fetchone()[0]
+
+
+def generate(scale=1.0, seed=42, login_users=200, jobs=None, pending_ratio=0.12, failed_ratio=0.06,
+             zipf_s=1.1):
+    if pending_ratio < 0 or failed_ratio < 0 or pending_ratio + failed_ratio >= 1:
+        raise ValueError('pending and failed ratios must be non-negative and sum to less than 1')
+    jobs = jobs or os.cpu_count() or 1
+    users, titles = max(int(USERS_PER_SCALE * scale), 10), max(int(TITLES_PER_SCALE * scale), 10)
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        first_user, first_content = _next_id(cur, 'users'), _next_id(cur, 'content')
+        first_ids = [_next_id(cur, table) for table in ACTIVITY_TABLES]
+        cur.execute('SELECT 1 FROM users WHERE email = %s', ('reader1@example.com',))
+        if login_users and cur.fetchone():
+            print("reader1@example.com already exists: not creating login users again")
+            login_users = 0
+        cur.execute('SELECT rolsuper FROM pg_roles WHERE rolname = current_user')
+        superuser = cur.fetchone()[0]
+    finally:
+        cur.close()
+        conn.close()
+
+    password_hash = bcrypt.hashpw(LOADTEST_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    plan = Plan(seed, first_user, users, first_content, titles, min(login_users, users), password_hash,
+                pending_ratio, failed_ratio, zipf_s, superuser)
+    print(f"Generating {users:,} users and {titles:,} titles (seed={seed}, {jobs} process(es))")
+    if not superuser:
+        print("  not a superuser: foreign keys are checked row by row (slower)")
+
+    started = time.perf_counter()
+    totals = {}
+    user_shards = _shards(first_user, users, SHARD_USERS)
+    pool = multiprocessing.Pool(jobs, _init_worker, (plan,)) if jobs > 1 else None
+    if pool is None:
+        _init_worker(plan)
+    try:
+        _run(pool, _load_users, user_shards, 'users', totals)
+        _run(pool, _load_content, _shards(first_content, titles, SHARD_TITLES),
+             'content + content_pages', totals)
+
+        # Row counts per shard give every shard its first ids, so ids don't
+        # depend on which process finishes first
+        counts = pool.map(_count_shard, user_shards) if pool else [_count_shard(s) for s in user_shards]
+        activity_jobs, next_ids = [], list(first_ids)
+        for shard, shard_counts in zip(user_shards, counts):
+            activity_jobs.append((shard, tuple(next_ids)))
+            next_ids = [n + c for n, c in zip(next_ids, shard_counts)]
+        _run(pool, _load_activity, activity_jobs,
+             'activity (4 tables)', totals)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        elif _conn is not None:
+            _conn.close()
+
+    conn = get_db()
+    conn.autocommit = True
+    cur = conn.cursor()
+    for table in ('users', 'content') + ACTIVITY_TABLES:
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+    for table in ('users', 'content', 'content_pages') + ACTIVITY_TABLES:
+        cur.execute(f'ANALYZE {table}')
+    cur.close()
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(n for table, n in totals.items() if not table.startswith('payments '))
+    print(f"Done: {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    for table in ('users', 'content', 'content_pages') + ACTIVITY_TABLES:
+        print(f"  {table:<20} {totals.get(table, 0):>12,}")
+    if totals.get('payments'):
+        share = ', '.join(f"{status} {totals[f'payments {status}'] / totals['payments']:.1%}"
+                          for status in plan.statuses)
+        print(f"  payment statuses: {share}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic dataset (throwaway databases only).')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f'{USERS_PER_SCALE:,} users and {TITLES_PER_SCALE:,} titles per unit (~9 rows per user)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--jobs', type=int, default=None, help='generator processes (default: one per core)')
+    parser.add_argument('--pending-ratio', type=float, default=0.12, help='share of payment attempts left pending')
+    parser.add_argument('--failed-ratio', type=float, default=0.06, help='share of payment attempts that failed')
+    parser.add_argument('--zipf', type=float, default=1.1, help='exponent of title popularity')
+    parser.add_argument('--login-users', type=int, default=200,
+                        help='readers that get a known email and password (for benchmarks/load_test.py)')
+    args = parser.parse_args()
+
+    check_schema()
+    generate(args.scale, args.seed, args.login_users, args.jobs, args.pending_ratio, args.failed_ratio, args.zipf)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Bulk-import a publisher's catalog of PDFs.
+
+    python -m server.tools.import_catalog <directory | manifest.csv>
+        [--batch-size 100] [--workers N] [--category book] [--price 5000] [--author NAME]
+
+A directory imports every ``*.pdf`` under it, titled after the file name; an
+image with the same name next to it (``.jpg``, ``.jpeg``, ``.png``, ``.webp``)
+becomes the cover. A manifest is a CSV with a ``file`` column (the PDF, relative
+to the manifest) and optional ``title``, ``author``, ``category``,
+``description``, ``preview_text``, ``price``, ``is_featured`` and ``cover``
+columns; empty cells fall back to the command-line defaults.
+
+Each batch is hashed into the blob store, extracted on the process pool (one
+document per process, reusing cached extractions), written with one
+``execute_values`` INSERT plus a COPY of its pages, and committed. A PDF that
+is already in the catalog (same content hash) is skipped, so after a crash or
+Ctrl-C the same command picks up where it stopped, losing at most the batch in
+flight. Files that can't be read are reported and left for the next run.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+import psycopg2.extras
+from database import get_db
+from migrate import check_schema
+from catalog_cache import catalog_cache
+from content_pages import copy_pages
+from ingest import PREVIEW_CHARS
+from jobs import enqueue
+from pdf_extract import PDF_EXTRACT_WORKERS, extract_documents, shutdown_pool
+from storage import receive, acquire, file_ext
+
+CATEGORIES = ('book', 'guide', 'article', 'document')
+COVER_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+# ── Reading the source ──
+
+def _title_from_filename(path):
+    return os.path.splitext(os.path.basename(path))[0].replace('_', ' ').replace('-', ' ').strip()
+
+
+def scan_directory(root):
+    """One entry per PDF under ``root``, in a stable order."""
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not name.lower().endswith('.pdf'):
+                continue
+            path = os.path.join(dirpath, name)
+            stem = os.path.splitext(path)[0]
+            cover = next((stem + ext for ext in COVER_EXTS if os.path.exists(stem + ext)), None)
+            entries.append({'file': path, 'title': _title_from_filename(path), 'cover': cover})
+    return entries
+
+
+def read_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        if 'file' not in (reader.fieldnames or []):
+            raise SystemExit(f"{path}: the manifest needs a 'file' column")
+        for line_no, row in enumerate(reader, start=2):
+            entry = {key: (value or '').strip() for key, value in row.items() if key}
+            if not entry.get('file'):
+                print(f"  line {line_no}: no file, skipped")
+                continue
+            entry['file'] = os.path.join(base, entry['file'])
+            if entry.get('cover'):
+                entry['cover'] = os.path.join(base, entry['cover'])
+            entry['title'] = entry.get('title') or _title_from_filename(entry['file'])
+            entries.append(entry)
+    return entries
+
+
+def _row_values(entry, defaults, full_text, page_count):
+    category = entry.get('category') or defaults.category
+    if category not in CATEGORIES:
+        raise ValueError(f"unknown category '{category}'")
+    preview = entry.get('preview_text') or (full_text[:PREVIEW_CHARS] + '...' if full_text else '')
+    return [
+        entry['title'], entry.get('author') or defaults.author, category,
+        entry.get('description', ''), preview, full_text, page_count,
+        float(entry.get('price') or defaults.price),
+        (entry.get('is_featured') or '').lower() in ('1', 'true', 'yes'),
+    ]
+
+
+# ── Importing ──
+
+def _discard(*uploads):
+    for upload in uploads:
+        if upload is not None:
+            upload.discard()
+
+
+def import_batch(conn, entries, defaults, workers, stats):
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    items = []
+    try:
+        # Hash into the blob store's temp directory; a PDF already in the
+        # catalog (from an earlier run, or the same file twice) is skipped
+        seen = set()
+        for entry in entries:
+            try:
+                with open(entry['file'], 'rb') as f:
+                    pdf = receive(f, 'pdf')
+            except OSError as e:
+                print(f"  {entry['file']}: {e}")
+                stats['failed'] += 1
+                continue
+            if pdf.key in seen:
+                pdf.discard()
+                stats['skipped'] += 1
+                continue
+            seen.add(pdf.key)
+            items.append({'entry': entry, 'pdf': pdf, 'cover': None})
+
+        cur.execute('SELECT file_path FROM content WHERE file_path = ANY(%s)', ([i['pdf'].key for i in items],))
+        existing = {row['file_path'] for row in cur.fetchall()}
+        for item in [i for i in items if i['pdf'].key in existing]:
+            item['pdf'].discard()
+            items.remove(item)
+            stats['skipped'] += 1
+        if not items:
+            return
+
+        cur.execute('SELECT sha256, pages FROM blob_extractions WHERE sha256 = ANY(%s)',
+                    ([i['pdf'].sha256 for i in items],))
+        cached = {row['sha256']: row['pages'] for row in cur.fetchall()}
+        # Nothing is written until extraction is done, so no transaction is held open meanwhile
+        conn.commit()
+
+        pending = []
+        for item in items:
+            if item['pdf'].sha256 in cached:
+                item['pages'], item['cache'] = cached[item['pdf'].sha256], False
+            else:
+                pending.append(item)
+        for index, pages, timed_out, error in extract_documents([i['pdf'].tmp_path for i in pending], workers):
+            item = pending[index]
+            if error is not None:
+                print(f"  {item['entry']['file']}: could not extract text ({error})")
+                item['pages'] = None
+                continue
+            item['pages'] = pages
+            item['cache'] = not timed_out
+            if timed_out:
+                print(f"  {item['entry']['file']}: pages {timed_out} timed out and were left blank")
+
+        rows, ready = [], []
+        for item in items:
+            if item['pages'] is None:
+                item['pdf'].discard()
+                stats['failed'] += 1
+                continue
+            full_text = '\n\n'.join(text for text in item['pages'] if text)
+            try:
+                item['values'] = _row_values(item['entry'], defaults, full_text, len(item['pages']))
+            except ValueError as e:
+                print(f"  {item['entry']['file']}: {e}")
+                item['pdf'].discard()
+                stats['failed'] += 1
+                continue
+            item['has_text'] = bool(full_text)
+            cover = item['entry'].get('cover')
+            if cover:
+                try:
+                    with open(cover, 'rb') as f:
+                        item['cover'] = receive(f, file_ext(cover, 'jpg'))
+                except OSError as e:
+                    print(f"  {cover}: {e}, imported without a cover")
+            ready.append(item)
+        if not ready:
+            return
+
+        for item in ready:
+            file_path = acquire(cur, item['pdf'])
+            cover_image = acquire(cur, item['cover']) if item['cover'] else None
+            item['cover_image'] = cover_image
+            rows.append(item['values'][:5] + [cover_image, file_path] + item['values'][5:])
+
+        inserted = psycopg2.extras.execute_values(cur, '''
+            INSERT INTO content (title, author, category, description, preview_text, cover_image,
+                                 file_path, full_text, page_count, price, is_featured)
+            VALUES %s RETURNING id, file_path
+        ''', rows, page_size=len(rows), fetch=True)
+        ids = {row['file_path']: row['id'] for row in inserted}
+
+        copy_pages(cur, {ids[i['pdf'].key]: i['pages'] for i in ready if i['has_text']})
+        psycopg2.extras.execute_values(
+            cur,
+            'INSERT INTO blob_extractions (sha256, pages) VALUES %s ON CONFLICT (sha256) DO NOTHING',
+            [(i['pdf'].sha256, i['pages']) for i in ready if i.get('cache')]
+        )
+        for item in ready:
+            if item['cover_image']:
+                enqueue(cur, 'cover_derivatives', {'cover_image': item['cover_image']},
+                        content_id=ids[item['pdf'].key])
+        conn.commit()
+
+        stats['imported'] += len(ready)
+        stats['pages'] += sum(len(i['pages']) for i in ready)
+        stats['bytes'] += sum(i['pdf'].size for i in ready)
+    except BaseException:
+        conn.rollback()
+        for item in items:
+            _discard(item['pdf'], item['cover'])
+        raise
+    finally:
+        cur.close()
+
+
+def run_import(source, defaults, batch_size, workers):
+    entries = read_manifest(source) if os.path.isfile(source) else scan_directory(source)
+    print(f"Importing {len(entries)} PDF(s) from {source} in batches of {batch_size} "
+          f"on {workers} process(es)")
+
+    stats = {'imported': 0, 'skipped': 0, 'failed': 0, 'pages': 0, 'bytes': 0}
+    conn = get_db()
+    start = time.perf_counter()
+    try:
+        for offset in range(0, len(entries), batch_size):
+            import_batch(conn, entries[offset:offset + batch_size], defaults, workers, stats)
+            # Make each committed batch visible in the catalog straight away
+            catalog_cache.invalidate()
+            elapsed = max(time.perf_counter() - start, 1e-6)
+            print(f"  {min(offset + batch_size, len(entries))}/{len(entries)}: "
+                  f"{stats['imported']} imported, {stats['skipped']} skipped, {stats['failed']} failed "
+                  f"({stats['imported'] / elapsed:.1f} titles/s, {stats['pages'] / elapsed:.0f} pages/s, "
+                  f"{stats['bytes'] / 1e6 / elapsed:.1f} MB/s)")
+    finally:
+        conn.close()
+        shutdown_pool()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-import PDFs into the catalog.')
+    parser.add_argument('source', help='directory of PDFs, or a CSV manifest')
+    parser.add_argument('--batch-size', type=int, default=100, help='titles per transaction')
+    parser.add_argument('--workers', type=int, default=PDF_EXTRACT_WORKERS, help='extraction processes')
+    parser.add_argument('--category', default='book', choices=CATEGORIES)
+    parser.add_argument('--author', default='Unknown')
+    parser.add_argument('--price', type=float, default=5000)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        raise SystemExit(f"{args.source}: no such file or directory")
+    check_schema()
+    stats = run_import(args.source, args, max(1, args.batch_size), max(1, args.workers))
+    print(f"Import complete: {stats['imported']} imported, {stats['skipped']} already present, "
+          f"{stats['failed']} failed, {stats['pages']} pages in {stats['seconds']:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Background job worker.
+
+Run one or more next to the web app (same database, same uploads directory):
+
+    cd server && python worker.py            # run until stopped
+    cd server && python worker.py --drain    # run everything that is due, then exit
+
+Idle workers sleep on LISTEN/NOTIFY and also poll every JOB_POLL_INTERVAL
+seconds, which picks up retries whose backoff has expired; after
+PDF_POOL_IDLE idle seconds the PDF extraction processes are stopped. Every
+BLOB_GC_INTERVAL seconds a worker also sweeps unreferenced upload blobs
+(see storage.py) and resized covers whose original is gone (covers.py),
+and deletes expired token revocations (revocation.py) and idle rate limit
+buckets (ratelimit.py).
+SIGTERM/SIGINT let the current job finish before exiting.
+"""
+import argparse
+import os
+import select
+import signal
+import time
+import traceback
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+import psycopg2
+import psycopg2.extras
+from database import DATABASE_URL, get_db
+from migrate import check_schema
+from catalog_cache import catalog_cache
+from ingest import ingest_pdf
+from pdf_extract import PDF_POOL_IDLE, shutdown_pool
+from storage import collect_garbage
+from covers import pregenerate, prune_derivatives
+from metrics import JOBS, mark_process_dead
+from revocation import prune_expired
+from ratelimit import prune_idle
+from jobs import JOB_CHANNEL, claim, complete, fail, requeue_stale, worker_name
+
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 5))
+STALE_CHECK_INTERVAL = 60
+BLOB_GC_INTERVAL = float(os.environ.get('BLOB_GC_INTERVAL', 3600))
+
+HANDLERS = {
+    'extract_pdf': ingest_pdf,
+    'cover_derivatives': pregenerate,
+}
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+    print(f"Worker {worker_name()}: stopping after the current job")
+
+
+def after_commit(job, result):
+    """Side effects that must only happen once the job's changes are visible."""
+    if job['kind'] == 'extract_pdf' and not result.get('skipped'):
+        catalog_cache.invalidate()
+
+
+def run_one(worker):
+    """Claim and run a single job. Returns False if nothing was due."""
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    try:
+        job = claim(cur, worker)
+        # Commit the claim on its own so the status page shows 'running'
+        conn.commit()
+        if not job:
+            return False
+
+        started = time.perf_counter()
+        try:
+            handler = HANDLERS.get(job['kind'])
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job['kind']}'")
+            result = handler(cur, job['payload']) or {}
+            result['duration_sec'] = round(time.perf_counter() - started, 3)
+            complete(cur, job['id'], result)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            retry = fail(cur, job, e)
+            conn.commit()
+            JOBS.labels(job['kind'], 'retry' if retry else 'failed').inc()
+            print(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {e}"
+                  f"{' - will retry' if retry else ' - giving up'}")
+            traceback.print_exc()
+            return True
+
+        after_commit(job, result)
+        JOBS.labels(job['kind'], 'done').inc()
+        print(f"Job {job['id']} ({job['kind']}) done in {result['duration_sec']}s")
+        return True
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _listen():
+    listener = psycopg2.connect(DATABASE_URL)
+    listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    listener.cursor().execute(f'LISTEN {JOB_CHANNEL}')
+    return listener
+
+
+def _wait(listener, timeout):
+    """Sleep until a NOTIFY arrives or ``timeout`` passes."""
+    if select.select([listener], [], [], timeout) != ([], [], []):
+        listener.poll()
+        listener.notifies.clear()
+
+
+def _requeue_stale():
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        count = requeue_stale(cur)
+        conn.commit()
+        if count:
+            print(f"Requeued {count} job(s) abandoned by a lost worker")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _collect_blobs():
+    conn = get_db()
+    try:
+        deleted, freed = collect_garbage(conn)
+        if deleted:
+            print(f"Blob sweep: removed {deleted} unreferenced file(s), {freed / 1e6:.1f} MB freed")
+        pruned = prune_derivatives()
+        if pruned:
+            print(f"Blob sweep: removed resized copies of {pruned} deleted cover(s)")
+    except Exception as e:
+        conn.rollback()
+        print(f"Blob sweep failed: {e}")
+    finally:
+        conn.close()
+
+
+def _prune_revocations():
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        count = prune_expired(cur)
+        buckets = prune_idle(cur)
+        conn.commit()
+        if count:
+            print(f"Deleted {count} expired token revocation(s)")
+        if buckets:
+            print(f"Deleted {buckets} idle rate limit bucket(s)")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Token revocation/rate limit prune failed: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def run(drain=False):
+    worker = worker_name()
+    listener = None if drain else _listen()
+    last_stale_check = 0.0
+    last_blob_sweep = time.monotonic()
+    idle_since = None
+    print(f"Worker {worker} started")
+    try:
+        while not _stopping:
+            if time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+                _requeue_stale()
+                last_stale_check = time.monotonic()
+            if not drain and time.monotonic() - last_blob_sweep > BLOB_GC_INTERVAL:
+                _collect_blobs()
+                _prune_revocations()
+                last_blob_sweep = time.monotonic()
+            if run_one(worker):
+                idle_since = None
+                continue
+            if drain:
+                break
+            if idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > PDF_POOL_IDLE:
+                # Free the extraction processes' memory until the next PDF arrives
+                shutdown_pool()
+            _wait(listener, JOB_POLL_INTERVAL)
+    finally:
+        if listener is not None:
+            listener.close()
+        shutdown_pool()
+        mark_process_dead(os.getpid())
+    print(f"Worker {worker} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background jobs (PDF ingestion).')
+    parser.add_argument('--drain', action='store_true', help='exit once no job is due')
+    parser.add_argument('--collect-blobs', action='store_true', help='sweep unreferenced upload blobs, then exit')
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    check_schema()
+    if args.collect_blobs:
+        _collect_blobs()
+        return
+    run(drain=args.drain)
+
+
+if __name__ == '__main__':
+    main()
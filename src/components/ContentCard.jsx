@@ -6,6 +6,18 @@ import './ContentCard.css';
 const categoryIcons = { book: FiBook, guide: FiBookOpen, article: FiFileText, document: FiFile };
 const categoryColors = { book: '#E8383F', guide: '#60A5FA', article: '#34D399', document: '#FBBF24' };
 
+// Search results wrap matched terms in <mark>; render them as elements, never as HTML
+function Highlighted({ text }) {
+  return text.split(/(<mark>.*?<\/mark>)/g).map((part, i) =>
+    part.startsWith('<mark>') ? <mark key={i}>{part.slice(6, -7)}</mark> : part
+  );
+}
+
+// Resized covers; v pins the exact file so the browser may cache it forever
+export function coverUrl(item, width) {
+  return `${API_URL}/uploads/covers/${item.id}?w=${width}&v=${encodeURIComponent(item.cover_image)}`;
+}
+
 export default function ContentCard({ item }) {
   const Icon = categoryIcons[item.category] || FiFile;
   const color = categoryColors[item.category] || '#888';
@@ -14,7 +26,13 @@ export default function ContentCard({ item }) {
     <Link to={`/content/${item.id}`} className="content-card card">
       <div className="card-cover" style={{ borderColor: color }}>
         {item.cover_image ? (
-          <img src={`${API_URL}/uploads/${item.cover_image}`} alt={item.title} />
+          <img
+            src={coverUrl(item, 320)}
+            srcSet={`${coverUrl(item, 320)} 320w, ${coverUrl(item, 640)} 640w`}
+            sizes="(max-width: 768px) 100vw, 320px"
+            loading="lazy"
+            alt={item.title}
+          />
         ) : (
           <div className="card-cover-placeholder" style={{ background: `linear-gradient(135deg, ${color}22, ${color}44)` }}>
             <Icon style={{ color, fontSize: '2.5rem' }} />
@@ -28,9 +46,9 @@ export default function ContentCard({ item }) {
         ) : null}
       </div>
       <div className="card-body">
-        <h3 className="card-title">{item.title}</h3>
+        <h3 className="card-title">{item.title_highlight ? <Highlighted text={item.title_highlight} /> : item.title}</h3>
         <p className="card-author">by {item.author}</p>
-        <p className="card-desc">{item.description}</p>
+        <p className="card-desc">{item.snippet ? <Highlighted text={item.snippet} /> : item.description}</p>
         <div className="card-footer">
           <span className="card-price">UGX {Number(item.price).toLocaleString()}</span>
           <span className="card-pages">{item.page_count} pages</span>
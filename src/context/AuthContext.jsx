@@ -63,6 +63,16 @@ export function AuthProvider({ children }) {
   };
 
   const logout = () => {
+    const current = localStorage.getItem("lydistories_token");
+    if (current) {
+      // Revoke the token server-side too; the local logout doesn't wait for it
+      fetch(`${API_URL}/api/auth/logout`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${current}` },
+      }).catch(() => {});
+    }
+    // The service worker's cached API responses may be this user's private content
+    navigator.serviceWorker?.controller?.postMessage({ type: "logout" });
     localStorage.removeItem("lydistories_token");
     setToken(null);
     setUser(null);
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { useSearchParams } from 'react-router-dom';
+import { useSearchParams, useNavigate } from 'react-router-dom';
 import { FiSearch, FiFilter } from 'react-icons/fi';
 import ContentCard from '../components/ContentCard';
 import { API_URL } from '../context/AuthContext';
@@ -16,34 +16,69 @@ const categories = [
 export default function BrowsePage() {
   const [searchParams, setSearchParams] = useSearchParams();
   const [content, setContent] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [search, setSearch] = useState(searchParams.get('search') || '');
+  const [suggestions, setSuggestions] = useState([]);
+  const navigate = useNavigate();
   const [category, setCategory] = useState(searchParams.get('category') || '');
 
   useEffect(() => {
     fetchContent();
   }, [category, searchParams]);
 
-  const fetchContent = async () => {
-    setLoading(true);
+  // As-you-type completions from the lightweight suggest endpoint
+  useEffect(() => {
+    const q = search.trim();
+    if (q.length < 2 || q === searchParams.get('search')) {
+      setSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API_URL}/api/content/suggest?q=${encodeURIComponent(q)}`);
+        const data = await res.json();
+        setSuggestions(data.suggestions || []);
+      } catch {
+        setSuggestions([]);
+      }
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  const pickSuggestion = (s) => {
+    setSuggestions([]);
+    if (s.type === 'title') return navigate(`/content/${s.id}`);
+    setSearch(s.text);
+    setSearchParams(prev => { prev.set('search', s.text); return prev; });
+  };
+
+  const fetchContent = async (after = null) => {
+    if (after) setLoadingMore(true);
+    else setLoading(true);
     try {
       const params = new URLSearchParams();
       if (category) params.set('category', category);
       const s = searchParams.get('search') || search;
       if (s) params.set('search', s);
+      if (after) params.set('after', after);
       
       const res = await fetch(`${API_URL}/api/content?${params}`);
       const data = await res.json();
-      setContent(data.content);
+      setContent(prev => after ? [...prev, ...data.content] : data.content);
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error(err);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
   const handleSearch = (e) => {
     e.preventDefault();
+    setSuggestions([]);
     setSearchParams(prev => {
       if (search) prev.set('search', search);
       else prev.delete('search');
@@ -69,7 +104,18 @@ export default function BrowsePage() {
               value={search}
               onChange={(e) => setSearch(e.target.value)}
               className="input"
+              onBlur={() => setTimeout(() => setSuggestions([]), 150)}
             />
+            {suggestions.length > 0 && (
+              <ul className="search-suggestions">
+                {suggestions.map(s => (
+                  <li key={`${s.type}-${s.id ?? s.text}`} onMouseDown={() => pickSuggestion(s)}>
+                    <span>{s.text}</span>
+                    <span className="suggestion-type">{s.type}</span>
+                  </li>
+                ))}
+              </ul>
+            )}
           </form>
 
           <div className="category-filters">
@@ -99,10 +145,17 @@ export default function BrowsePage() {
           </div>
         ) : (
           <>
-            <p className="results-count">{content.length} item{content.length !== 1 ? 's' : ''} found</p>
+            <p className="results-count">{content.length}{nextCursor ? '+' : ''} item{content.length !== 1 ? 's' : ''} found</p>
             <div className="content-grid">
               {content.map(item => <ContentCard key={item.id} item={item} />)}
             </div>
+            {nextCursor && (
+              <div className="load-more">
+                <button className="btn btn-outline" onClick={() => fetchContent(nextCursor)} disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </>
         )}
       </div>
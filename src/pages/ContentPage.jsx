@@ -1,9 +1,10 @@
 import { useState, useEffect } from 'react';
 import { useParams, Link, useNavigate } from 'react-router-dom';
-import { FiArrowLeft, FiBookmark, FiLock, FiCheck, FiClock, FiFileText } from 'react-icons/fi';
+import { FiArrowLeft, FiBookmark, FiLock, FiCheck, FiClock, FiFileText, FiChevronLeft, FiChevronRight, FiDownload } from 'react-icons/fi';
 import { useAuth, API_URL } from '../context/AuthContext';
 import { useApi } from '../hooks/useApi';
 import PaymentModal from '../components/PaymentModal';
+import { coverUrl } from '../components/ContentCard';
 import './ContentPage.css';
 
 export default function ContentPage() {
@@ -16,6 +17,7 @@ export default function ContentPage() {
   const [showPayment, setShowPayment] = useState(false);
   const [bookmarked, setBookmarked] = useState(false);
   const [fontSize, setFontSize] = useState(16);
+  const [reader, setReader] = useState(null);
   const token = localStorage.getItem('lydistories_token');
 
   useEffect(() => {
@@ -37,10 +39,49 @@ export default function ContentPage() {
     }
   };
 
+  useEffect(() => {
+    if (content?.has_access) fetchPages();
+  }, [content?.id, content?.has_access]);
+
+  // Without `from` the server resumes at the reader's saved last page
+  const fetchPages = async (from) => {
+    try {
+      const headers = {};
+      if (token) headers['Authorization'] = `Bearer ${token}`;
+      const query = from ? `?from=${from}` : '';
+      const res = await fetch(`${API_URL}/api/content/${id}/pages${query}`, { headers });
+      if (!res.ok) return;
+      const data = await res.json();
+      setReader(data);
+      if (from) window.scrollTo(0, 0);
+      if (user && data.total_pages) saveProgress(data.from, data.total_pages);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  const saveProgress = (page, total) => {
+    apiFetch('/api/reading-progress', {
+      method: 'PUT',
+      body: JSON.stringify({
+        content_id: parseInt(id), last_page: page,
+        progress_percent: Math.round((page / total) * 100)
+      })
+    }).catch(() => {});
+  };
+
+  // The PDF is served from a short-lived signed URL, so ask for one per click
+  const downloadPdf = async () => {
+    try {
+      const data = await apiFetch(`/api/content/${id}/download`);
+      window.open(`${API_URL}${data.url}`, '_blank');
+    } catch (err) { console.error(err); }
+  };
+
   const checkBookmark = async () => {
     try {
-      const data = await apiFetch('/api/bookmarks');
-      setBookmarked(data.bookmarks.some(b => b.content_id === parseInt(id)));
+      const data = await apiFetch(`/api/bookmarks?content_id=${id}`);
+      setBookmarked(data.bookmarks.length > 0);
     } catch {}
   };
 
@@ -78,7 +119,12 @@ export default function ContentPage() {
           <aside className="content-sidebar">
             <div className="content-cover-large">
               {content.cover_image ? (
-                <img src={`${API_URL}/uploads/${content.cover_image}`} alt={content.title} />
+                <img
+                  src={coverUrl(content, 320)}
+                  srcSet={`${coverUrl(content, 320)} 320w, ${coverUrl(content, 640)} 640w, ${coverUrl(content, 960)} 960w`}
+                  sizes="(max-width: 768px) 100vw, 320px"
+                  alt={content.title}
+                />
               ) : (
                 <div className="cover-placeholder-lg">
                   <FiFileText />
@@ -101,7 +147,14 @@ export default function ContentPage() {
               </div>
 
               {hasAccess ? (
-                <div className="access-badge"><FiCheck /> You have access</div>
+                <>
+                  <div className="access-badge"><FiCheck /> You have access</div>
+                  {content.has_file && user && (
+                    <button className="btn btn-outline" style={{ width: '100%', marginTop: 8 }} onClick={downloadPdf}>
+                      <FiDownload /> Download PDF
+                    </button>
+                  )}
+                </>
               ) : (
                 <button className="btn btn-primary btn-lg" style={{ width: '100%' }}
                   onClick={() => user ? setShowPayment(true) : navigate('/login')}>
@@ -120,17 +173,34 @@ export default function ContentPage() {
 
           {/* Content Area */}
           <main className="content-reader-area">
-            {hasAccess && content.full_text ? (
+            {hasAccess && reader?.pages.length ? (
               <>
                 <div className="reader-controls">
                   <span>Font size:</span>
                   <button className="btn btn-dark btn-sm" onClick={() => setFontSize(f => Math.max(12, f - 2))}>A-</button>
                   <button className="btn btn-dark btn-sm" onClick={() => setFontSize(f => Math.min(24, f + 2))}>A+</button>
+                  <span className="reader-position">
+                    Page {reader.from} of {reader.total_pages}
+                  </span>
                 </div>
                 <div className="reader-content" style={{ fontSize }}>
-                  {content.full_text.split('\n').map((para, i) => 
-                    para.trim() ? <p key={i}>{para}</p> : <br key={i} />
-                  )}
+                  {reader.pages.map(page => (
+                    <section key={page.page_no} className="reader-page">
+                      {page.text.split('\n').map((para, i) =>
+                        para.trim() ? <p key={i}>{para}</p> : <br key={i} />
+                      )}
+                    </section>
+                  ))}
+                </div>
+                <div className="reader-nav">
+                  <button className="btn btn-outline" disabled={!reader.prev_from}
+                    onClick={() => fetchPages(reader.prev_from)}>
+                    <FiChevronLeft /> Previous
+                  </button>
+                  <button className="btn btn-outline" disabled={!reader.next_from}
+                    onClick={() => fetchPages(reader.next_from)}>
+                    Next <FiChevronRight />
+                  </button>
                 </div>
               </>
             ) : (
@@ -10,6 +10,8 @@ export default function Dashboard() {
   const { apiFetch } = useApi();
   const [data, setData] = useState(null);
   const [bookmarks, setBookmarks] = useState([]);
+  const [bookmarksCursor, setBookmarksCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -24,10 +26,21 @@ export default function Dashboard() {
       ]);
       setData(dashData);
       setBookmarks(bmData.bookmarks);
+      setBookmarksCursor(bmData.next_cursor);
     } catch (err) { console.error(err); }
     finally { setLoading(false); }
   };
 
+  const fetchMoreBookmarks = async () => {
+    setLoadingMore(true);
+    try {
+      const bmData = await apiFetch(`/api/bookmarks?after=${bookmarksCursor}`);
+      setBookmarks(prev => [...prev, ...bmData.bookmarks]);
+      setBookmarksCursor(bmData.next_cursor);
+    } catch (err) { console.error(err); }
+    finally { setLoadingMore(false); }
+  };
+
   if (loading) return <div className="loading-page"><div className="spinner" /><p>Loading dashboard...</p></div>;
 
   return (
@@ -107,6 +120,13 @@ export default function Dashboard() {
                 </Link>
               ))}
             </div>
+            {bookmarksCursor && (
+              <div style={{ display: 'flex', justifyContent: 'center', marginTop: 24 }}>
+                <button className="btn btn-outline" onClick={fetchMoreBookmarks} disabled={loadingMore}>
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </section>
         )}
       </div>
@@ -16,10 +16,12 @@ export default function HomePage() {
 
   const fetchContent = async () => {
     try {
-      const res = await fetch(`${API_URL}/api/content`);
-      const data = await res.json();
-      setFeatured(data.content.filter(c => c.is_featured));
-      setRecent(data.content.slice(0, 6));
+      const [featuredRes, recentRes] = await Promise.all([
+        fetch(`${API_URL}/api/content?featured=1`),
+        fetch(`${API_URL}/api/content?limit=6`)
+      ]);
+      setFeatured((await featuredRes.json()).content);
+      setRecent((await recentRes.json()).content);
     } catch (err) {
       console.error(err);
     } finally {
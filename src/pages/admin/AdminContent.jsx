@@ -8,14 +8,16 @@ export default function AdminContent() {
   const { apiFetch } = useApi();
   const navigate = useNavigate();
   const [content, setContent] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => { fetchContent(); }, []);
 
-  const fetchContent = async () => {
+  const fetchContent = async (after = null) => {
     try {
-      const data = await apiFetch('/api/content');
-      setContent(data.content);
+      const data = await apiFetch(after ? `/api/content?after=${after}` : '/api/content');
+      setContent(prev => after ? [...prev, ...data.content] : data.content);
+      setNextCursor(data.next_cursor);
     } catch (err) { console.error(err); }
     finally { setLoading(false); }
   };
@@ -38,7 +40,7 @@ export default function AdminContent() {
             <button className="btn btn-ghost btn-sm" onClick={() => navigate('/admin')}><FiArrowLeft /></button>
             <div>
               <h1>Content Management</h1>
-              <p>{content.length} items in library</p>
+              <p>{content.length}{nextCursor ? '+' : ''} items in library</p>
             </div>
           </div>
           <Link to="/admin/content/new" className="btn btn-primary"><FiPlus /> Add New</Link>
@@ -70,6 +72,12 @@ export default function AdminContent() {
             </tbody>
           </table>
         </div>
+
+        {nextCursor && (
+          <div style={{ display: 'flex', justifyContent: 'center', marginTop: 24 }}>
+            <button className="btn btn-outline" onClick={() => fetchContent(nextCursor)}>Load more</button>
+          </div>
+        )}
       </div>
     </div>
   );
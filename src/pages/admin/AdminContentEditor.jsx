@@ -20,6 +20,7 @@ export default function AdminContentEditor() {
   const [loading, setLoading] = useState(false);
   const [saving, setSaving] = useState(false);
   const [error, setError] = useState('');
+  const [processing, setProcessing] = useState('');
   const token = localStorage.getItem('lydistories_token');
 
   useEffect(() => {
@@ -29,7 +30,7 @@ export default function AdminContentEditor() {
   const fetchContent = async () => {
     setLoading(true);
     try {
-      const data = await apiFetch(`/api/content/${id}`);
+      const data = await apiFetch(`/api/content/${id}?full_text=1`);
       const c = data.content;
       setForm({
         title: c.title || '', author: c.author || '', category: c.category || 'article',
@@ -40,6 +41,19 @@ export default function AdminContentEditor() {
     finally { setLoading(false); }
   };
 
+  // PDF text extraction runs in the background worker; wait for it before leaving
+  const waitForJob = async (job) => {
+    while (job.status === 'queued' || job.status === 'running') {
+      setProcessing(job.attempts > 0 && job.status === 'queued'
+        ? `Retrying PDF processing (attempt ${job.attempts + 1} of ${job.max_attempts})...`
+        : 'Processing PDF...');
+      await new Promise(resolve => setTimeout(resolve, 1500));
+      job = (await apiFetch(`/api/jobs/${job.id}`)).job;
+    }
+    setProcessing('');
+    if (job.status === 'failed') throw new Error(`PDF processing failed: ${job.last_error}`);
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setError('');
@@ -60,11 +74,13 @@ export default function AdminContentEditor() {
       });
       const data = await res.json();
       if (!res.ok) throw new Error(data.error);
+      if (data.job) await waitForJob(data.job);
       navigate('/admin/content');
     } catch (err) {
       setError(err.message);
     } finally {
       setSaving(false);
+      setProcessing('');
     }
   };
 
@@ -147,7 +163,7 @@ export default function AdminContentEditor() {
           </div>
 
           <button type="submit" className="btn btn-primary btn-lg" style={{ width: '100%' }} disabled={saving}>
-            {saving ? <><FiLoader className="spin" /> Saving...</> : <><FiSave /> {isEdit ? 'Update Content' : 'Publish Content'}</>}
+            {saving ? <><FiLoader className="spin" /> {processing || 'Saving...'}</> : <><FiSave /> {isEdit ? 'Update Content' : 'Publish Content'}</>}
           </button>
         </form>
       </div>
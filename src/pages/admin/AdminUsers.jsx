@@ -8,14 +8,16 @@ export default function AdminUsers() {
   const { apiFetch } = useApi();
   const navigate = useNavigate();
   const [users, setUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => { fetchUsers(); }, []);
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (after = null) => {
     try {
-      const data = await apiFetch('/api/users');
-      setUsers(data.users);
+      const data = await apiFetch(after ? `/api/users?after=${after}` : '/api/users');
+      setUsers(prev => after ? [...prev, ...data.users] : data.users);
+      setNextCursor(data.next_cursor);
     } catch (err) { console.error(err); }
     finally { setLoading(false); }
   };
@@ -46,7 +48,7 @@ export default function AdminUsers() {
             <button className="btn btn-ghost btn-sm" onClick={() => navigate('/admin')}><FiArrowLeft /></button>
             <div>
               <h1>User Management</h1>
-              <p>{users.length} registered users</p>
+              <p>{users.length}{nextCursor ? '+' : ''} registered users</p>
             </div>
           </div>
         </div>
@@ -84,6 +86,12 @@ export default function AdminUsers() {
             </tbody>
           </table>
         </div>
+
+        {nextCursor && (
+          <div style={{ display: 'flex', justifyContent: 'center', marginTop: 24 }}>
+            <button className="btn btn-outline" onClick={() => fetchUsers(nextCursor)}>Load more</button>
+          </div>
+        )}
       </div>
     </div>
   );